@@ -3,6 +3,11 @@ ASGI config for Sample_track_by_RFID project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the project through this application (e.g. ``uvicorn
+Sample_track_by_RFID.asgi:application``) to enable the live sample status
+streams at ``/api/samples/events/``; each open stream is an idle coroutine
+rather than a worker thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
@@ -42,8 +42,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "Samples.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "Samples.routers.PrimaryPinningMiddleware",
     "django.middleware.locale.LocaleMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -66,6 +68,7 @@ TEMPLATES = [
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
                 "django.template.context_processors.i18n",
+                "Users.avatars.avatar_context",
             ],
         },
     },
@@ -77,13 +80,50 @@ WSGI_APPLICATION = "Sample_track_by_RFID.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# SQLite set up for several web workers: WAL lets readers run alongside the
+# single writer, write transactions take the lock up front (BEGIN IMMEDIATE)
+# so they wait for it instead of failing with "database is locked", and
+# connections are kept open between requests. WAL and incremental
+# auto-vacuum are stored in the database file, so the sqlite_maintenance
+# command switches them on once; setting them here would rewrite the file
+# on every connection. Only per-connection pragmas belong in this dict.
+SQLITE_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "busy_timeout": 20000,  # ms
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -32000,  # KiB
+    "temp_store": "MEMORY",
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "transaction_mode": "IMMEDIATE",
+            "init_command": ";".join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()),
+        },
     }
 }
 
+# Aliases in DATABASES holding read-only copies of "default" that reports,
+# exports and sample lists may read from (see Samples/routers.py), e.g. a
+# snapshot kept fresh by the refresh_read_snapshot command:
+#
+#     DATABASES["snapshot"] = {
+#         "ENGINE": "django.db.backends.sqlite3",
+#         "NAME": BASE_DIR / "db-snapshot.sqlite3",
+#         "OPTIONS": {"init_command": "PRAGMA query_only=1"},
+#         "TEST": {"MIRROR": "default"},
+#     }
+#     READ_DATABASES = ["snapshot"]
+READ_DATABASES = []
+# After a write, the same browser reads from "default" for this many seconds.
+READ_PIN_SECONDS = 5
+DATABASE_ROUTERS = ["Samples.routers.ReadReplicaRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -105,6 +145,31 @@ AUTH_PASSWORD_VALIDATORS = [
 
 
 
+AUTHENTICATION_BACKENDS = [
+    # ModelBackend with group/permission lookups cached across requests.
+    "Samples.roles.CachedModelBackend",
+]
+
+# "default" lives inside each process. Data that writes invalidate goes to
+# "shared", which every worker on this host sees; with web processes on
+# several hosts, point it at Redis or Memcached instead, e.g.
+# {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://127.0.0.1:6379"}.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+# Cached roles must be shared by every worker, or a revoked role would stay
+# valid in the others; on a per-process cache only the per-request memo is used.
+ROLES_CACHE = "shared"
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -136,6 +201,45 @@ STATIC_URL = "static/"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Built report rows are cached in this CACHES alias. It must be shared by all
+# web processes (see CACHES above); on a per-process cache reports are not cached.
+REPORT_RESULT_CACHE = 'shared'
+REPORT_RESULT_CACHE_TTL = 300
+REPORT_RESULT_CACHE_MAX_ROWS = 50000  # larger reports are streamed uncached
+
+# Background report exports (see Samples/jobs.py and the report_worker command)
+REPORT_CACHE_DIR = BASE_DIR / 'report_cache'
+REPORT_CACHE_TTL = 3600  # seconds a finished export is served from disk
+# PDF exports of at least REPORT_PDF_PARALLEL_MIN_ROWS rows are split across
+# this many processes per job (needs pypdf; 1 keeps rendering serial).
+REPORT_PDF_PROCESSES = 1
+REPORT_PDF_PARALLEL_MIN_ROWS = 20000
+
+# Audit entries older than AUDIT_HOT_DAYS are moved, a month at a time, into
+# compressed segments under AUDIT_ARCHIVE_DIR by the archive_auditlog command.
+AUDIT_ARCHIVE_DIR = BASE_DIR / 'audit_archive'
+AUDIT_HOT_DAYS = 180
+
+# Audit entries recorded outside a transaction are written by a background
+# thread in batches of up to AUDIT_BATCH_SIZE, at least every
+# AUDIT_FLUSH_INTERVAL seconds (see Samples/audit_writer.py). Set
+# AUDIT_BUFFERED = False to write every entry inline.
+AUDIT_BUFFERED = True
+AUDIT_BATCH_SIZE = 200
+AUDIT_FLUSH_INTERVAL = 0.5
+
+# Per-view latency, SQL and response-size metrics (Samples/metrics.py),
+# served in the Prometheus text format at /metrics to admins or to a scraper
+# sending "Authorization: Bearer <METRICS_TOKEN>". Requests slower than
+# METRICS_SLOW_REQUEST_SECONDS are logged to the "Samples.metrics" logger;
+# queries slower than METRICS_SLOW_QUERY_SECONDS are kept as samples.
+# Either threshold can be None to turn it off.
+METRICS_ENABLED = True
+METRICS_TOKEN = ''
+METRICS_SLOW_REQUEST_SECONDS = 1.0
+METRICS_SLOW_QUERY_SECONDS = 0.1
+METRICS_SLOW_QUERY_SAMPLES = 20
+
 # Auth redirects
 LOGIN_URL = '/users/login/'
 
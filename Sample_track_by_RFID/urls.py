@@ -22,6 +22,7 @@ from django.urls import path, include
 from django.shortcuts import redirect
 from django.conf import settings
 from django.conf.urls.static import static
+from Samples.views import metrics_view
 
 def root_redirect(request):
     return redirect('dashboard')
@@ -32,6 +33,7 @@ urlpatterns = [
     path("api/", include("Samples.urls")),
     path("users/", include("Users.urls")),
     path('i18n/', include('django.conf.urls.i18n')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,275 @@
+"""Monthly archive segments for old audit entries.
+
+``archive_auditlog`` moves complete months older than the retention
+horizon out of the ``AuditLog`` table into gzip-compressed JSON-lines
+segments under ``settings.AUDIT_ARCHIVE_DIR``. Each segment
+``auditlog-<YYYY-MM>-<first id>.jsonl.gz`` is written newest entry first
+and has a small ``.idx.json`` index (time and id range, counts per event
+and user, activity per day) so readers can skip segments that cannot
+match without decompressing them.
+
+Archived entries are denormalized: the username and sample number are
+stored with each entry, so they no longer depend on the related rows.
+:func:`read` and :func:`count` are what the reports use to see archived
+entries next to the hot table.
+"""
+import gzip
+import json
+import os
+import tempfile
+from collections import Counter, defaultdict
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AuditLog
+
+SEGMENT_SUFFIX = '.jsonl.gz'
+INDEX_SUFFIX = '.idx.json'
+
+_DELETE_CHUNK = 500
+
+
+def archive_dir():
+    return Path(getattr(settings, 'AUDIT_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'audit_archive'))
+
+
+def hot_days():
+    return getattr(settings, 'AUDIT_HOT_DAYS', 180)
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _aware(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+
+def cutoff_month(now=None, days=None):
+    """First month that stays hot: everything before it may be archived."""
+    horizon = timezone.localdate(now) - timedelta(days=hot_days() if days is None else days)
+    return _month_start(horizon)
+
+
+def segments():
+    """Index entries of every segment, newest first."""
+    directory = archive_dir()
+    if not directory.is_dir():
+        return []
+    found = []
+    for path in directory.glob(f'*{INDEX_SUFFIX}'):
+        with open(path, encoding='utf-8') as fh:
+            index = json.load(fh)
+        index['first_ts'] = datetime.fromisoformat(index['first_ts'])
+        index['last_ts'] = datetime.fromisoformat(index['last_ts'])
+        found.append(index)
+    found.sort(key=lambda index: (index['last_ts'], index['max_id']), reverse=True)
+    return found
+
+
+def _write_atomic(path, write):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            write(fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _record(log):
+    return {
+        'id': log.id,
+        'timestamp': log.timestamp.isoformat(),
+        'user_id': log.user_id,
+        'username': log.user.username,
+        'sample_id': log.sample_id,
+        'sample_number': log.sample.sample_number if log.sample_id else None,
+        'action': log.action,
+        'event_type': log.event_type,
+        'uid': log.uid,
+        'payload': log.payload,
+    }
+
+
+def _archive_month(month, using):
+    start, end = _aware(month), _aware(_next_month(month))
+    logs = (
+        AuditLog.objects.using(using)
+        .filter(timestamp__gte=start, timestamp__lt=end)
+        .select_related('user', 'sample')
+        .order_by('-timestamp', '-id')
+    )
+    ids = []
+    counts = defaultdict(Counter)
+    daily = defaultdict(Counter)
+    first_ts = last_ts = None
+
+    def write(fh):
+        nonlocal first_ts, last_ts
+        with gzip.GzipFile(fileobj=fh, mode='wb') as gz:
+            for log in logs.iterator(chunk_size=2000):
+                gz.write(json.dumps(_record(log), ensure_ascii=False).encode('utf-8') + b'\n')
+                ids.append(log.id)
+                counts[log.event_type][str(log.user_id)] += 1
+                daily[timezone.localdate(log.timestamp).isoformat()][log.event_type] += 1
+                last_ts = last_ts or log.timestamp
+                first_ts = log.timestamp
+
+    first_id = logs.order_by('id').values_list('id', flat=True).first()
+    if first_id is None:
+        return 0
+    name = f'auditlog-{month:%Y-%m}-{first_id}'
+    directory = archive_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    _write_atomic(directory / f'{name}{SEGMENT_SUFFIX}', write)
+    index = {
+        'name': name,
+        'file': f'{name}{SEGMENT_SUFFIX}',
+        'month': month.isoformat(),
+        'rows': len(ids),
+        'first_ts': first_ts.isoformat(),
+        'last_ts': last_ts.isoformat(),
+        'min_id': min(ids),
+        'max_id': max(ids),
+        'counts': {event: dict(users) for event, users in counts.items()},
+        'daily': {day: dict(events) for day, events in daily.items()},
+    }
+    _write_atomic(
+        directory / f'{name}{INDEX_SUFFIX}',
+        lambda fh: fh.write(json.dumps(index, ensure_ascii=False, indent=1).encode('utf-8')),
+    )
+    # Only drop the hot rows once the segment and its index are on disk.
+    with transaction.atomic(using=using):
+        for start_at in range(0, len(ids), _DELETE_CHUNK):
+            _delete(AuditLog.objects.using(using).filter(id__in=ids[start_at:start_at + _DELETE_CHUNK]), using)
+        _invalidate_reports(using)
+    return len(ids)
+
+
+def _delete(logs, using):
+    """Delete ``logs`` in SQL, without loading them or sending ``post_delete``
+    for each row (nothing references an audit entry); callers retire the
+    report cache once."""
+    return logs._raw_delete(using)
+
+
+def _invalidate_reports(using):
+    from . import report_cache
+
+    report_cache.invalidate(using)
+
+
+def _finish_interrupted(using):
+    """Delete hot rows that an interrupted run already wrote to a segment."""
+    removed = 0
+    for index in segments():
+        month = date.fromisoformat(index['month'])
+        removed += _delete(AuditLog.objects.using(using).filter(
+            timestamp__gte=_aware(month), timestamp__lt=_aware(_next_month(month)),
+            id__gte=index['min_id'], id__lte=index['max_id'],
+        ), using)
+    if removed:
+        _invalidate_reports(using)
+    return removed
+
+
+def pending_months(before, using='default'):
+    """Months with hot entries older than ``before`` (a month start), oldest first."""
+    oldest = AuditLog.objects.using(using).filter(timestamp__lt=_aware(before)).order_by('timestamp').values_list('timestamp', flat=True).first()
+    months = []
+    if oldest is not None:
+        month = _month_start(timezone.localdate(oldest))
+        while month < before:
+            months.append(month)
+            month = _next_month(month)
+    return months
+
+
+def archive(before=None, using='default'):
+    """Archive every complete month before ``before``; returns ``{month: rows}``."""
+    before = before or cutoff_month()
+    _finish_interrupted(using)
+    moved = {}
+    for month in pending_months(before, using):
+        rows = _archive_month(month, using)
+        if rows:
+            moved[month] = rows
+    return moved
+
+
+def _matches(index, start, end, event_types, user_id):
+    if start is not None and index['last_ts'] < start:
+        return False
+    if end is not None and index['first_ts'] >= end:
+        return False
+    events = index['counts'] if event_types is None else {e: index['counts'].get(e, {}) for e in event_types}
+    if user_id is None:
+        return any(events.values())
+    return any(users.get(str(user_id)) for users in events.values())
+
+
+def _covers(index, start, end):
+    return (start is None or index['first_ts'] >= start) and (end is None or index['last_ts'] < end)
+
+
+def _scan(index, start, end, event_types, user_id):
+    with gzip.open(archive_dir() / index['file'], 'rt', encoding='utf-8') as fh:
+        for line in fh:
+            record = json.loads(line)
+            if event_types is not None and record['event_type'] not in event_types:
+                continue
+            if user_id is not None and record['user_id'] != user_id:
+                continue
+            record['timestamp'] = datetime.fromisoformat(record['timestamp'])
+            if end is not None and record['timestamp'] >= end:
+                continue
+            if start is not None and record['timestamp'] < start:
+                # Segments are written newest first.
+                return
+            yield record
+
+
+def read(start=None, end=None, event_types=None, user_id=None):
+    """Yield archived entries (as dicts, newest first) in ``[start, end)``."""
+    for index in segments():
+        if _matches(index, start, end, event_types, user_id):
+            yield from _scan(index, start, end, event_types, user_id)
+
+
+def count(start=None, end=None, event_types=None, user_id=None):
+    """Number of entries :func:`read` would yield; segments lying entirely
+    inside the range are answered from their index alone."""
+    total = 0
+    for index in segments():
+        if not _matches(index, start, end, event_types, user_id):
+            continue
+        if not _covers(index, start, end):
+            total += sum(1 for _ in _scan(index, start, end, event_types, user_id))
+            continue
+        for event, users in index['counts'].items():
+            if event_types is None or event in event_types:
+                total += sum(users.values()) if user_id is None else users.get(str(user_id), 0)
+    return total
+
+
+def daily_activity():
+    """``{(day, event_type): n}`` over all segments, for the dashboard counters."""
+    activity = Counter()
+    for index in segments():
+        for day, events in index['daily'].items():
+            for event, n in events.items():
+                activity[(date.fromisoformat(day), event)] += n
+    return activity
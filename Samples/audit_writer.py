@@ -0,0 +1,148 @@
+"""Buffered audit writes.
+
+:meth:`AuditLogManager.record <Samples.models.AuditLogManager.record>`
+hands entries to the process-wide :data:`writer` instead of inserting
+them one by one; a background thread writes what has accumulated with a
+single ``bulk_create`` per batch (group commit) once ``AUDIT_BATCH_SIZE``
+entries are waiting or ``AUDIT_FLUSH_INTERVAL`` seconds have passed.
+Deferred entries keep the timestamp they were built with, not the time
+of the write.
+
+Entries are still written inline when buffering is disabled
+(``AUDIT_BUFFERED = False``), when the caller asks for it (``strict=True``
+or one of :data:`STRICT_EVENTS`), when the current connection is inside a
+transaction (the entry must commit or roll back with it) and when the
+buffer is full. :meth:`AuditWriter.flush` writes everything pending
+synchronously; it runs at interpreter exit as well.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from . import report_cache, stats
+from .events import audit_event, publish_on_commit
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Account administration is audited inline: it must never be lost.
+STRICT_EVENTS = frozenset({
+    AuditLog.Event.USER_CREATE,
+    AuditLog.Event.USER_ACTIVATE,
+    AuditLog.Event.USER_DEACTIVATE,
+    AuditLog.Event.USER_ROLE_CHANGE,
+    AuditLog.Event.PASSWORD_RESET,
+})
+
+
+def enabled():
+    return getattr(settings, 'AUDIT_BUFFERED', True)
+
+
+class AuditWriter:
+    def __init__(self, batch_size=None, flush_interval=None, max_pending=None, autostart=True):
+        self.batch_size = batch_size or getattr(settings, 'AUDIT_BATCH_SIZE', 200)
+        self.flush_interval = flush_interval or getattr(settings, 'AUDIT_FLUSH_INTERVAL', 0.5)
+        # Beyond this, callers write inline instead of growing the buffer.
+        self.max_pending = max_pending or self.batch_size * 10
+        self.autostart = autostart
+        self.stats = Counter()
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = None
+
+    def submit(self, entry, sample_number=None):
+        """Queue an unsaved entry; returns False if the caller must save it itself."""
+        if self._closed:
+            return False
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.stats['overflows'] += 1
+                return False
+            self._pending.append((entry, sample_number))
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+        if self.autostart:
+            self._start()
+        return True
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception:
+                logger.exception('Audit writer flush failed')
+
+    def flush(self):
+        """Write every pending entry now; returns how many were written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+                if not batch:
+                    return written
+                try:
+                    self._write(batch)
+                except Exception:
+                    # Isolate the entry that cannot be written instead of retrying the batch forever.
+                    logger.exception('Audit batch of %d entries failed; writing them one by one', len(batch))
+                    failed = []
+                    for item in batch:
+                        try:
+                            self._write([item])
+                        except Exception:
+                            logger.exception('Dropped audit entry %r', item[0].action)
+                            failed.append(item)
+                    self.stats['dropped'] += len(failed)
+                    batch = [item for item in batch if item not in failed]
+                written += len(batch)
+                self.stats['batches'] += 1
+                self.stats['entries'] += len(batch)
+
+    def _write(self, batch):
+        entries = [entry for entry, _ in batch]
+        with transaction.atomic():
+            AuditLog.objects.bulk_create(entries)
+            # bulk_create bypasses the signal handlers that keep these current.
+            delta = Counter()
+            for entry in entries:
+                delta.update(stats.activity_delta(entry.event_type, entry.timestamp))
+            stats.apply(delta)
+            report_cache.invalidate()
+            publish_on_commit(
+                audit_event(entry, sample_number) for entry, sample_number in batch if sample_number is not None
+            )
+
+    def close(self):
+        """Stop the background thread and write what is left."""
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval * 4)
+        self.flush()
+
+
+writer = AuditWriter()
+atexit.register(writer.close)
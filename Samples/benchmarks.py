@@ -0,0 +1,112 @@
+"""Timings of the hot request paths against the current database.
+
+Each case is one GET through the test client, logged in as the
+``bench-admin`` user created by :mod:`Samples.datagen`. Streaming
+responses are consumed completely. Every case is timed ``repeat`` times
+without instrumentation (the best time is kept), then run once more
+while counting queries and tracing allocations for the peak memory.
+The report cache is cleared before every run so the reports are built
+from the database each time.
+"""
+import time
+import tracemalloc
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from . import report_cache
+from .datagen import END_DATE
+
+# Runs quicker than this are within noise and never count as regressions.
+MIN_SECONDS = 0.005
+
+
+def cases(end=END_DATE):
+    """``{name: url}`` of the benchmarked requests."""
+    month = f'from_date={end - timedelta(days=29)}&to_date={end}'
+    return {
+        'sample_list': '/api/samples/web/',
+        'sample_list_filtered': '/api/samples/web/?sample_type=دم&category=جنائية',
+        'sample_list_deep_page': '/api/samples/web/?date=' + str(end - timedelta(days=180)),
+        'search': '/api/samples/search/?q=سارة',
+        'api_list': '/api/samples/?page_size=100',
+        'api_list_sparse': '/api/samples/?page_size=500&fields=sample_number,status',
+        'export_samples': '/api/samples/export/?category=أبوة',
+        'report_samples_month': f'/api/reports/?report_type=samples&{month}',
+        'report_rfid_month': f'/api/reports/?report_type=rfid&{month}',
+        'report_audit_month': f'/api/reports/?report_type=audit&{month}',
+        'export_report_excel_month': f'/api/reports/export/excel/?report_type=approval&{month}',
+        'dashboard': '/api/dashboard/',
+    }
+
+
+def _consume(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def _request(client, url):
+    report_cache.invalidate()
+    response = client.get(url)
+    size = _consume(response)
+    return response.status_code, size
+
+
+def run_case(client, url, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        status, size = _request(client, url)
+        timings.append(time.perf_counter() - started)
+
+    with ExitStack() as stack:
+        # Every alias, so reads sent to a replica are counted too.
+        captured = [stack.enter_context(CaptureQueriesContext(connection)) for connection in connections.all()]
+        tracemalloc.start()
+        try:
+            _request(client, url)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {
+        'status': status,
+        'seconds': round(min(timings), 4),
+        'median_seconds': round(sorted(timings)[len(timings) // 2], 4),
+        'queries': sum(len(queries) for queries in captured),
+        'peak_kb': round(peak / 1024),
+        'bytes': size,
+    }
+
+
+def run(user, names=None, repeat=3, end=END_DATE, progress=None, host='localhost'):
+    # ``host`` must pass ALLOWED_HOSTS; localhost does whenever DEBUG is on.
+    client = Client(HTTP_HOST=host)
+    client.force_login(user)
+    results = {}
+    for name, url in cases(end).items():
+        if names and name not in names:
+            continue
+        results[name] = run_case(client, url, repeat)
+        if progress:
+            progress(name, results[name])
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """``[(case, metric, baseline, current)]`` for every metric that got worse."""
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if current['seconds'] > max(before['seconds'] * (1 + tolerance), before['seconds'] + MIN_SECONDS):
+            regressions.append((name, 'seconds', before['seconds'], current['seconds']))
+        if current['queries'] > before['queries']:
+            regressions.append((name, 'queries', before['queries'], current['queries']))
+        if current['peak_kb'] > before['peak_kb'] * (1 + tolerance) + 64:
+            regressions.append((name, 'peak_kb', before['peak_kb'], current['peak_kb']))
+    return regressions
@@ -0,0 +1,41 @@
+"""Which cache aliases every web process shares.
+
+Role data (``Samples.roles``) and built reports (``Samples.report_cache``)
+are kept across requests and retired by writes. That is only correct
+when every worker reads and invalidates the same cache, so both features
+turn themselves off on a per-process backend (``LocMemCache``) or one
+that keeps nothing (``DummyCache``). ``manage.py check`` warns when that
+happens.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Setting naming a cache alias -> what stops working without a shared one.
+FEATURES = {
+    'ROLES_CACHE': 'group and permission lookups are repeated on every request',
+    'REPORT_RESULT_CACHE': 'reports are not cached and concurrent requests are not coalesced',
+}
+
+
+def is_shared(alias):
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    return bool(backend) and backend not in PROCESS_LOCAL
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    warnings = []
+    for number, (setting, effect) in enumerate(FEATURES.items(), start=1):
+        alias = getattr(settings, setting, 'default')
+        if not is_shared(alias):
+            warnings.append(Warning(
+                f'{setting} points at the per-process cache {alias!r}; {effect}.',
+                hint='Point it at a cache every web process shares (Redis, Memcached, or the file-based "shared" alias).',
+                id=f'Samples.W00{number}',
+            ))
+    return warnings
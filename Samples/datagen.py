@@ -0,0 +1,147 @@
+"""Deterministic synthetic datasets for benchmarking.
+
+:func:`generate` writes ``size`` samples (each with its RFID tag) and the
+audit events of their workflow with batched ``bulk_create``; the same
+``size`` and ``seed`` always produce the same rows. Generated samples are
+numbered ``BENCH-<n>`` so they cannot collide with real ones, and the
+search index, the daily counters and the report cache are brought up to
+date once at the end rather than row by row.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.utils import timezone
+
+from . import report_cache, search, stats
+from .models import AuditLog, RFIDTag, Sample
+from .roles import ADMIN, OPERATOR
+
+PREFIX = 'BENCH-'
+BENCH_ADMIN = 'bench-admin'
+BATCH_SIZE = 5000
+# Latest collection date, fixed so a seed always yields the same rows.
+END_DATE = date(2026, 1, 31)
+
+SAMPLE_TYPES = ('دم', 'لعاب', 'شعر', 'أنسجة', 'بول', 'عظام')
+CATEGORIES = ('جنائية', 'طب شرعي', 'طبية', 'أبوة')
+LOCATIONS = ('الرياض', 'جدة', 'مكة', 'الدمام', 'المدينة', 'أبها')
+FIRST_NAMES = ('يوسف', 'سارة', 'خالد', 'نورة', 'محمد', 'فاطمة', 'عبدالله', 'ريم', 'Omar', 'Lina')
+LAST_NAMES = ('أحمد', 'محمد', 'علي', 'الحربي', 'القحطاني', 'العتيبي', 'Hassan', 'Saleh')
+# Share of samples left in each status.
+STATUS_WEIGHTS = (('pending', 30), ('checked', 25), ('approved', 35), ('rejected', 10))
+
+
+def bench_users(count=5):
+    """The operators that generated events are attributed to, plus an admin."""
+    admin_group, _ = Group.objects.get_or_create(name=ADMIN)
+    operator_group, _ = Group.objects.get_or_create(name=OPERATOR)
+    admin, created = User.objects.get_or_create(username=BENCH_ADMIN, defaults={'is_superuser': True, 'is_staff': True})
+    if created:
+        admin.groups.add(admin_group)
+    operators = []
+    for n in range(count):
+        user, created = User.objects.get_or_create(username=f'bench-operator-{n}')
+        if created:
+            user.groups.add(operator_group)
+        operators.append(user)
+    return admin, operators
+
+
+def bench_admin():
+    """The admin created by :func:`generate`, or ``None`` on a database it never filled."""
+    return User.objects.filter(username=BENCH_ADMIN).first()
+
+
+def existing():
+    return Sample.objects.filter(sample_number__startswith=PREFIX).count()
+
+
+def _sample(rng, n, end, days, tz):
+    statuses, weights = zip(*STATUS_WEIGHTS)
+    status = rng.choices(statuses, weights)[0]
+    collected = end - timedelta(days=rng.randrange(days))
+    at = timezone.make_aware(datetime.combine(collected, time(8)), tz) + timedelta(minutes=rng.randrange(600))
+    return {
+        'sample_number': f'{PREFIX}{n:08d}',
+        'sample_type': rng.choice(SAMPLE_TYPES),
+        'category': rng.choice(CATEGORIES),
+        'person_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+        'collected_date': collected,
+        'location': rng.choice(LOCATIONS),
+        'status': status,
+        'at': at,
+    }
+
+
+def _workflow(rng, row, operators):
+    """``(event, timestamp, user)`` steps that lead to the sample's status."""
+    steps = []
+    at = row['at']
+    if row['status'] in ('checked', 'approved') or (row['status'] == 'rejected' and rng.random() < 0.5):
+        at += timedelta(minutes=rng.randrange(5, 240))
+        steps.append((AuditLog.Event.RFID_CHECK, at, rng.choice(operators)))
+    if row['status'] == 'approved':
+        at += timedelta(minutes=rng.randrange(5, 2880))
+        steps.append((AuditLog.Event.APPROVE, at, rng.choice(operators)))
+    if row['status'] == 'rejected':
+        at += timedelta(minutes=rng.randrange(5, 2880))
+        steps.append((AuditLog.Event.REJECT, at, rng.choice(operators)))
+    return steps
+
+
+def _write_batch(rows, operators, rng):
+    snapshot = {AuditLog.Event.RFID_CHECK: 'checked', AuditLog.Event.APPROVE: 'approved', AuditLog.Event.REJECT: 'rejected'}
+    with transaction.atomic():
+        tags = RFIDTag.objects.bulk_create([RFIDTag(uid=f'RFID-{row["sample_number"]}') for row in rows], batch_size=BATCH_SIZE)
+        samples, steps, updated = [], [], []
+        for row, tag in zip(rows, tags):
+            workflow = _workflow(rng, row, operators)
+            sample = Sample(rfid=tag, **{k: v for k, v in row.items() if k != 'at'})
+            for event, at, user in workflow:
+                setattr(sample, f'{snapshot[event]}_at', at)
+                setattr(sample, f'{snapshot[event]}_by', user)
+            samples.append(sample)
+            steps.append(workflow)
+            updated.append(workflow[-1][1] if workflow else row['at'])
+        Sample.objects.bulk_create(samples, batch_size=BATCH_SIZE)
+        entries = []
+        for sample, workflow in zip(samples, steps):
+            for event, at, user in workflow:
+                payload = {'uid': sample.rfid.uid} if event == AuditLog.Event.RFID_CHECK else {}
+                entry = AuditLog.objects.build(user, event, **payload)
+                entry.sample = sample
+                entry.timestamp = at
+                entries.append(entry)
+        AuditLog.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+        # auto_now stamped the inserts with the current time; write the historical
+        # values afterwards (bulk_update does not run pre_save).
+        for sample, at in zip(samples, updated):
+            sample.updated_at = at
+        Sample.objects.bulk_update(samples, ['updated_at'], batch_size=BATCH_SIZE)
+    return len(entries)
+
+
+def generate(size, seed=0, days=365, end=None, progress=None):
+    """Create ``size`` samples with tags and audit events; returns ``(samples, events)``.
+
+    ``end`` is the latest collection date (default: :data:`END_DATE`) and samples are
+    spread over the ``days`` before it. ``progress(done, size)`` is called
+    after every batch.
+    """
+    end = end or END_DATE
+    tz = timezone.get_current_timezone()
+    rng = random.Random(seed)
+    _, operators = bench_users()
+    events = 0
+    for start in range(0, size, BATCH_SIZE):
+        rows = [_sample(rng, n, end, days, tz) for n in range(start, min(start + BATCH_SIZE, size))]
+        events += _write_batch(rows, operators, rng)
+        if progress:
+            progress(start + len(rows), size)
+    # The bulk writes skipped the signal handlers that keep these current.
+    search.rebuild_index()
+    stats.rebuild()
+    report_cache.invalidate()
+    return size, events
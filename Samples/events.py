@@ -0,0 +1,101 @@
+"""In-process publish/subscribe for live sample updates.
+
+Transition code publishes plain dict events after its transaction commits;
+each Server-Sent Events connection holds a :class:`Subscription` whose
+asyncio queue is fed from whichever thread published the event.
+"""
+import asyncio
+import threading
+
+from django.db import transaction
+
+STATUS = 'status'
+AUDIT = 'audit'
+
+
+class Subscription:
+    def __init__(self, broker, sample_number=None, maxsize=100):
+        self.broker = broker
+        self.sample_number = sample_number
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def matches(self, event):
+        return self.sample_number is None or event.get('sample_number') == self.sample_number
+
+    def _put(self, event):
+        # Slow consumers lose their oldest events rather than growing without bound.
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The subscriber's event loop has already shut down.
+            self.close()
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+
+    def subscribe(self, sample_number=None):
+        subscription = Subscription(self, sample_number)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.matches(event):
+                subscription.deliver(event)
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+
+broker = EventBroker()
+
+
+def publish_on_commit(events, using='default'):
+    """Publish ``events`` once the surrounding transaction (if any) commits."""
+    events = list(events)
+    if events:
+        transaction.on_commit(lambda: [broker.publish(event) for event in events], using=using)
+
+
+def status_event(sample_number, status, previous=None):
+    from .models import Sample
+    return {
+        'type': STATUS,
+        'sample_number': sample_number,
+        'status': status,
+        'status_display': dict(Sample.STATUS_CHOICES).get(status, status),
+        'previous': previous,
+    }
+
+
+def audit_event(entry, sample_number):
+    return {
+        'type': AUDIT,
+        'sample_number': sample_number,
+        'event_type': entry.event_type,
+        'action': entry.action,
+        'user_id': entry.user_id,
+        'timestamp': entry.timestamp.isoformat() if entry.timestamp else None,
+    }
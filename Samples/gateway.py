@@ -0,0 +1,179 @@
+"""Asyncio gateway between RFID readers and the sample workflow.
+
+Readers connect over TCP and send one read per line, either ``<uid>`` or
+``<reader_id> <uid>``; blank lines and lines starting with ``#`` are
+ignored. Repeated reads of the same tag inside the de-duplication window
+are dropped, and the rest are handed to :func:`ingest_rfid_reads` in
+batches from a single database thread.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, connection
+
+from .transitions import ingest_rfid_reads
+
+logger = logging.getLogger(__name__)
+
+
+class ReadDeduplicator:
+    def __init__(self, window):
+        self.window = window
+        self._seen = {}
+
+    def accept(self, uid, now):
+        last = self._seen.get(uid)
+        if last is not None and now - last < self.window:
+            return False
+        self._seen[uid] = now
+        return True
+
+    def prune(self, now):
+        cutoff = now - self.window
+        self._seen = {uid: seen for uid, seen in self._seen.items() if seen >= cutoff}
+
+
+def _close_connection():
+    # Runs on the gateway's database thread, which owns the connection.
+    connection.close()
+
+
+def parse_line(line):
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    return line.split()[-1]
+
+
+class RFIDGateway:
+    def __init__(self, user, host='0.0.0.0', port=7000, dedup_window=2.0, batch_size=500,
+                 flush_interval=0.25, ingest=ingest_rfid_reads):
+        self.user = user
+        self.host = host
+        self.port = port
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.ingest = ingest
+        self.dedup = ReadDeduplicator(dedup_window)
+        self.stats = Counter()
+        self._pending = []
+        self._batch_ready = asyncio.Event()
+        self._server = None
+        # One worker thread owns the database connection for every batch.
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rfid-gateway-db')
+
+    def submit(self, uid):
+        """Queue one read; returns False if it was a duplicate."""
+        self.stats['reads'] += 1
+        if not self.dedup.accept(uid, time.monotonic()):
+            self.stats['duplicates'] += 1
+            return False
+        self._pending.append(uid)
+        if len(self._pending) >= self.batch_size:
+            self._batch_ready.set()
+        return True
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_reader, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info('RFID gateway listening on %s:%s', self.host, self.port)
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        flusher = asyncio.create_task(self._flush_loop())
+        try:
+            await self._server.serve_forever()
+        finally:
+            flusher.cancel()
+            await self.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._db, _close_connection)
+        self._db.shutdown(wait=True)
+
+    async def _handle_reader(self, reader, writer):
+        self.stats['connections'] += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                uid = parse_line(line.decode('utf-8', 'replace'))
+                if uid:
+                    self.submit(uid)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except (ValueError, asyncio.LimitOverrunError):
+            # A line over the stream limit: drop the connection, the reader
+            # reconnects and later lines are read normally.
+            self.stats['overlong_lines'] += 1
+            logger.warning('RFID reader %s sent an over-long line; dropping the connection',
+                           writer.get_extra_info('peername'))
+        finally:
+            writer.close()
+
+    async def _flush_loop(self):
+        last_prune = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+            now = time.monotonic()
+            if now - last_prune >= self.dedup.window:
+                self.dedup.prune(now)
+                last_prune = now
+
+    async def flush(self):
+        self._batch_ready.clear()
+        while self._pending:
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            loop = asyncio.get_running_loop()
+            try:
+                results = await loop.run_in_executor(self._db, self._ingest, batch)
+            except Exception:
+                logger.exception('RFID batch of %d reads failed', len(batch))
+                self.stats['failed_reads'] += len(batch)
+                continue
+            self.stats['batches'] += 1
+            self.stats.update(results.values())
+
+    def _ingest(self, batch):
+        close_old_connections()
+        return self.ingest(batch, self.user)
+
+
+async def simulate_readers(host, port, uids, readers=4, rate=100.0, duration=10.0, seed=None):
+    """Stand-in for reader hardware: each reader sends random tag reads at ``rate`` per second."""
+    rng = random.Random(seed)
+
+    async def run_reader(reader_id):
+        _, writer = await asyncio.open_connection(host, port)
+        interval = 1.0 / rate
+        deadline = time.monotonic() + duration
+        sent = 0
+        try:
+            while time.monotonic() < deadline:
+                writer.write(f'reader-{reader_id} {rng.choice(uids)}\n'.encode())
+                sent += 1
+                if sent % 50 == 0:
+                    await writer.drain()
+                await asyncio.sleep(interval)
+            await writer.drain()
+        finally:
+            writer.close()
+            await writer.wait_closed()
+        return sent
+
+    return sum(await asyncio.gather(*(run_reader(i) for i in range(readers))))
@@ -0,0 +1,306 @@
+"""Bulk sample import from CSV, XLSX or a list of dicts.
+
+Rows are read as a stream (:func:`read_csv`, :func:`read_xlsx`), checked
+with the field rules of :class:`~Samples.forms.SampleForm` plus the sample
+number and RFID UID, and written in chunks: each chunk upserts its tags,
+inserts its samples with ``bulk_create`` and updates the search index and
+daily counters in one transaction. Rows that fail are skipped and
+reported with their row number; they never abort the import.
+
+Headers are matched case-insensitively, and the headers of the sample
+export (``Sample Number``, ``Type``, ``Date``, ``RFID``, ...) are
+accepted, so an export can be imported again.
+"""
+import csv
+import io
+from collections import Counter
+import re
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import report_cache, search, stats
+from .forms import SampleForm
+from .models import AuditLog, RFIDTag, Sample
+
+# Keeps the IN (...) lookups of a chunk below SQLite's bound-parameter limit.
+CHUNK_SIZE = 900
+
+# Normalized header -> field.
+HEADER_ALIASES = {
+    'sample_number': 'sample_number',
+    'rfid_uid': 'rfid_uid',
+    'rfid': 'rfid_uid',
+    'uid': 'rfid_uid',
+    'sample_type': 'sample_type',
+    'type': 'sample_type',
+    'category': 'category',
+    'person_name': 'person_name',
+    'collected_date': 'collected_date',
+    'date': 'collected_date',
+    'location': 'location',
+    'status': 'status',
+}
+
+ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+STATUSES = {value for value, _ in Sample.STATUS_CHOICES}
+# Workflow snapshots stamped on samples imported with a later status, as
+# the transitions in Samples.transitions would have left them.
+SNAPSHOTS = {'checked': ('checked',), 'approved': ('checked', 'approved'), 'rejected': ('rejected',)}
+
+
+def _fields():
+    fields = {name: field for name, field in SampleForm.base_fields.items()}
+    fields['sample_number'] = Sample._meta.get_field('sample_number').formfield()
+    fields['rfid_uid'] = RFIDTag._meta.get_field('uid').formfield()
+    return fields
+
+
+def _iso_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return value  # Left for the form field to reject.
+
+
+def _normalize_header(value):
+    return HEADER_ALIASES.get(str(value or '').strip().lower().replace(' ', '_'))
+
+
+def _cell(value):
+    if isinstance(value, float) and value.is_integer():
+        # Spreadsheets store long sample numbers as numbers.
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _records(header, rows):
+    """Yield ``(row_number, record)``, numbered as in a spreadsheet (header is row 1)."""
+    columns = [_normalize_header(name) for name in header]
+    for number, values in enumerate(rows, start=2):
+        if not any(value not in (None, '') for value in values):
+            continue
+        yield number, {column: _cell(value) for column, value in zip(columns, values) if column}
+
+
+def read_csv(fileobj):
+    """Yield ``(row_number, record)`` from a CSV file (UTF-8, optional BOM)."""
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        reader = csv.reader(text)
+        yield from _records(next(reader, []), reader)
+    finally:
+        # Leave ``fileobj`` open for the caller.
+        text.detach()
+
+
+def read_xlsx(fileobj):
+    """Yield ``(row_number, record)`` from the first sheet, in openpyxl read-only mode."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        yield from _records(next(rows, ()), rows)
+    finally:
+        workbook.close()
+
+
+def read_dicts(items):
+    """Yield ``(row_number, record)`` from a list of dicts, e.g. a JSON body (numbered from 1)."""
+    for number, item in enumerate(items, start=1):
+        yield number, {HEADER_ALIASES.get(key, key): _cell(value) for key, value in item.items()}
+
+
+def _is_xlsx(name):
+    return name.lower().endswith(('.xlsx', '.xlsm'))
+
+
+def read_file(fileobj, name):
+    if _is_xlsx(name):
+        return read_xlsx(fileobj)
+    return read_csv(fileobj)
+
+
+def check_file(fileobj, name):
+    """Parse a whole CSV file once, so a bad byte or malformed line near the
+    end fails before the first chunk is written; rewinds ``fileobj``.
+
+    Raises ``ValueError`` (including ``UnicodeDecodeError``) or
+    ``csv.Error``. XLSX files are checked when they are opened.
+    """
+    if not _is_xlsx(name):
+        for _ in read_csv(fileobj):
+            pass
+    fileobj.seek(0)
+
+
+class ImportResult:
+    def __init__(self, max_errors=None, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        self.tags_created = 0
+        self.error_count = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def error(self, row, errors):
+        self.error_count += 1
+        if self.max_errors is None or len(self.errors) < self.max_errors:
+            self.errors.append({'row': row, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'dry_run': self.dry_run,
+            'rows': self.rows,
+            'created': self.created,
+            'tags_created': self.tags_created,
+            'failed': self.error_count,
+            'errors': self.errors,
+        }
+
+
+class SampleImporter:
+    """Validates and writes records; feed it with :meth:`run`.
+
+    With ``dry_run`` nothing is written and ``created`` counts the rows
+    that would have been. ``keep_status`` accepts a ``status`` column (for
+    migrating legacy records), and stamps the checked/approved/rejected
+    snapshot of such samples with the importing user and the import time;
+    otherwise every imported sample starts as pending.
+    ``on_error(row, errors)`` sees every failed row, e.g. to write a full
+    error report, while the result only keeps the first ``max_errors``.
+    """
+
+    def __init__(self, user=None, chunk_size=CHUNK_SIZE, keep_status=False, dry_run=False, max_errors=None, on_error=None):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.keep_status = keep_status
+        self.dry_run = dry_run
+        self.on_error = on_error
+        self.result = ImportResult(max_errors, dry_run)
+        self._fields = _fields()
+        self._numbers = set()
+        self._uids = set()
+
+    def _fail(self, row, errors):
+        self.result.error(row, errors)
+        if self.on_error:
+            self.on_error(row, errors)
+
+    def _clean(self, record):
+        cleaned, errors = {}, {}
+        for name, field in self._fields.items():
+            value = record.get(name)
+            if isinstance(value, str):
+                value = value.strip()
+                if name == 'collected_date' and ISO_DATE.fullmatch(value):
+                    # The form field tries every localized input format first.
+                    value = _iso_date(value)
+            try:
+                cleaned[name] = field.clean(value)
+            except ValidationError as exc:
+                errors[name] = exc.messages
+        status = str(record.get('status') or 'pending').strip()
+        if not self.keep_status:
+            status = 'pending'
+        elif status not in STATUSES:
+            errors['status'] = [f'Expected one of: {", ".join(sorted(STATUSES))}.']
+        cleaned['status'] = status
+        if not errors:
+            if cleaned['sample_number'] in self._numbers:
+                errors['sample_number'] = ['Duplicate sample number in this file.']
+            if cleaned['rfid_uid'] in self._uids:
+                errors['rfid_uid'] = ['Duplicate RFID UID in this file.']
+        return cleaned, errors
+
+    def run(self, records):
+        """Import ``(row_number, record)`` pairs; returns the :class:`ImportResult`."""
+        self._now = timezone.now()
+        chunk = []
+        try:
+            for row, record in records:
+                self.result.rows += 1
+                cleaned, errors = self._clean(record)
+                if errors:
+                    self._fail(row, errors)
+                    continue
+                self._numbers.add(cleaned['sample_number'])
+                self._uids.add(cleaned['rfid_uid'])
+                chunk.append((row, cleaned))
+                if len(chunk) >= self.chunk_size:
+                    self._write(chunk)
+                    chunk = []
+            if chunk:
+                self._write(chunk)
+        finally:
+            # Chunks written before a failure stay imported, and are audited.
+            if self.result.created and self.user is not None and not self.dry_run:
+                AuditLog.objects.record(self.user, AuditLog.Event.OTHER, text=f'استيراد {self.result.created} عينة')
+        return self.result
+
+    def _conflicts(self, chunk):
+        """Split ``chunk`` into rows that can be inserted and ``(row, errors)`` for the rest."""
+        numbers = set(Sample.objects.filter(sample_number__in=[c['sample_number'] for _, c in chunk])
+                      .values_list('sample_number', flat=True))
+        linked = set(RFIDTag.objects.filter(uid__in=[c['rfid_uid'] for _, c in chunk], sample__isnull=False)
+                     .values_list('uid', flat=True))
+        accepted, rejected = [], []
+        for row, cleaned in chunk:
+            errors = {}
+            if cleaned['sample_number'] in numbers:
+                errors['sample_number'] = ['A sample with this number already exists.']
+            if cleaned['rfid_uid'] in linked:
+                errors['rfid_uid'] = ['This RFID tag is already assigned to a sample.']
+            if errors:
+                rejected.append((row, errors))
+            else:
+                accepted.append((row, cleaned))
+        return accepted, rejected
+
+    def _write(self, chunk):
+        for attempt in range(2):
+            accepted, rejected = self._conflicts(chunk)
+            if self.dry_run:
+                self.result.created += len(accepted)
+                break
+            try:
+                with transaction.atomic():
+                    self._insert(accepted)
+                break
+            except IntegrityError:
+                # Another writer took a number or tag since the check; check once more.
+                if attempt:
+                    raise
+        for row, errors in rejected:
+            self._fail(row, errors)
+
+    def _insert(self, accepted):
+        if not accepted:
+            return
+        uids = [cleaned['rfid_uid'] for _, cleaned in accepted]
+        before = RFIDTag.objects.filter(uid__in=uids).count()
+        RFIDTag.objects.bulk_create([RFIDTag(uid=uid) for uid in uids], ignore_conflicts=True)
+        tags = dict(RFIDTag.objects.filter(uid__in=uids).values_list('uid', 'id'))
+        samples = []
+        delta = Counter()
+        for _, cleaned in accepted:
+            fields = {name: value for name, value in cleaned.items() if name != 'rfid_uid'}
+            for snapshot in SNAPSHOTS.get(fields['status'], ()):
+                fields[f'{snapshot}_at'] = self._now
+                fields[f'{snapshot}_by'] = self.user
+            samples.append(Sample(rfid_id=tags[cleaned['rfid_uid']], **fields))
+            delta.update(stats.sample_delta(None, (fields['collected_date'], fields['sample_type'], fields['category'], fields['status'])))
+        Sample.objects.bulk_create(samples)
+        # bulk_create skips the signal handlers that maintain these.
+        search.index_samples([(sample.pk, sample.sample_number, sample.person_name) for sample in samples])
+        stats.apply(delta)
+        report_cache.invalidate()
+        self.result.tags_created += len(uids) - before
+        self.result.created += len(samples)
@@ -0,0 +1,212 @@
+"""Database-backed queue for report exports.
+
+Web requests only insert a :class:`~Samples.models.ReportJob`; the
+``report_worker`` command claims queued jobs and renders them in a process
+pool. Finished files are kept under ``settings.REPORT_CACHE_DIR``, named by
+a hash of the report parameters and the data version, so a repeated export
+within ``settings.REPORT_CACHE_TTL`` seconds is served straight from disk
+until the next write to the samples or the audit log.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+# Rows rendered between two progress updates.
+PROGRESS_EVERY = 1000
+
+_ACTIVE = (ReportJob.Status.QUEUED, ReportJob.Status.RUNNING)
+
+
+def cache_dir():
+    path = Path(getattr(settings, 'REPORT_CACHE_DIR', Path(settings.BASE_DIR) / 'report_cache'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def cache_ttl():
+    return getattr(settings, 'REPORT_CACHE_TTL', 3600)
+
+
+def cache_key(report_type, from_date, to_date, user_id, format):
+    from .report_cache import data_version
+    raw = json.dumps([report_type, from_date, to_date, user_id, format, data_version()])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def result_path(key, format):
+    return cache_dir() / f'{key}.{format}'
+
+
+def cached_file(key, format):
+    """Return the cached result for ``key`` if it exists and has not expired."""
+    path = result_path(key, format)
+    try:
+        age = time.time() - path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    return path if age < cache_ttl() else None
+
+
+def download_name(report_type, format):
+    from .reports import REPORTS
+    spec = REPORTS.get(report_type, REPORTS['samples'])
+    return f'{spec.title}.{format}'
+
+
+def submit(user, report_type, from_date='', to_date='', user_id='', format=ReportJob.Format.XLSX):
+    """Queue an export for ``user`` and return its job.
+
+    A fresh cached file completes the job immediately, and an export the
+    user already has queued or running for the same parameters is reused.
+    """
+    key = cache_key(report_type, from_date, to_date, user_id, format)
+    fields = dict(
+        user=user,
+        report_type=report_type,
+        from_date=from_date,
+        to_date=to_date,
+        filter_user_id=user_id,
+        format=format,
+        cache_key=key,
+        file_name=download_name(report_type, format),
+    )
+    if cached_file(key, format):
+        now = timezone.now()
+        return ReportJob.objects.create(status=ReportJob.Status.DONE, started_at=now, finished_at=now, **fields)
+    existing = ReportJob.objects.filter(user=user, cache_key=key, status__in=_ACTIVE).first()
+    if existing is not None:
+        return existing
+    return ReportJob.objects.create(**fields)
+
+
+def claim_next():
+    """Atomically move the oldest queued job to ``running`` and return its id."""
+    while True:
+        job_id = (
+            ReportJob.objects.filter(status=ReportJob.Status.QUEUED)
+            .order_by('created_at').values_list('id', flat=True).first()
+        )
+        if job_id is None:
+            return None
+        # Another worker may claim the same row first; only one UPDATE matches.
+        claimed = ReportJob.objects.filter(pk=job_id, status=ReportJob.Status.QUEUED).update(
+            status=ReportJob.Status.RUNNING, started_at=timezone.now()
+        )
+        if claimed:
+            return job_id
+
+
+def requeue_stale(older_than):
+    """Return jobs stuck in ``running`` (e.g. after a worker crash) to the queue."""
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return ReportJob.objects.filter(status=ReportJob.Status.RUNNING, started_at__lt=cutoff).update(
+        status=ReportJob.Status.QUEUED, progress=0, started_at=None
+    )
+
+
+def _tracked(rows, job_id):
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if count % PROGRESS_EVERY == 0:
+            ReportJob.objects.filter(pk=job_id).update(progress=count)
+
+
+def _render(report, format, fileobj, rows, total):
+    if format == ReportJob.Format.PDF:
+        from .pdf import render_report_pdf, render_report_pdf_parallel
+        processes = getattr(settings, 'REPORT_PDF_PROCESSES', 1)
+        if processes > 1 and total >= getattr(settings, 'REPORT_PDF_PARALLEL_MIN_ROWS', 20000):
+            render_report_pdf_parallel(report, fileobj, processes, rows=rows, total=total)
+        else:
+            render_report_pdf(report, fileobj, rows=rows)
+    else:
+        from .exports import stream_xlsx
+        for chunk in stream_xlsx(report.labels, rows, title='Report'):
+            fileobj.write(chunk)
+
+
+def run_job(job_id):
+    """Render one claimed job into the result cache."""
+    job = ReportJob.objects.get(pk=job_id)
+    try:
+        if not cached_file(job.cache_key, job.format):
+            from .report_cache import get_report
+            report = get_report(*job.params)
+            total = report.count()
+            ReportJob.objects.filter(pk=job_id).update(total=total)
+            # Write next to the final path and rename, so readers never see a partial file.
+            fd, tmp = tempfile.mkstemp(dir=cache_dir(), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as fileobj:
+                    _render(report, job.format, fileobj, _tracked(report.rows(), job_id), total)
+                os.replace(tmp, result_path(job.cache_key, job.format))
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        else:
+            total = job.total
+        ReportJob.objects.filter(pk=job_id).update(
+            status=ReportJob.Status.DONE, progress=total or 0, total=total, finished_at=timezone.now()
+        )
+    except Exception as exc:
+        logger.exception('Report job %s failed', job_id)
+        ReportJob.objects.filter(pk=job_id).update(
+            status=ReportJob.Status.FAILED, error=str(exc)[:1000], finished_at=timezone.now()
+        )
+        return ReportJob.Status.FAILED
+    return ReportJob.Status.DONE
+
+
+def work(job_id):
+    """Process-pool entry point: :func:`run_job` on a healthy connection."""
+    close_old_connections()
+    try:
+        return run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def cleanup():
+    """Delete expired result files and the finished jobs that pointed at them."""
+    ttl = cache_ttl()
+    now = time.time()
+    removed = 0
+    for path in cache_dir().iterdir():
+        # Temporary files belong to renders that may still be running.
+        limit = ttl * 24 if path.suffix == '.tmp' else ttl
+        try:
+            if now - path.stat().st_mtime >= limit:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    cutoff = timezone.now() - timedelta(seconds=ttl)
+    ReportJob.objects.filter(
+        status__in=(ReportJob.Status.DONE, ReportJob.Status.FAILED), finished_at__lt=cutoff
+    ).delete()
+    return removed
+
+
+def job_state(job):
+    return {
+        'id': str(job.id),
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'error': job.error,
+    }
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from Samples import archive
+
+
+class Command(BaseCommand):
+    help = 'Move complete months of old audit entries into compressed archive segments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=None,
+                            help='Keep this many days in the AuditLog table (default: AUDIT_HOT_DAYS).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only list the months that would be archived.')
+
+    def handle(self, *args, **options):
+        before = archive.cutoff_month(days=options['older_than_days'])
+        if options['dry_run']:
+            months = archive.pending_months(before)
+            for month in months:
+                self.stdout.write(f'{month:%Y-%m}')
+            self.stdout.write(f'{len(months)} month(s) before {before:%Y-%m} would be archived.')
+            return
+        moved = archive.archive(before)
+        for month, rows in sorted(moved.items()):
+            self.stdout.write(f'{month:%Y-%m}: {rows} entr{"y" if rows == 1 else "ies"}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {sum(moved.values())} audit entr{"y" if sum(moved.values()) == 1 else "ies"} '
+            f'to {archive.archive_dir()}.'
+        ))
@@ -0,0 +1,91 @@
+import json
+import platform
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from Samples import benchmarks, datagen
+from Samples.models import AuditLog, Sample
+
+BENCHMARK_DIR = Path(settings.BASE_DIR) / 'benchmarks'
+
+
+def _load(path):
+    try:
+        with open(path, encoding='utf-8') as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {}
+
+
+def _store(path, size, entry):
+    data = _load(path)
+    data[str(size)] = entry
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(data, fh, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+class Command(BaseCommand):
+    help = 'Time the hot request paths (wall time, queries, peak memory) and compare with a stored baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', choices=sorted(benchmarks.cases()), help='Run only these cases.')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--host', default='localhost', help='Host header sent with the requests (must be in ALLOWED_HOSTS).')
+        parser.add_argument('--end-date', default=None,
+                            help=f'Latest collection date of the dataset (default: {datagen.END_DATE}).')
+        parser.add_argument('--output', type=Path, default=BENCHMARK_DIR / 'latest.json')
+        parser.add_argument('--baseline', type=Path, default=BENCHMARK_DIR / 'baseline.json')
+        parser.add_argument('--save-baseline', action='store_true', help='Store these results as the baseline.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed slowdown and memory growth before a case counts as a regression.')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        size = Sample.objects.count()
+        admin = datagen.bench_admin()
+        if admin is None or not datagen.existing():
+            # Never create the benchmark superuser in a real database.
+            raise CommandError(
+                'No generated dataset found; run generate_dataset into a separate, '
+                'disposable database and benchmark that one.'
+            )
+        end = parse_date(options['end_date']) if options['end_date'] else datagen.END_DATE
+
+        def progress(name, result):
+            self.stdout.write(
+                f'{name:28} {result["seconds"] * 1000:9.1f} ms {result["queries"]:5} queries '
+                f'{result["peak_kb"]:9} KiB peak  [{result["status"]}]'
+            )
+
+        self.stdout.write(f'{size} samples, {AuditLog.objects.count()} audit entries')
+        results = benchmarks.run(admin, options['only'], options['repeat'], end, progress, options['host'])
+        entry = {
+            'dataset': {'samples': size, 'audit_entries': AuditLog.objects.count()},
+            'environment': {'python': platform.python_version(), 'django': django.get_version(), 'machine': platform.machine()},
+            'recorded_at': timezone.now().isoformat(timespec='seconds'),
+            'results': results,
+        }
+        _store(options['output'], size, entry)
+        self.stdout.write(f'Results written to {options["output"]}')
+
+        baseline = _load(options['baseline']).get(str(size))
+        if options['save_baseline']:
+            _store(options['baseline'], size, entry)
+            self.stdout.write(self.style.SUCCESS(f'Baseline for {size} samples saved to {options["baseline"]}'))
+            return
+        if baseline is None:
+            self.stdout.write(f'No baseline for {size} samples in {options["baseline"]}; use --save-baseline to record one.')
+            return
+        regressions = benchmarks.compare(results, baseline['results'], options['tolerance'])
+        for name, metric, before, after in regressions:
+            self.stdout.write(self.style.WARNING(f'{name}: {metric} {before} -> {after}'))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+        elif options['fail_on_regression']:
+            raise CommandError(f'{len(regressions)} regression(s) against the baseline.')
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from Samples import datagen
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic dataset (samples, RFID tags, audit events) for benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('size', type=int, help='Number of samples, e.g. 10000 or 10000000.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--days', type=int, default=365, help='Days the collection dates are spread over.')
+        parser.add_argument('--end-date', default=None, help=f'Latest collection date (default: {datagen.END_DATE}).')
+
+    def handle(self, *args, **options):
+        if options['size'] < 1:
+            raise CommandError('size must be positive.')
+        present = datagen.existing()
+        if present:
+            raise CommandError(
+                f'{present} generated samples already exist; generate into an empty database '
+                '(point DATABASES at a separate file) so runs stay comparable.'
+            )
+        end = parse_date(options['end_date']) if options['end_date'] else None
+        started = time.perf_counter()
+
+        def progress(done, size):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{done}/{size} samples ({done / elapsed:.0f}/s)')
+
+        samples, events = datagen.generate(options['size'], options['seed'], options['days'], end, progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {samples} samples and {events} audit events in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,66 @@
+import csv
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from Samples.imports import CHUNK_SIZE, SampleImporter, check_file, read_file
+
+
+class Command(BaseCommand):
+    help = 'Import samples (and their RFID tags) from a CSV or XLSX file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (UTF-8) or XLSX file with a header row.')
+        parser.add_argument('--user', required=True, help='Username recorded on the audit entry.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--keep-status', action='store_true',
+                            help='Take the status column as is (legacy migrations); otherwise samples start pending.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate every row without writing anything.')
+        parser.add_argument('--errors', default=None, metavar='CSV',
+                            help='Write every rejected row and its errors to this CSV file.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist.")
+
+        report = writer = None
+        if options['errors']:
+            report = open(options['errors'], 'w', newline='', encoding='utf-8-sig')
+            writer = csv.writer(report)
+            writer.writerow(['row', 'errors'])
+
+        def on_error(row, errors):
+            if writer is not None:
+                writer.writerow([row, json.dumps(errors, ensure_ascii=False)])
+
+        importer = SampleImporter(
+            user, chunk_size=options['chunk_size'], keep_status=options['keep_status'],
+            dry_run=options['dry_run'], max_errors=20, on_error=on_error,
+        )
+        started = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as fh:
+                try:
+                    # Fail on an undecodable or malformed file before writing anything.
+                    check_file(fh, options['path'])
+                except (ValueError, csv.Error) as exc:
+                    raise CommandError(f'Unreadable file: {exc}')
+                result = importer.run(read_file(fh, options['path']))
+        finally:
+            if report is not None:
+                report.close()
+        elapsed = time.perf_counter() - started
+
+        for error in result.errors:
+            self.stdout.write(self.style.WARNING(f'Row {error["row"]}: {json.dumps(error["errors"], ensure_ascii=False)}'))
+        if result.error_count > len(result.errors):
+            self.stdout.write(f'... and {result.error_count - len(result.errors)} more rejected row(s).')
+        verb = 'Would import' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {result.created} of {result.rows} rows ({result.tags_created} new tags, '
+            f'{result.error_count} rejected) in {elapsed:.1f}s, {result.rows / max(elapsed, 1e-9):.0f} rows/s.'
+        ))
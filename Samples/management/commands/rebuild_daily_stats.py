@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from Samples import stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the dashboard daily counters from the Sample and AuditLog tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report counters that disagree with the source tables.')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            differences = stats.drift()
+            for (day, metric, key), (stored, expected) in sorted(differences.items()):
+                self.stdout.write(f'{day} {metric} {key or "-"}: stored {stored}, expected {expected}')
+            if differences:
+                self.stdout.write(self.style.WARNING(f'{len(differences)} counter(s) drifted; run without --check to rebuild.'))
+            else:
+                self.stdout.write(self.style.SUCCESS('Daily counters are consistent.'))
+            return
+        written = stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} daily counter(s).'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from Samples import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for samples.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to rebuild.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not search.is_available(using):
+            raise CommandError('Full-text search needs SQLite with the Samples migrations applied.')
+        total = search.rebuild_index(using, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} samples.'))
@@ -0,0 +1,44 @@
+import os
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from Samples.routers import read_aliases
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database over the read-only snapshot aliases in READ_DATABASES.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('aliases', nargs='*', help='Snapshot aliases to refresh (default: every SQLite read alias).')
+
+    def handle(self, *args, **options):
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != 'sqlite':
+            raise CommandError('refresh_read_snapshot only copies SQLite databases; use a real replica instead.')
+        aliases = options['aliases'] or [alias for alias in read_aliases() if connections[alias].vendor == 'sqlite']
+        if not aliases:
+            raise CommandError('No SQLite aliases in READ_DATABASES.')
+
+        source.ensure_connection()
+        for alias in aliases:
+            target = str(connections[alias].settings_dict['NAME'])
+            if target == str(source.settings_dict['NAME']):
+                raise CommandError(f'{alias} points at the primary database.')
+            started = time.perf_counter()
+            tmp = f'{target}.tmp'
+            # The backup API copies a consistent state while writers carry on.
+            copy = sqlite3.connect(tmp)
+            try:
+                source.connection.backup(copy)
+                copy.execute('PRAGMA journal_mode=DELETE')
+            finally:
+                copy.close()
+            # Readers that still have the old file open finish on it; new connections see the copy.
+            os.replace(tmp, target)
+            connections[alias].close()
+            self.stdout.write(f'{alias}: {os.path.getsize(target) / (1024 * 1024):.1f} MB '
+                              f'in {(time.perf_counter() - started) * 1000:.0f} ms')
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {len(aliases)} snapshot(s).'))
@@ -0,0 +1,60 @@
+import logging
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from Samples import jobs
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Render queued report exports in a pool of worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2, help='Number of rendering processes.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds between checks for new jobs.')
+        parser.add_argument('--stale-after', type=int, default=3600,
+                            help='Requeue jobs that have been running longer than this many seconds.')
+        parser.add_argument('--cleanup-interval', type=int, default=600,
+                            help='Seconds between removals of expired cached files.')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty.')
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        requeued = jobs.requeue_stale(options['stale_after'])
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale job(s).')
+        # Children open their own connections; none may be shared across the spawn.
+        connections.close_all()
+
+        context = multiprocessing.get_context('spawn')
+        running = set()
+        completed = 0
+        last_cleanup = 0.0
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=django.setup) as pool:
+            try:
+                while True:
+                    while len(running) < processes:
+                        job_id = jobs.claim_next()
+                        if job_id is None:
+                            break
+                        running.add(pool.submit(jobs.work, job_id))
+                    if options['once'] and not running:
+                        break
+                    done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        completed += 1
+                        if future.exception() is not None:
+                            logger.error('Report worker process failed', exc_info=future.exception())
+                    if time.monotonic() - last_cleanup >= options['cleanup_interval']:
+                        jobs.cleanup()
+                        last_cleanup = time.monotonic()
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(self.style.SUCCESS(f'Report worker stopped after {completed} job(s).'))
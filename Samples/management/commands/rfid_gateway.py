@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from Samples.gateway import RFIDGateway, simulate_readers
+from Samples.models import RFIDTag
+
+
+class Command(BaseCommand):
+    help = 'Run the RFID reader gateway (line-based TCP), optionally with simulated readers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username recorded on the audit entries.')
+        parser.add_argument('--host', default='0.0.0.0')
+        parser.add_argument('--port', type=int, default=7000)
+        parser.add_argument('--dedup-window', type=float, default=2.0,
+                            help='Seconds during which repeated reads of a tag are dropped.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--flush-interval', type=float, default=0.25,
+                            help='Maximum seconds a read waits before its batch is written.')
+        parser.add_argument('--simulate', type=int, default=0, metavar='READERS',
+                            help='Start this many simulated readers against the gateway, then exit.')
+        parser.add_argument('--rate', type=float, default=100.0, help='Reads per second per simulated reader.')
+        parser.add_argument('--duration', type=float, default=10.0, help='Simulation length in seconds.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist.")
+
+        gateway = RFIDGateway(
+            user,
+            host=options['host'],
+            port=options['port'],
+            dedup_window=options['dedup_window'],
+            batch_size=options['batch_size'],
+            flush_interval=options['flush_interval'],
+        )
+        if options['simulate']:
+            uids = list(RFIDTag.objects.values_list('uid', flat=True)[:10000])
+            if not uids:
+                raise CommandError('There are no RFID tags to simulate reads for.')
+            asyncio.run(self._simulate(gateway, uids, options))
+        else:
+            try:
+                asyncio.run(gateway.serve_forever())
+            except KeyboardInterrupt:
+                pass
+        self._report(gateway)
+
+    async def _simulate(self, gateway, uids, options):
+        await gateway.start()
+        serving = asyncio.create_task(gateway.serve_forever())
+        started = time.monotonic()
+        sent = await simulate_readers(
+            '127.0.0.1', gateway.port, uids,
+            readers=options['simulate'], rate=options['rate'], duration=options['duration'],
+        )
+        # Let the last reads arrive before shutting the server down.
+        await asyncio.sleep(gateway.flush_interval * 2)
+        serving.cancel()
+        try:
+            await serving
+        except asyncio.CancelledError:
+            pass
+        elapsed = time.monotonic() - started
+        self.stdout.write(f'Simulated {sent} reads in {elapsed:.1f}s ({sent / elapsed:.0f} reads/s).')
+
+    def _report(self, gateway):
+        stats = ', '.join(f'{key}={value}' for key, value in sorted(gateway.stats.items()))
+        self.stdout.write(self.style.SUCCESS(f'Gateway stopped: {stats or "no reads"}'))
@@ -0,0 +1,89 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# PRAGMA auto_vacuum values.
+INCREMENTAL = 2
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _mb(size):
+    return f'{size / (1024 * 1024):.1f} MB'
+
+
+class Command(BaseCommand):
+    help = ('Routine SQLite upkeep: ANALYZE, PRAGMA optimize, incremental vacuum and a WAL checkpoint. '
+            'The first run also switches the database to WAL mode.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--vacuum-pages', type=int, default=0,
+                            help='Free pages to release per run (default: all of them).')
+        parser.add_argument('--skip-analyze', action='store_true',
+                            help='Leave the full ANALYZE out (PRAGMA optimize still runs).')
+        parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                            help='Switch an existing database to incremental auto-vacuum '
+                                 '(rewrites the whole file once with VACUUM).')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError('sqlite_maintenance only applies to SQLite databases.')
+        if connection.in_atomic_block:
+            # VACUUM and checkpoints cannot run inside a transaction.
+            raise CommandError('sqlite_maintenance cannot run inside a transaction.')
+        path = str(connection.settings_dict['NAME'])
+        connection.ensure_connection()
+        before = self._stats(connection, path)
+
+        with connection.cursor() as cursor:
+            def step(label, *statements):
+                started = time.perf_counter()
+                for statement in statements:
+                    cursor.execute(statement)
+                    cursor.fetchall()
+                self.stdout.write(f'{label}: {(time.perf_counter() - started) * 1000:.0f} ms')
+
+            # Stored in the file, so this runs once per database.
+            if self._pragma(connection, 'journal_mode') != 'wal':
+                step('WAL mode', 'PRAGMA journal_mode=WAL')
+            if options['enable_incremental_vacuum'] and before['auto_vacuum'] != INCREMENTAL:
+                step('VACUUM (enable incremental auto-vacuum)', 'PRAGMA auto_vacuum=INCREMENTAL', 'VACUUM')
+            if not options['skip_analyze']:
+                step('ANALYZE', 'ANALYZE')
+            step('PRAGMA optimize', 'PRAGMA optimize')
+            if self._pragma(connection, 'auto_vacuum') == INCREMENTAL:
+                pages = options['vacuum_pages']
+                step('Incremental vacuum', f'PRAGMA incremental_vacuum({pages})' if pages else 'PRAGMA incremental_vacuum')
+            elif before['freelist_count']:
+                self.stdout.write(
+                    f'Incremental vacuum: skipped, auto_vacuum is off '
+                    f'({before["freelist_count"]} free pages; see --enable-incremental-vacuum)'
+                )
+            step('WAL checkpoint', 'PRAGMA wal_checkpoint(TRUNCATE)')
+
+        after = self._stats(connection, path)
+        for label, key in (('Database file', 'db_size'), ('WAL file', 'wal_size')):
+            self.stdout.write(f'{label}: {_mb(before[key])} -> {_mb(after[key])}')
+        self.stdout.write(f'Free pages: {before["freelist_count"]} -> {after["freelist_count"]} '
+                          f'of {after["page_count"]} ({after["page_size"]} bytes each)')
+        self.stdout.write(self.style.SUCCESS('SQLite maintenance finished.'))
+
+    def _pragma(self, connection, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def _stats(self, connection, path):
+        stats = {name: self._pragma(connection, name) for name in ('page_count', 'page_size', 'freelist_count', 'auto_vacuum')}
+        stats['db_size'] = _size(path)
+        stats['wal_size'] = _size(f'{path}-wal')
+        return stats
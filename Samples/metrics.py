@@ -0,0 +1,266 @@
+"""Per-request latency and SQL instrumentation, rendered for Prometheus.
+
+:class:`MetricsMiddleware` times every request and, through
+``connection.execute_wrapper`` on every database alias, counts its queries
+and their total time. Streaming responses (exports) are measured until
+their last chunk is sent. Everything is recorded per view name in the
+process-wide :data:`registry`, which :func:`render` turns into the
+Prometheus text format served at ``/metrics``.
+
+Queries slower than ``METRICS_SLOW_QUERY_SECONDS`` are kept (the most
+recent ``METRICS_SLOW_QUERY_SAMPLES``, SQL without parameters) and listed as
+comments at the end of the output. Requests slower than
+``METRICS_SLOW_REQUEST_SECONDS`` are logged with their query count and
+SQL time.
+
+The registry lives in the process: with several web workers, each one
+reports its own requests.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'samples'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (1 << 10, 10 << 10, 100 << 10, 1 << 20, 10 << 20, 100 << 20)
+# Longer statements are cut in the slow-query samples.
+MAX_SQL_LENGTH = 2000
+UNMATCHED = '<unmatched>'
+
+
+def enabled():
+    return getattr(settings, 'METRICS_ENABLED', True)
+
+
+def slow_request_seconds():
+    return getattr(settings, 'METRICS_SLOW_REQUEST_SECONDS', 1.0)
+
+
+def slow_query_seconds():
+    return getattr(settings, 'METRICS_SLOW_QUERY_SECONDS', 0.1)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Counters and histograms keyed by ``(name, labels)``; safe across threads."""
+
+    HISTOGRAMS = {
+        'http_request_duration_seconds': ('Request latency, until the last byte of the body.', LATENCY_BUCKETS),
+        'http_request_queries': ('SQL queries per request.', QUERY_BUCKETS),
+        'http_response_size_bytes': ('Response body size.', SIZE_BUCKETS),
+    }
+    COUNTERS = {
+        'http_requests_total': 'Requests by view, method and status.',
+        'http_request_sql_seconds_total': 'Time spent in SQL queries.',
+        'http_slow_requests_total': 'Requests slower than METRICS_SLOW_REQUEST_SECONDS.',
+        'sql_slow_queries_total': 'Queries slower than METRICS_SLOW_QUERY_SECONDS.',
+    }
+
+    def __init__(self, max_slow_queries=None):
+        self._lock = threading.Lock()
+        self.max_slow_queries = max_slow_queries or getattr(settings, 'METRICS_SLOW_QUERY_SAMPLES', 20)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {name: {} for name in self.HISTOGRAMS}
+            self.counters = {name: {} for name in self.COUNTERS}
+            self.slow_queries = deque(maxlen=self.max_slow_queries)
+
+    def record(self, request):
+        """Add one finished :class:`RequestRecord`."""
+        labels = (('view', request.view), ('method', request.method))
+        with self._lock:
+            for name, value in (
+                ('http_request_duration_seconds', request.duration),
+                ('http_request_queries', request.queries),
+                ('http_response_size_bytes', request.size),
+            ):
+                histograms = self.histograms[name]
+                if labels not in histograms:
+                    histograms[labels] = Histogram(self.HISTOGRAMS[name][1])
+                histograms[labels].observe(value)
+            self._add('http_requests_total', labels + (('status', str(request.status)),), 1)
+            self._add('http_request_sql_seconds_total', labels, request.sql_seconds)
+            if request.slow:
+                self._add('http_slow_requests_total', labels, 1)
+            if request.slow_queries:
+                self._add('sql_slow_queries_total', labels, len(request.slow_queries))
+                self.slow_queries.extend(request.slow_queries)
+
+    def _add(self, name, labels, value):
+        counters = self.counters[name]
+        counters[labels] = counters.get(labels, 0) + value
+
+
+registry = Registry()
+
+
+class RequestRecord:
+    """The measurements of one request; also the ``execute_wrapper`` callable."""
+
+    def __init__(self, request):
+        self.method = request.method
+        self.path = request.path
+        self.view = UNMATCHED
+        self.status = 0
+        self.size = 0
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.slow_queries = []
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.slow = False
+        self._slow_query = slow_query_seconds()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.sql_seconds += elapsed
+            if self._slow_query is not None and elapsed >= self._slow_query:
+                self.slow_queries.append({
+                    'view': self.view,
+                    'seconds': round(elapsed, 4),
+                    'alias': context['connection'].alias,
+                    'sql': sql[:MAX_SQL_LENGTH],
+                })
+
+    def wrap_connections(self, stack):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+        threshold = slow_request_seconds()
+        self.slow = threshold is not None and self.duration >= threshold
+        if self.slow:
+            logger.warning(
+                'Slow request: %s %s (%s) took %.3fs, %d queries, %.3fs in SQL, status %s',
+                self.method, self.path, self.view, self.duration, self.queries, self.sql_seconds, self.status,
+            )
+        registry.record(self)
+
+
+class MetricsMiddleware:
+    """Records every request into :data:`registry` (see the module docstring)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not enabled():
+            return self.get_response(request)
+        record = RequestRecord(request)
+        with record.wrap_connections(ExitStack()):
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            record.view = match.view_name or match.route or UNMATCHED
+            for sample in record.slow_queries:
+                sample['view'] = record.view
+        record.status = response.status_code
+        if response.streaming and not response.is_async:
+            response.streaming_content = self._stream(response.streaming_content, record)
+        else:
+            if not response.streaming:
+                record.size = len(response.content)
+            record.finish()
+        return response
+
+    def _stream(self, content, record):
+        try:
+            with record.wrap_connections(ExitStack()):
+                for chunk in content:
+                    record.size += len(chunk)
+                    yield chunk
+        finally:
+            record.finish()
+
+
+def _labels(labels, extra=()):
+    pairs = tuple(labels) + tuple(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def _gauges():
+    """Process-level values from the report cache and the audit writer."""
+    from . import audit_writer, report_cache
+
+    gauges = [
+        ('audit_writer_pending', 'Audit entries waiting for the background writer.', audit_writer.writer.pending()),
+    ]
+    for name, value in sorted(audit_writer.writer.stats.items()):
+        gauges.append((f'audit_writer_{name}_total', f'Audit writer {name} since start.', value))
+    for name, value in sorted(report_cache.stats().items()):
+        gauges.append((f'report_cache_{name}_total', f'Report cache {name}.', value))
+    return gauges
+
+
+def render():
+    """The registry (and a few process gauges) in the Prometheus text format."""
+    lines = []
+    with registry._lock:
+        for name, (help_text, _) in registry.HISTOGRAMS.items():
+            lines += [f'# HELP {PREFIX}_{name} {help_text}', f'# TYPE {PREFIX}_{name} histogram']
+            for labels, histogram in sorted(registry.histograms[name].items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{PREFIX}_{name}_bucket{_labels(labels, [("le", bound)])} {cumulative}')
+                lines.append(f'{PREFIX}_{name}_bucket{_labels(labels, [("le", "+Inf")])} {histogram.count}')
+                lines.append(f'{PREFIX}_{name}_sum{_labels(labels)} {_number(histogram.sum)}')
+                lines.append(f'{PREFIX}_{name}_count{_labels(labels)} {histogram.count}')
+        for name, help_text in registry.COUNTERS.items():
+            lines += [f'# HELP {PREFIX}_{name} {help_text}', f'# TYPE {PREFIX}_{name} counter']
+            for labels, value in sorted(registry.counters[name].items()):
+                lines.append(f'{PREFIX}_{name}{_labels(labels)} {_number(value)}')
+        slow_queries = list(registry.slow_queries)
+    for name, help_text, value in _gauges():
+        kind = 'counter' if name.endswith('_total') else 'gauge'
+        lines += [f'# HELP {PREFIX}_{name} {help_text}', f'# TYPE {PREFIX}_{name} {kind}', f'{PREFIX}_{name} {value}']
+    if slow_queries:
+        lines.append('# Slow queries, most recent last:')
+        for sample in slow_queries:
+            sql = ' '.join(sample['sql'].split())
+            lines.append(f'# {sample["seconds"]}s view={sample["view"]} db={sample["alias"]}: {sql}')
+    return '\n'.join(lines) + '\n'
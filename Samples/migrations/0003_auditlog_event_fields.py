@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Samples', '0002_alter_auditlog_sample'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='event_type',
+            field=models.CharField(choices=[('login', 'Login'), ('rfid_check', 'RFID check'), ('approve', 'Approve'), ('reject', 'Reject'), ('profile_update', 'Profile update'), ('user_create', 'User create'), ('user_update', 'User update'), ('user_activate', 'User activate'), ('user_deactivate', 'User deactivate'), ('user_role_change', 'User role change'), ('password_reset', 'Password reset'), ('other', 'Other')], default='other', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='payload',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='uid',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='timestamp',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['event_type', 'timestamp'], name='auditlog_event_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user', 'timestamp'], name='auditlog_user_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+# (event_type, lookup, value) in the order the prefixes must be tested.
+EVENT_MATCHERS = [
+    ('rfid_check', 'action__startswith', 'فحص RFID'),
+    ('approve', 'action', 'اعتماد العينة'),
+    ('reject', 'action', 'رفض العينة'),
+    ('login', 'action', 'تسجيل الدخول'),
+    ('profile_update', 'action', 'User updated own profile'),
+    ('user_create', 'action__startswith', 'إنشاء مستخدم:'),
+    ('user_update', 'action__startswith', 'تعديل بيانات المستخدم:'),
+    ('user_activate', 'action__startswith', 'تفعيل المستخدم'),
+    ('user_deactivate', 'action__startswith', 'إيقاف المستخدم'),
+    ('user_role_change', 'action__startswith', 'تغيير دور المستخدم'),
+    ('password_reset', 'action__startswith', 'إعادة تعيين كلمة المرور'),
+]
+
+
+def backfill_events(apps, schema_editor):
+    AuditLog = apps.get_model('Samples', 'AuditLog')
+    for event_type, lookup, value in EVENT_MATCHERS:
+        AuditLog.objects.filter(event_type='other', **{lookup: value}).update(event_type=event_type)
+
+    batch = []
+    rfid_logs = AuditLog.objects.filter(event_type='rfid_check', uid='', action__contains='UID:').only('id', 'action')
+    for log in rfid_logs.iterator(chunk_size=2000):
+        log.uid = log.action.split('UID:')[-1].strip(' )')[:64]
+        batch.append(log)
+        if len(batch) >= 2000:
+            AuditLog.objects.bulk_update(batch, ['uid'])
+            batch = []
+    if batch:
+        AuditLog.objects.bulk_update(batch, ['uid'])
+
+
+def reset_events(apps, schema_editor):
+    AuditLog = apps.get_model('Samples', 'AuditLog')
+    AuditLog.objects.update(event_type='other', uid='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Samples", "0003_auditlog_event_fields"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_events, reset_events),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Samples', '0004_backfill_auditlog_events'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sample',
+            index=models.Index(fields=['collected_date', 'id'], name='sample_collected_id_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from Samples import search
+
+    search.create_index(schema_editor.connection)
+    Sample = apps.get_model('Samples', 'Sample')
+    rows = Sample.objects.using(schema_editor.connection.alias).values_list('id', 'sample_number', 'person_name')
+    search.index_samples(list(rows), schema_editor.connection.alias)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from Samples import search
+
+    search.drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Samples", "0005_sample_collected_id_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Samples', '0006_sample_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sample',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Samples', '0008_report_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('metric', models.CharField(choices=[('samples', 'Samples'), ('status', 'Samples by status'), ('type', 'Samples by type'), ('category', 'Samples by category'), ('rfid_checks', 'RFID checks'), ('approvals', 'Approvals'), ('rejections', 'Rejections')], max_length=20)),
+                ('key', models.CharField(blank=True, max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['metric', 'day'], name='dailystat_metric_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'metric', 'key'), name='dailystat_day_metric_key_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+# Snapshot field prefix -> audit event that sets it.
+SNAPSHOT_EVENTS = {
+    'checked': 'rfid_check',
+    'approved': 'approve',
+    'rejected': 'reject',
+}
+
+
+def backfill_snapshot(apps, schema_editor):
+    AuditLog = apps.get_model('Samples', 'AuditLog')
+    Sample = apps.get_model('Samples', 'Sample')
+    for prefix, event_type in SNAPSHOT_EVENTS.items():
+        latest = AuditLog.objects.filter(sample=OuterRef('pk'), event_type=event_type).order_by('-timestamp', '-id')
+        Sample.objects.filter(pk__in=AuditLog.objects.filter(event_type=event_type).values('sample_id')).update(**{
+            f'{prefix}_at': Subquery(latest.values('timestamp')[:1]),
+            f'{prefix}_by': Subquery(latest.values('user_id')[:1]),
+        })
+
+
+def clear_snapshot(apps, schema_editor):
+    Sample = apps.get_model('Samples', 'Sample')
+    fields = {}
+    for prefix in SNAPSHOT_EVENTS:
+        fields[f'{prefix}_at'] = None
+        fields[f'{prefix}_by'] = None
+    Sample.objects.update(**fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Samples", "0010_sample_workflow_snapshot"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_snapshot, clear_snapshot),
+    ]
@@ -0,0 +1,63 @@
+from collections import Counter
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# Audit event -> the daily metric it feeds (Samples.stats.ACTIVITY_METRICS).
+ACTIVITY_METRICS = {
+    'rfid_check': 'rfid_checks',
+    'approve': 'approvals',
+    'reject': 'rejections',
+}
+
+
+def backfill_daily_stats(apps, schema_editor):
+    """Build the counters from the existing rows, as ``rebuild_daily_stats`` does;
+    the signal handlers only apply deltas on top of them."""
+    from Samples import archive
+
+    AuditLog = apps.get_model('Samples', 'AuditLog')
+    DailyStat = apps.get_model('Samples', 'DailyStat')
+    Sample = apps.get_model('Samples', 'Sample')
+    using = schema_editor.connection.alias
+
+    counters = Counter()
+    samples = Sample.objects.using(using)
+    for metric, field in (('status', 'status'), ('type', 'sample_type'), ('category', 'category')):
+        for day, key, count in samples.values_list('collected_date', field).annotate(n=Count('id')).order_by():
+            counters[(day, metric, key)] += count
+            if metric == 'status':
+                counters[(day, 'samples', '')] += count
+
+    logs = (
+        AuditLog.objects.using(using)
+        .filter(event_type__in=list(ACTIVITY_METRICS))
+        .annotate(day=TruncDate('timestamp', tzinfo=timezone.get_current_timezone()))
+        .values_list('day', 'event_type')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    for day, event_type, count in logs:
+        counters[(day, ACTIVITY_METRICS[event_type], '')] += count
+    for (day, event_type), count in archive.daily_activity().items():
+        if event_type in ACTIVITY_METRICS:
+            counters[(day, ACTIVITY_METRICS[event_type], '')] += count
+
+    DailyStat.objects.using(using).all().delete()
+    DailyStat.objects.using(using).bulk_create(
+        [DailyStat(day=day, metric=metric, key=key, count=count) for (day, metric, key), count in counters.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Samples", "0012_auditlog_timestamp_at_build"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,10 @@
 
 
-from django.db import models
+import uuid
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class RFIDTag(models.Model):
     uid = models.CharField(max_length=64, unique=True)
@@ -26,9 +29,170 @@ class Sample(models.Model):
     location = models.CharField(max_length=100, blank=True)  # Added field for location
     rfid = models.OneToOneField(RFIDTag, on_delete=models.PROTECT)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Snapshot of the latest workflow steps, kept in step with the audit log
+    # by the transition paths so reports need not scan AuditLog.
+    checked_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    checked_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='checked_samples')
+    approved_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_samples')
+    rejected_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    rejected_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='rejected_samples')
+
+    class Meta:
+        indexes = [
+            # Backs the ('-collected_date', '-id') list ordering and its keyset cursors.
+            models.Index(fields=['collected_date', 'id'], name='sample_collected_id_idx'),
+        ]
+
+class AuditLogManager(models.Manager):
+    def build(self, user, event_type, sample=None, uid='', **payload):
+        """Return an unsaved entry whose ``action`` text is derived from the event."""
+        template = AuditLog.ACTION_TEXT.get(event_type, '{text}')
+        action = template.format(uid=uid, **payload)[:100]
+        return self.model(
+            user=user,
+            sample=sample,
+            event_type=event_type,
+            uid=uid,
+            payload=payload,
+            action=action,
+        )
+
+    def record(self, user, event_type, sample=None, uid='', strict=False, **payload):
+        """Build and store an entry, through the buffered writer unless
+        ``strict`` (see ``Samples.audit_writer``)."""
+        from . import audit_writer
+
+        entry = self.build(user, event_type, sample=sample, uid=uid, **payload)
+        sample_number = sample.sample_number if sample is not None else None
+        # Inside a transaction the entry has to commit or roll back with it.
+        deferrable = (
+            not strict and event_type not in audit_writer.STRICT_EVENTS and audit_writer.enabled()
+            and self.db == 'default' and not transaction.get_connection(self.db).in_atomic_block
+        )
+        if deferrable and audit_writer.writer.submit(entry, sample_number):
+            return entry
+        entry.save()
+        if sample is not None:
+            from .events import audit_event, publish_on_commit
+            publish_on_commit([audit_event(entry, sample.sample_number)], using=entry._state.db)
+        return entry
+
 
 class AuditLog(models.Model):
+    class Event(models.TextChoices):
+        LOGIN = 'login', 'Login'
+        RFID_CHECK = 'rfid_check', 'RFID check'
+        APPROVE = 'approve', 'Approve'
+        REJECT = 'reject', 'Reject'
+        PROFILE_UPDATE = 'profile_update', 'Profile update'
+        USER_CREATE = 'user_create', 'User create'
+        USER_UPDATE = 'user_update', 'User update'
+        USER_ACTIVATE = 'user_activate', 'User activate'
+        USER_DEACTIVATE = 'user_deactivate', 'User deactivate'
+        USER_ROLE_CHANGE = 'user_role_change', 'User role change'
+        PASSWORD_RESET = 'password_reset', 'Password reset'
+        OTHER = 'other', 'Other'
+
+    # Human readable text kept in ``action`` for the audit screens.
+    ACTION_TEXT = {
+        Event.LOGIN: 'تسجيل الدخول',
+        Event.RFID_CHECK: 'فحص RFID (UID: {uid})',
+        Event.APPROVE: 'اعتماد العينة',
+        Event.REJECT: 'رفض العينة',
+        Event.PROFILE_UPDATE: 'User updated own profile',
+        Event.USER_CREATE: 'إنشاء مستخدم: {username} ({role})',
+        Event.USER_UPDATE: 'تعديل بيانات المستخدم: {username}',
+        Event.USER_ACTIVATE: 'تفعيل المستخدم: {username}',
+        Event.USER_DEACTIVATE: 'إيقاف المستخدم: {username}',
+        Event.USER_ROLE_CHANGE: 'تغيير دور المستخدم إلى {role}: {username}',
+        Event.PASSWORD_RESET: 'إعادة تعيين كلمة المرور للمستخدم: {username}',
+    }
+
     user = models.ForeignKey(User, on_delete=models.PROTECT)
     sample = models.ForeignKey(Sample, on_delete=models.PROTECT, null=True, blank=True)
     action = models.CharField(max_length=100)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    event_type = models.CharField(max_length=32, choices=Event.choices, default=Event.OTHER)
+    uid = models.CharField(max_length=64, blank=True, db_index=True)
+    payload = models.JSONField(default=dict, blank=True)
+    # Set when the entry is built, so entries written later by the buffered
+    # writer keep the time of the event.
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
+
+    objects = AuditLogManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['event_type', 'timestamp'], name='auditlog_event_ts_idx'),
+            models.Index(fields=['user', 'timestamp'], name='auditlog_user_ts_idx'),
+        ]
+
+
+class ReportJob(models.Model):
+    """A report export rendered by the ``report_worker`` command."""
+
+    class Format(models.TextChoices):
+        XLSX = 'xlsx', 'Excel'
+        PDF = 'pdf', 'PDF'
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_jobs')
+    report_type = models.CharField(max_length=20)
+    from_date = models.CharField(max_length=10, blank=True)
+    to_date = models.CharField(max_length=10, blank=True)
+    filter_user_id = models.CharField(max_length=20, blank=True)
+    format = models.CharField(max_length=4, choices=Format.choices)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED, db_index=True)
+    cache_key = models.CharField(max_length=64, db_index=True)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    file_name = models.CharField(max_length=200, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    @property
+    def params(self):
+        return (self.report_type, self.from_date, self.to_date, self.filter_user_id)
+
+
+class DailyStat(models.Model):
+    """Running daily counters behind the dashboard (see ``Samples.stats``).
+
+    Sample metrics are bucketed by ``collected_date`` and keyed by the
+    status, type or category; activity metrics are bucketed by the local
+    day of the audit entry.
+    """
+
+    class Metric(models.TextChoices):
+        SAMPLES = 'samples', 'Samples'
+        STATUS = 'status', 'Samples by status'
+        TYPE = 'type', 'Samples by type'
+        CATEGORY = 'category', 'Samples by category'
+        RFID_CHECKS = 'rfid_checks', 'RFID checks'
+        APPROVALS = 'approvals', 'Approvals'
+        REJECTIONS = 'rejections', 'Rejections'
+
+    day = models.DateField()
+    metric = models.CharField(max_length=20, choices=Metric.choices)
+    key = models.CharField(max_length=100, blank=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'metric', 'key'], name='dailystat_day_metric_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['metric', 'day'], name='dailystat_metric_day_idx'),
+        ]
@@ -0,0 +1,123 @@
+import base64
+import binascii
+import json
+
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+
+def encode_cursor(collected_date, pk, reverse=False):
+    data = {'d': collected_date.isoformat(), 'i': pk}
+    if reverse:
+        data['r'] = 1
+    raw = json.dumps(data, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return ``(collected_date, pk, reverse)`` or ``None`` for a malformed token."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json.loads(raw)
+        collected_date = parse_date(data['d'])
+        pk = int(data['i'])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        return None
+    if collected_date is None:
+        return None
+    return collected_date, pk, bool(data.get('r'))
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, previous_cursor, estimated_total=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.estimated_total = estimated_total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class SampleKeysetPaginator:
+    """Cursor pagination over the ``('-collected_date', '-id')`` sample ordering.
+
+    Each page is a range seek on the (collected_date, id) index, so page
+    5,000 costs the same as page 1 and no ``COUNT(*)`` is ever issued.
+    """
+
+    def __init__(self, queryset, page_size):
+        self.queryset = queryset.order_by('-collected_date', '-id')
+        self.page_size = page_size
+
+    def get_page(self, token=None, estimate=False):
+        cursor = decode_cursor(token)
+        size = self.page_size
+        if cursor is None:
+            rows = list(self.queryset[:size + 1])
+            has_more, reverse, came_from_cursor = len(rows) > size, False, False
+        else:
+            collected_date, pk, reverse = cursor
+            came_from_cursor = True
+            if reverse:
+                qs = self.queryset.filter(
+                    Q(collected_date__gt=collected_date) | Q(collected_date=collected_date, id__gt=pk)
+                ).order_by('collected_date', 'id')
+            else:
+                qs = self.queryset.filter(
+                    Q(collected_date__lt=collected_date) | Q(collected_date=collected_date, id__lt=pk)
+                )
+            rows = list(qs[:size + 1])
+            has_more = len(rows) > size
+        rows = rows[:size]
+        if reverse:
+            rows.reverse()
+
+        has_next = has_more if not reverse else True
+        has_previous = came_from_cursor if not reverse else has_more
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(rows[-1].collected_date, rows[-1].pk)
+        if rows and has_previous:
+            previous_cursor = encode_cursor(rows[0].collected_date, rows[0].pk, reverse=True)
+        estimated_total = estimate_count(self.queryset) if estimate else None
+        return KeysetPage(rows, next_cursor, previous_cursor, estimated_total)
+
+
+def estimate_count(queryset):
+    """Cheap row-count estimate from planner statistics, or ``None``.
+
+    Only unfiltered querysets can be estimated; SQLite needs ``ANALYZE`` to
+    have populated ``sqlite_stat1``.
+    """
+    if queryset.query.where:
+        return None
+    table = queryset.model._meta.db_table
+    connection = connections[queryset.db]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                row = cursor.fetchone()
+                return int(row[0].split()[0]) if row else None
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+                row = cursor.fetchone()
+                return max(int(row[0]), 0) if row else None
+    except DatabaseError:
+        return None
+    return None
@@ -0,0 +1,304 @@
+"""PDF rendering for reports.
+
+Fonts, styles and the table style are set up once per process, shaped
+Arabic text is kept in a bounded LRU cache, and rows are laid out as a
+stream of page-sized tables (each repeating the header) that is consumed
+while the document is built, so memory stays flat for large reports.
+Very large reports can be split into page-aligned segments that render in
+separate processes and are joined afterwards (requires ``pypdf``).
+"""
+from collections import deque
+from functools import lru_cache
+from io import BytesIO
+from itertools import islice
+from math import ceil
+from pathlib import Path
+
+from django.conf import settings
+
+FONT_PATH = Path(settings.BASE_DIR) / 'static' / 'fonts' / 'Cairo-Regular.ttf'
+SHAPE_CACHE_SIZE = 8192
+
+FONT_SIZE = 9
+ROW_HEIGHT = 16
+TITLE_SPACE = 12
+# Rows keep one fixed height (page breaks are computed from row counts), so
+# text wider than its column is cut with an ellipsis instead of wrapping.
+CELL_PADDING = 12
+ELLIPSIS = '…'
+
+# Pages rendered by one worker in render_report_pdf_parallel().
+SEGMENT_PAGES = 50
+
+
+@lru_cache(maxsize=None)
+def _shaper():
+    try:
+        import arabic_reshaper
+        from bidi.algorithm import get_display
+    except ImportError:
+        return None
+    return lambda text: get_display(arabic_reshaper.reshape(text))
+
+
+def _reshape(text):
+    shaper = _shaper()
+    if shaper is None or text.isascii():
+        return text
+    try:
+        return shaper(text)
+    except Exception:
+        return text
+
+
+_shape = lru_cache(maxsize=SHAPE_CACHE_SIZE)(_reshape)
+
+
+def shape_text(value):
+    """Return ``value`` as display-ordered text; plain ASCII skips the shaper."""
+    text = str(value)
+    if text.isascii():
+        return text
+    return _shape(text)
+
+
+@lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def _fit(text, width):
+    """``text`` shaped for display and cut with an ellipsis to fit ``width`` points."""
+    # No glyph is wider than the font size, so short text skips measuring.
+    if len(text) * FONT_SIZE <= width:
+        return shape_text(text)
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    font_name = _setup()[0]
+    shaped = shape_text(text)
+    if stringWidth(shaped, font_name, FONT_SIZE) <= width:
+        return shaped
+    # Cut the logical text, before shaping, so right-to-left text keeps its
+    # start; the trial cuts bypass the shaping cache.
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if stringWidth(_reshape(text[:middle].rstrip() + ELLIPSIS), font_name, FONT_SIZE) <= width:
+            low = middle
+        else:
+            high = middle - 1
+    return shape_text(text[:low].rstrip() + ELLIPSIS)
+
+
+def _column_widths(report, total):
+    weights = getattr(report, 'widths', None) or [1] * len(report.labels)
+    scale = total / sum(weights)
+    return [weight * scale for weight in weights]
+
+
+@lru_cache(maxsize=None)
+def _setup():
+    """Register the font and build the styles once per process."""
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_RIGHT
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.platypus import TableStyle
+
+    font_name = 'Helvetica'
+    if FONT_PATH.exists():
+        pdfmetrics.registerFont(TTFont('Cairo', str(FONT_PATH)))
+        font_name = 'Cairo'
+    title_style = ParagraphStyle(
+        'ReportTitle', parent=getSampleStyleSheet()['Title'], fontName=font_name, alignment=TA_RIGHT
+    )
+    table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('FONTNAME', (0, 0), (-1, -1), font_name),
+        ('FONTSIZE', (0, 0), (-1, -1), FONT_SIZE),
+        ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ])
+    return font_name, title_style, table_style
+
+
+class _FlowableStream(list):
+    """List facade over a flowable generator.
+
+    ``doc.build`` only inspects the head of its story and deletes flowables
+    once they are drawn, so refilling a short buffer on access keeps just a
+    page or two of tables alive at a time.
+    """
+
+    def __init__(self, flowables, lookahead=2):
+        super().__init__()
+        self._source = iter(flowables)
+        self._lookahead = lookahead
+
+    def _fill(self):
+        while self._source is not None and super().__len__() < self._lookahead:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self):
+        self._fill()
+        return super().__len__()
+
+    def __getitem__(self, index):
+        self._fill()
+        return super().__getitem__(index)
+
+
+def _tables(header, rows, first_page_rows, page_rows, col_widths, table_style):
+    from reportlab.platypus import Table
+
+    rows = iter(rows)
+    size = first_page_rows
+    first = True
+    space = [width - CELL_PADDING for width in col_widths]
+    while True:
+        chunk = [[_fit(str(value), room) for value, room in zip(row, space)] for row in islice(rows, size)]
+        # An empty report still gets its header row.
+        if not chunk and not first:
+            return
+        table = Table([header] + chunk, colWidths=col_widths, rowHeights=ROW_HEIGHT, repeatRows=1, hAlign='LEFT')
+        table.setStyle(table_style)
+        yield table
+        if len(chunk) < size:
+            return
+        size = page_rows
+        first = False
+
+
+def _document(fileobj, title):
+    """Return the document, its title flowable and the table rows that fit
+    on the first and on every following page."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import Paragraph, SimpleDocTemplate
+
+    _, title_style, _ = _setup()
+    doc = SimpleDocTemplate(fileobj, pagesize=A4, title=title)
+    heading = Paragraph(shape_text(title), title_style)
+    # Frames pad 6pt on each side; size every table so it fills exactly one page.
+    frame_height = doc.height - 12
+    title_height = heading.wrap(doc.width, frame_height)[1] + heading.getSpaceAfter() + TITLE_SPACE
+    first_page_rows = max(1, int((frame_height - title_height) // ROW_HEIGHT) - 1)
+    page_rows = max(1, int(frame_height // ROW_HEIGHT) - 1)
+    return doc, heading, first_page_rows, page_rows
+
+
+def _page_footer(page_offset, total_pages):
+    def draw(canvas, doc):
+        number = page_offset + doc.page
+        label = f'{number} / {total_pages}' if total_pages else str(number)
+        font_name, _, _ = _setup()
+        canvas.saveState()
+        canvas.setFont(font_name, FONT_SIZE)
+        canvas.drawCentredString(doc.leftMargin + doc.width / 2, doc.bottomMargin / 2, label)
+        canvas.restoreState()
+    return draw
+
+
+def _story(heading, tables):
+    from reportlab.platypus import Spacer
+
+    if heading is not None:
+        yield heading
+        yield Spacer(1, TITLE_SPACE)
+    yield from tables
+
+
+def render_report_pdf(report, fileobj, rows=None, page_offset=0, total_pages=None, with_title=True):
+    """Render ``report`` as a PDF into ``fileobj`` and return the page count.
+
+    ``rows`` defaults to ``report.rows()``; callers pass their own iterable
+    to observe progress. ``page_offset``, ``total_pages`` and
+    ``with_title`` let a segment of a larger document number its pages
+    consistently with the rest.
+    """
+    if rows is None:
+        rows = report.rows()
+    _, _, table_style = _setup()
+
+    doc, heading, first_page_rows, page_rows = _document(fileobj, report.title)
+    if not with_title:
+        heading, first_page_rows = None, page_rows
+
+    col_widths = _column_widths(report, doc.width - 12)
+    header = [_fit(label, width - CELL_PADDING) for label, width in zip(report.labels, col_widths)]
+    tables = _tables(header, rows, first_page_rows, page_rows, col_widths, table_style)
+    footer = _page_footer(page_offset, total_pages)
+    doc.build(_FlowableStream(_story(heading, tables)), onFirstPage=footer, onLaterPages=footer)
+    return doc.page
+
+
+class _Header:
+    """The picklable part of a report that a segment renderer needs."""
+
+    def __init__(self, title, labels, widths):
+        self.title = title
+        self.labels = labels
+        self.widths = widths
+
+
+def _render_segment(header, rows, page_offset, total_pages, with_title):
+    buffer = BytesIO()
+    render_report_pdf(header, buffer, rows=rows, page_offset=page_offset,
+                      total_pages=total_pages, with_title=with_title)
+    return buffer.getvalue()
+
+
+def render_report_pdf_parallel(report, fileobj, processes, rows=None, total=None, segment_pages=SEGMENT_PAGES):
+    """Render ``report`` in page-aligned segments across ``processes`` worker
+    processes and join them into one document; returns the page count.
+
+    Every table fills exactly one page, so the page each row lands on, and
+    with it the total page count, is known from the row count alone. Falls
+    back to :func:`render_report_pdf` when pypdf is not installed.
+    """
+    try:
+        from pypdf import PdfReader, PdfWriter
+    except ImportError:
+        return render_report_pdf(report, fileobj, rows=rows)
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    import django
+
+    if rows is None:
+        rows = report.rows()
+    if total is None:
+        total = report.count()
+    _, _, first_page_rows, page_rows = _document(BytesIO(), report.title)
+    total_pages = 1 + ceil(max(0, total - first_page_rows) / page_rows)
+    header = _Header(report.title, list(report.labels), list(report.widths))
+
+    rows = iter(rows)
+    writer = PdfWriter()
+    pending = deque()
+    page_offset = 0
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=django.setup) as pool:
+        first = True
+        while True:
+            size = first_page_rows + (segment_pages - 1) * page_rows if first else segment_pages * page_rows
+            segment = list(islice(rows, size))
+            if not segment and not first:
+                break
+            pending.append(pool.submit(_render_segment, header, segment, page_offset, total_pages, first))
+            if first:
+                page_offset += 1 + ceil(max(0, len(segment) - first_page_rows) / page_rows)
+            else:
+                page_offset += ceil(len(segment) / page_rows)
+            first = False
+            # Bound the rows and rendered segments held in memory at once.
+            while len(pending) >= processes * 2:
+                writer.append(PdfReader(BytesIO(pending.popleft().result())))
+            if len(segment) < size:
+                break
+        while pending:
+            writer.append(PdfReader(BytesIO(pending.popleft().result())))
+    writer.add_metadata({'/Title': report.title})
+    writer.write(fileobj)
+    return page_offset
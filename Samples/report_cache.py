@@ -0,0 +1,179 @@
+"""Cache of built report rows shared by the reports page and its exports.
+
+Rows are stored under the report parameters and a generation number;
+any write to ``Sample`` or ``AuditLog`` bumps the generation (see
+``Samples.signals``), which retires every cached report at once.
+
+On a miss the rows are streamed from the database as usual and stored
+once the last one has gone out, so the first byte is not delayed.
+Concurrent requests for the same missing report are coalesced: one
+computes it while the others wait for the result to appear.
+
+Both the invalidation and the coalescing need a cache every web process
+shares; on a per-process one (see ``Samples.caching``) reports are
+built uncached.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Max
+
+from . import caching
+from .models import AuditLog, Sample
+from .reports import REPORTS, Report, build_report
+
+_GENERATION_KEY = 'reports:generation'
+_STATS_KEYS = {name: f'reports:stats:{name}' for name in ('hits', 'misses', 'coalesced', 'uncacheable')}
+# Stored instead of the rows when a report is too large to cache.
+_TOO_LARGE = 'too-large'
+
+LOCK_TIMEOUT = 60
+WAIT_INTERVAL = 0.05
+
+
+def _alias():
+    return getattr(settings, 'REPORT_RESULT_CACHE', 'default')
+
+
+def _cache():
+    return caches[_alias()]
+
+
+def enabled():
+    return caching.is_shared(_alias())
+
+
+def _timeout():
+    return getattr(settings, 'REPORT_RESULT_CACHE_TTL', 300)
+
+
+def _max_rows():
+    return getattr(settings, 'REPORT_RESULT_CACHE_MAX_ROWS', 50000)
+
+
+def _generation(cache):
+    generation = cache.get(_GENERATION_KEY)
+    if generation is None:
+        # Seed from the clock so an evicted counter never reuses old keys.
+        cache.add(_GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(_GENERATION_KEY)
+    return generation
+
+
+def _bump():
+    cache = _cache()
+    try:
+        cache.incr(_GENERATION_KEY)
+    except ValueError:
+        cache.set(_GENERATION_KEY, time.time_ns(), None)
+
+
+def invalidate(using='default'):
+    """Retire every cached report.
+
+    Bumped immediately and again on commit, so a report computed from the
+    pre-commit state while the transaction was open is not kept either.
+    """
+    _bump()
+    transaction.on_commit(_bump, using=using)
+
+
+def data_version(using='default'):
+    """A cheap token that changes with every write a report could show.
+
+    The latest ``updated_at`` and audit id (both read from an index) cover
+    inserts and edits; the generation also moves on deletions.
+    """
+    last_edit = Sample.objects.using(using).aggregate(last=Max('updated_at'))['last']
+    last_log = AuditLog.objects.using(using).aggregate(last=Max('id'))['last']
+    return f"{_generation(_cache())}:{last_edit.isoformat() if last_edit else ''}:{last_log}"
+
+
+def _count(cache, name):
+    key = _STATS_KEYS[name]
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def stats():
+    cache = _cache()
+    values = cache.get_many(list(_STATS_KEYS.values()))
+    return {name: values.get(key, 0) for name, key in _STATS_KEYS.items()}
+
+
+def reset_stats():
+    _cache().delete_many(list(_STATS_KEYS.values()))
+
+
+def _key(cache, report_type, from_date, to_date, user_id):
+    raw = json.dumps([report_type, from_date, to_date, str(user_id)])
+    return f'reports:{_generation(cache)}:{hashlib.sha1(raw.encode("utf-8")).hexdigest()}'
+
+
+class _CachingReport(Report):
+    """A report missing from the cache: streams its rows and stores them once all have gone out.
+
+    The coalescing lock is taken when the rows are first read, and released
+    when the stream ends or is abandoned.
+    """
+
+    def __init__(self, report, cache, key):
+        super().__init__(report.spec, report.queryset, archived=report.archived)
+        self._cache = cache
+        self._key = key
+
+    def rows(self, chunk_size=2000):
+        cache, key = self._cache, self._key
+        lock = f'{key}:lock'
+        if not cache.add(lock, 1, LOCK_TIMEOUT):
+            # Someone else is computing this report; wait for their result.
+            rows = None
+            deadline = time.monotonic() + LOCK_TIMEOUT
+            while rows is None and time.monotonic() < deadline and cache.get(lock) is not None:
+                time.sleep(WAIT_INTERVAL)
+                rows = cache.get(key)
+            if rows is not None and rows != _TOO_LARGE:
+                _count(cache, 'coalesced')
+                yield from rows
+                return
+            yield from super().rows(chunk_size)
+            return
+        try:
+            _count(cache, 'misses')
+            limit = _max_rows()
+            kept = []
+            for row in super().rows(chunk_size):
+                if kept is not None:
+                    kept.append(row)
+                    if len(kept) > limit:
+                        kept = None
+                yield row
+            cache.set(key, _TOO_LARGE if kept is None else kept, _timeout())
+        finally:
+            cache.delete(lock)
+
+
+def get_report(report_type, from_date='', to_date='', user_id=''):
+    """Like :func:`build_report`, but serves the rows from the cache when possible."""
+    if report_type not in REPORTS:
+        report_type = 'samples'
+    report = build_report(report_type, from_date, to_date, user_id)
+    if not enabled():
+        return report
+    cache = _cache()
+    key = _key(cache, report_type, from_date, to_date, user_id)
+    rows = cache.get(key)
+    if rows == _TOO_LARGE:
+        _count(cache, 'uncacheable')
+        return report
+    if rows is not None:
+        _count(cache, 'hits')
+        return Report(report.spec, report.queryset, rows=rows)
+    return _CachingReport(report, cache, key)
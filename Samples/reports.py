@@ -0,0 +1,271 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Case, F, When
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import archive
+from .models import AuditLog, Sample
+from .routers import bind
+
+STATUS_LABELS = {
+    'pending': 'قيد الفحص',
+    'checked': 'تم التحقق',
+    'approved': 'معتمدة',
+    'rejected': 'مرفوضة',
+}
+
+STATUS_COLUMN_LABELS = ('الحالة', 'الحالة النهائية')
+
+# Where an archived audit entry keeps the value of a projected field.
+ARCHIVE_FIELDS = {
+    'sample__sample_number': 'sample_number',
+    'user__username': 'username',
+}
+
+
+def _as_is(value):
+    return '' if value is None else value
+
+
+def _or_dash(value):
+    return '-' if value is None else value
+
+
+def _format_datetime(value):
+    return value.strftime('%Y-%m-%d %H:%M') if value else ''
+
+
+def _format_date(value):
+    return value.strftime('%Y-%m-%d') if value else ''
+
+
+class Column:
+    """One report column: a projected field (or a constant) and its formatter.
+
+    ``width`` is the column's share of the page width in the PDF export,
+    relative to the other columns.
+    """
+
+    __slots__ = ('label', 'field', 'format', 'value', 'is_status', 'width')
+
+    def __init__(self, label, field=None, format=_as_is, value='', width=1):
+        self.label = label
+        self.field = field
+        self.format = format
+        self.value = value
+        self.is_status = label in STATUS_COLUMN_LABELS
+        self.width = width
+
+
+class ReportSpec:
+    """Declarative definition of a report type.
+
+    ``queryset`` receives the parsed filters and returns the base queryset;
+    the fields referenced by ``columns`` are projected from it with a single
+    ``values_list`` query. ``archived``, if given, receives the same filters
+    and returns the :func:`Samples.archive.read` arguments for the entries
+    of this report that were moved out of the hot table.
+    """
+
+    def __init__(self, title, columns, queryset, ordering, archived=None):
+        self.title = title
+        self.columns = columns
+        self.queryset = queryset
+        self.ordering = ordering
+        self.archived = archived
+        self.fields = []
+        self._plan = []
+        for column in columns:
+            if column.field is None:
+                self._plan.append((None, column.value))
+                continue
+            if column.field not in self.fields:
+                self.fields.append(column.field)
+            self._plan.append((self.fields.index(column.field), column.format))
+
+    def format_row(self, raw):
+        return tuple(
+            formatter if index is None else formatter(raw[index])
+            for index, formatter in self._plan
+        )
+
+    def format_record(self, record):
+        """Format an archived entry (see ``Samples.archive``) like a hot row."""
+        return self.format_row([record[ARCHIVE_FIELDS.get(field, field)] for field in self.fields])
+
+
+class Report:
+    """A built report: column metadata plus a lazily evaluated row stream.
+
+    Rows are plain tuples of display values in column order; the HTML view,
+    the Excel export and the PDF export all consume the same stream.
+    """
+
+    def __init__(self, spec, queryset, rows=None, archived=None):
+        self.spec = spec
+        self.title = spec.title
+        self.labels = [column.label for column in spec.columns]
+        self.widths = [column.width for column in spec.columns]
+        self.columns = [{'label': column.label, 'is_status': column.is_status} for column in spec.columns]
+        self.status_columns = {i for i, column in enumerate(spec.columns) if column.is_status}
+        self.queryset = queryset
+        # Already formatted rows, e.g. from Samples.report_cache.
+        self._rows = rows
+        # Arguments for Samples.archive.read/count; archived entries follow the hot rows.
+        self.archived = archived
+
+    def rows(self, chunk_size=2000):
+        if self._rows is not None:
+            yield from self._rows
+            return
+        format_row = self.spec.format_row
+        for raw in self.queryset.iterator(chunk_size=chunk_size):
+            yield format_row(raw)
+        if self.archived is not None:
+            format_record = self.spec.format_record
+            for record in archive.read(**self.archived):
+                yield format_record(record)
+
+    def count(self):
+        if self._rows is not None:
+            return len(self._rows)
+        total = self.queryset.count()
+        if self.archived is not None:
+            total += archive.count(**self.archived)
+        return total
+
+    def __iter__(self):
+        return self.rows()
+
+
+class ReportFilters:
+    def __init__(self, from_date='', to_date='', user_id=''):
+        self.start = parse_date(from_date) if from_date else None
+        self.end = parse_date(to_date) if to_date else None
+        self.user_id = int(user_id) if str(user_id).isdigit() else None
+
+    def bounds(self):
+        """The ``[start, end)`` datetimes covered by the date filters (``None`` if open)."""
+        tz = timezone.get_current_timezone()
+        start = end = None
+        if self.start:
+            start = timezone.make_aware(datetime.combine(self.start, time.min), tz)
+        if self.end:
+            end = timezone.make_aware(datetime.combine(self.end + timedelta(days=1), time.min), tz)
+        return start, end
+
+    def timestamp_range(self, qs):
+        # Compare against datetime bounds rather than ``__date`` so the
+        # (event_type, timestamp) and (user, timestamp) indexes are usable.
+        start, end = self.bounds()
+        if start:
+            qs = qs.filter(timestamp__gte=start)
+        if end:
+            qs = qs.filter(timestamp__lt=end)
+        return qs
+
+    def by_user(self, qs):
+        if self.user_id is not None:
+            qs = qs.filter(user_id=self.user_id)
+        return qs
+
+
+def _rfid_logs(filters):
+    return filters.by_user(filters.timestamp_range(AuditLog.objects.filter(event_type=AuditLog.Event.RFID_CHECK)))
+
+
+def _approval_logs(filters):
+    return filters.by_user(filters.timestamp_range(AuditLog.objects.filter(event_type=AuditLog.Event.APPROVE)))
+
+
+def _audit_logs(filters):
+    return filters.by_user(filters.timestamp_range(AuditLog.objects.all()))
+
+
+def _archived(*event_types):
+    def arguments(filters):
+        start, end = filters.bounds()
+        return {'start': start, 'end': end, 'event_types': event_types or None, 'user_id': filters.user_id}
+    return arguments
+
+
+def _samples(filters):
+    samples = Sample.objects.all()
+    if filters.start:
+        samples = samples.filter(collected_date__gte=filters.start)
+    if filters.end:
+        samples = samples.filter(collected_date__lte=filters.end)
+    # The approver comes from the sample's own workflow snapshot; a user
+    # filter only shows approvals made by that user.
+    approver = F('approved_by__username')
+    if filters.user_id is not None:
+        approver = Case(When(approved_by_id=filters.user_id, then=approver), default=None)
+    return samples.annotate(approver=approver)
+
+
+REPORTS = {
+    'rfid': ReportSpec(
+        'تقرير فحص RFID',
+        [
+            Column('رقم العينة', 'sample__sample_number', _or_dash),
+            Column('UID', 'uid', width=1.5),
+            Column('وقت الفحص', 'timestamp', _format_datetime, width=1.5),
+            Column('المستخدم', 'user__username'),
+            Column('النتيجة', value='نجاح'),
+        ],
+        _rfid_logs,
+        ('-timestamp',),
+        _archived(AuditLog.Event.RFID_CHECK),
+    ),
+    'approval': ReportSpec(
+        'تقرير الاعتماد',
+        [
+            Column('رقم العينة', 'sample__sample_number', _or_dash),
+            Column('تاريخ الاعتماد', 'timestamp', _format_datetime, width=1.5),
+            Column('المستخدم', 'user__username'),
+            Column('الحالة النهائية', value='معتمدة'),
+            Column('ملاحظات'),
+        ],
+        _approval_logs,
+        ('-timestamp',),
+        _archived(AuditLog.Event.APPROVE),
+    ),
+    'audit': ReportSpec(
+        'تقرير النشاط',
+        [
+            Column('المستخدم', 'user__username'),
+            Column('الإجراء', 'action', width=3),
+            Column('رقم العينة', 'sample__sample_number', _or_dash),
+            Column('التاريخ والوقت', 'timestamp', _format_datetime, width=1.5),
+        ],
+        _audit_logs,
+        ('-timestamp',),
+        _archived(),
+    ),
+    'samples': ReportSpec(
+        'تقرير العينات',
+        [
+            Column('رقم العينة', 'sample_number'),
+            Column('نوع العينة', 'sample_type'),
+            Column('التصنيف', 'category'),
+            Column('تاريخ الجمع', 'collected_date', _format_date),
+            Column('الحالة', 'status', lambda value: STATUS_LABELS.get(value, value)),
+            Column('تم فحص RFID', 'checked_at', lambda value: 'نعم' if value else 'لا'),
+            Column('المعتمد', 'approver', _or_dash),
+        ],
+        _samples,
+        ('-collected_date', '-id'),
+    ),
+}
+
+
+def build_report(report_type, from_date='', to_date='', user_id=''):
+    """Return the :class:`Report` for ``report_type`` (unknown types fall back to samples)."""
+    spec = REPORTS.get(report_type, REPORTS['samples'])
+    filters = ReportFilters(from_date, to_date, user_id)
+    # Bound now: the rows are usually read later, while the response streams.
+    queryset = bind(spec.queryset(filters).order_by(*spec.ordering).values_list(*spec.fields))
+    archived = spec.archived(filters) if spec.archived else None
+    return Report(spec, queryset, archived=archived)
+
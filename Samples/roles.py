@@ -0,0 +1,98 @@
+"""Role and permission resolution shared by the Samples and Users apps.
+
+A user's group names and permission codes are loaded once and memoized on
+the user object for the rest of the request. When ``settings.ROLES_CACHE``
+names a cache every web process shares, they are also kept there across
+requests, and membership and permission changes invalidate the cached
+entry through the signal handlers in ``Samples.signals``. On a
+per-process cache an invalidation would only reach the worker that made
+the change, so nothing is kept across requests.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+from . import caching
+
+ADMIN = 'Admin'
+OPERATOR = 'Operator'
+VIEWER = 'Viewer'
+
+CACHE_TIMEOUT = 300
+_GENERATION_KEY = 'roles:generation'
+_EMPTY = (frozenset(), frozenset())
+
+
+def _cache():
+    """The shared cache for role data, or ``None`` if there is none."""
+    alias = getattr(settings, 'ROLES_CACHE', 'default')
+    return caches[alias] if caching.is_shared(alias) else None
+
+
+def _generation(cache):
+    generation = cache.get(_GENERATION_KEY)
+    if generation is None:
+        # Seed from the clock so an evicted counter never reuses old keys.
+        cache.add(_GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(_GENERATION_KEY)
+    return generation
+
+
+def _cache_key(cache, user_id):
+    return f'roles:{_generation(cache)}:{user_id}'
+
+
+def _load(user):
+    groups = frozenset(user.groups.values_list('name', flat=True))
+    permissions = frozenset(ModelBackend().get_all_permissions(user))
+    return groups, permissions
+
+
+def get_roles(user):
+    """Return ``(group_names, permission_codes)`` for ``user``."""
+    if not user.is_authenticated or not user.is_active:
+        return _EMPTY
+    roles = getattr(user, '_roles_cache', None)
+    if roles is None:
+        cache = _cache()
+        if cache is None:
+            roles = _load(user)
+        else:
+            key = _cache_key(cache, user.pk)
+            roles = cache.get(key)
+            if roles is None:
+                roles = _load(user)
+                cache.set(key, roles, CACHE_TIMEOUT)
+        user._roles_cache = roles
+    return roles
+
+
+def has_role(user, *names):
+    return not get_roles(user)[0].isdisjoint(names)
+
+
+def invalidate_user(user_id):
+    cache = _cache()
+    if cache is not None:
+        cache.delete(_cache_key(cache, user_id))
+
+
+def invalidate_all():
+    cache = _cache()
+    if cache is None:
+        return
+    try:
+        cache.incr(_GENERATION_KEY)
+    except ValueError:
+        cache.set(_GENERATION_KEY, time.time_ns(), None)
+
+
+class CachedModelBackend(ModelBackend):
+    """``ModelBackend`` whose permission checks read the cached role data."""
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if obj is not None:
+            return set()
+        return get_roles(user_obj)[1]
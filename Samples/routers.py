@@ -0,0 +1,98 @@
+"""Read/write split for reports, exports and list endpoints.
+
+``settings.READ_DATABASES`` names database aliases that hold read-only
+copies of ``default`` (a replica, or an SQLite snapshot refreshed by the
+``refresh_read_snapshot`` command). Code that may tolerate slightly stale
+data opts in with :func:`replica_reads` (or :func:`bind` for querysets
+that are evaluated later, e.g. while a response streams); everything else,
+and every write, uses ``default``.
+
+Once a request writes, its remaining reads stay on ``default``, and
+:class:`PrimaryPinningMiddleware` keeps the same browser on ``default``
+for ``READ_PIN_SECONDS`` afterwards so a redirect after a POST never
+shows data the replica has not caught up with yet.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRIMARY = 'default'
+PIN_COOKIE = 'primary_pin'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+# None outside a request: background tasks are never pinned.
+_pinned = ContextVar('pinned_to_primary', default=None)
+
+
+def read_aliases():
+    return list(getattr(settings, 'READ_DATABASES', []))
+
+
+def pin_seconds():
+    return getattr(settings, 'READ_PIN_SECONDS', 5)
+
+
+def is_pinned():
+    return bool(_pinned.get())
+
+
+@contextmanager
+def replica_reads():
+    """Send the reads made inside the block to a read alias, when there is one."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def bind(queryset):
+    """Fix ``queryset`` to the alias :func:`replica_reads` would pick now."""
+    with replica_reads():
+        return queryset.using(queryset.db)
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = read_aliases()
+        if aliases and _replica_reads.get() and not _pinned.get():
+            return random.choice(aliases)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        if _pinned.get() is not None:
+            _pinned.set(True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Read aliases are copies of the primary and are never migrated directly.
+        return db not in read_aliases()
+
+
+class PrimaryPinningMiddleware:
+    """Scopes the pin to one request and carries it across the redirect after a write."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        token = _pinned.set(request.method not in ('GET', 'HEAD', 'OPTIONS') or pinned_until > time.time())
+        try:
+            response = self.get_response(request)
+            wrote = _pinned.get() and pinned_until <= time.time()
+        finally:
+            _pinned.reset(token)
+        if wrote and read_aliases():
+            response.set_cookie(PIN_COOKIE, str(time.time() + pin_seconds()), max_age=pin_seconds(), httponly=True, samesite='Lax')
+        return response
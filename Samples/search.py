@@ -0,0 +1,153 @@
+import re
+
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Sample
+
+FTS_TABLE = 'Samples_sample_fts'
+
+# Tashkeel, superscript alef and tatweel carry no meaning for matching names.
+_DIACRITICS = re.compile('[\u064b-\u0652\u0670\u0640]')
+_LETTER_FORMS = str.maketrans({
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    'ٱ': 'ا',
+    'ى': 'ي',
+    'ئ': 'ي',
+    'ؤ': 'و',
+    'ة': 'ه',
+})
+_WORD = re.compile(r'\w+')
+
+_available = {}
+
+
+def normalize_arabic(text):
+    """Fold Arabic spelling variants (alef/hamza forms, ta marbuta, tashkeel)."""
+    return _DIACRITICS.sub('', str(text)).translate(_LETTER_FORMS).lower()
+
+
+def _number_terms(sample_number):
+    # The compact form lets "S-0001" be found by typing "s00"; the individual
+    # parts let it be found by "0001".
+    parts = _WORD.findall(str(sample_number).lower())
+    return ' '.join([''.join(parts)] + parts) if parts else ''
+
+
+def _name_terms(person_name):
+    return ' '.join(_WORD.findall(normalize_arabic(person_name)))
+
+
+def _quote(term):
+    return '"' + term.replace('"', '""') + '"*'
+
+
+def match_expression(query):
+    """Build the FTS5 MATCH expression for a search box query (or ``None``)."""
+    words = _WORD.findall(normalize_arabic(query))
+    if not words:
+        return None
+    compact = ''.join(_WORD.findall(str(query).lower()))
+    names = ' AND '.join(_quote(word) for word in words)
+    return f'sample_number : {_quote(compact)} OR person_name : ({names})'
+
+
+def is_available(using='default'):
+    if using not in _available:
+        connection = connections[using]
+        _available[using] = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return _available[using]
+
+
+def create_index(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS "{FTS_TABLE}" USING fts5('
+            "sample_number, person_name, tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')"
+        )
+    _available.pop(connection.alias, None)
+
+
+def drop_index(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS "{FTS_TABLE}"')
+    _available.pop(connection.alias, None)
+
+
+def index_samples(rows, using='default'):
+    """Upsert ``(id, sample_number, person_name)`` rows into the shadow table."""
+    if not is_available(using):
+        return
+    rows = [(pk, _number_terms(number), _name_terms(name)) for pk, number, name in rows]
+    if not rows:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f'DELETE FROM "{FTS_TABLE}" WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(
+            f'INSERT INTO "{FTS_TABLE}" (rowid, sample_number, person_name) VALUES (%s, %s, %s)', rows
+        )
+
+
+def remove_samples(ids, using='default'):
+    if not is_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f'DELETE FROM "{FTS_TABLE}" WHERE rowid = %s', [(pk,) for pk in ids])
+
+
+def rebuild_index(using='default', batch_size=5000):
+    """Repopulate the shadow table from ``Sample``; returns the number of rows indexed."""
+    if not is_available(using):
+        return 0
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{FTS_TABLE}"')
+    total = 0
+    batch = []
+    rows = Sample.objects.using(using).values_list('id', 'sample_number', 'person_name')
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            index_samples(batch, using)
+            total += len(batch)
+            batch = []
+    index_samples(batch, using)
+    total += len(batch)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'INSERT INTO "{FTS_TABLE}" ("{FTS_TABLE}") VALUES (\'optimize\')')
+    return total
+
+
+def filter_samples(queryset, query):
+    """Restrict ``queryset`` to samples matching ``query``, keeping its ordering."""
+    expression = match_expression(query)
+    if expression is None:
+        return queryset
+    if is_available(queryset.db):
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM "{FTS_TABLE}" WHERE "{FTS_TABLE}" MATCH %s', [expression]
+        ))
+    return queryset.filter(Q(sample_number__icontains=query) | Q(person_name__icontains=query))
+
+
+def search(query, limit=10, using='default'):
+    """Return up to ``limit`` samples ranked by relevance (BM25)."""
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    if not is_available(using):
+        return list(filter_samples(Sample.objects.using(using), query).order_by('-collected_date', '-id')[:limit])
+    try:
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM "{FTS_TABLE}" WHERE "{FTS_TABLE}" MATCH %s '
+                f'ORDER BY bm25("{FTS_TABLE}", 10.0, 1.0) LIMIT %s',
+                [expression, limit],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+    except DatabaseError:
+        return []
+    samples = Sample.objects.using(using).in_bulk(ids)
+    return [samples[pk] for pk in ids if pk in samples]
@@ -5,3 +5,12 @@ class SampleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Sample
         fields = '__all__'
+        # Status changes go through the transition endpoints (Samples.transitions).
+        read_only_fields = ['status', 'checked_at', 'checked_by', 'approved_at', 'approved_by', 'rejected_at', 'rejected_by']
+
+    def __init__(self, *args, fields=None, **kwargs):
+        # Sparse fieldsets: ``fields`` limits the output to the named fields.
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
@@ -0,0 +1,102 @@
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import report_cache, roles, search, stats
+from .models import AuditLog, Sample
+
+
+# The shadow table lives in the same database, so these writes commit or
+# roll back together with the sample row itself.
+@receiver(post_save, sender=Sample)
+def index_sample(sender, instance, using, **kwargs):
+    search.index_samples([(instance.pk, instance.sample_number, instance.person_name)], using)
+
+
+@receiver(post_delete, sender=Sample)
+def unindex_sample(sender, instance, using, **kwargs):
+    search.remove_samples([instance.pk], using)
+
+
+def _tracked_values(instance):
+    values = tuple(instance.__dict__.get(name) for name in stats.TRACKED_FIELDS)
+    # Deferred fields are missing from __dict__; never load them here.
+    return None if None in values else values
+
+
+@receiver(post_init, sender=Sample)
+def remember_sample_stats(sender, instance, **kwargs):
+    instance._stats_snapshot = _tracked_values(instance) if instance.pk else None
+
+
+@receiver(pre_save, sender=Sample)
+@receiver(pre_delete, sender=Sample)
+def load_sample_stats(sender, instance, using, raw=False, **kwargs):
+    if instance.pk and instance._stats_snapshot is None and not raw:
+        instance._stats_snapshot = (
+            Sample.objects.using(using).filter(pk=instance.pk).values_list(*stats.TRACKED_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=Sample)
+def count_sample(sender, instance, created, using, raw, **kwargs):
+    if raw:
+        return
+    old = None if created else instance._stats_snapshot
+    new = _tracked_values(instance)
+    if new is None and old is not None:
+        # Saving a partially loaded instance leaves its deferred fields untouched.
+        new = tuple(instance.__dict__.get(name, value) for name, value in zip(stats.TRACKED_FIELDS, old))
+    stats.apply(stats.sample_delta(old, new), using)
+    instance._stats_snapshot = new
+
+
+@receiver(post_delete, sender=Sample)
+def uncount_sample(sender, instance, using, **kwargs):
+    stats.apply(stats.sample_delta(instance._stats_snapshot, None), using)
+
+
+@receiver(post_save, sender=AuditLog)
+def count_activity(sender, instance, created, using, raw, **kwargs):
+    if created and not raw:
+        stats.apply(stats.activity_delta(instance.event_type, instance.timestamp), using)
+
+
+@receiver(post_save, sender=Sample)
+@receiver(post_delete, sender=Sample)
+@receiver(post_save, sender=AuditLog)
+@receiver(post_delete, sender=AuditLog)
+def invalidate_reports(sender, using, **kwargs):
+    report_cache.invalidate(using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_roles(sender, instance, **kwargs):
+    instance.__dict__.pop('_roles_cache', None)
+    roles.invalidate_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        instance.__dict__.pop('_roles_cache', None)
+        roles.invalidate_user(instance.pk)
+    elif pk_set:
+        for user_id in pk_set:
+            roles.invalidate_user(user_id)
+    else:
+        # group.user_set.clear() does not say which users were affected.
+        roles.invalidate_all()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_roles(sender, **kwargs):
+    action = kwargs.get('action')
+    if action is None or action.startswith('post_'):
+        roles.invalidate_all()
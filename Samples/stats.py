@@ -0,0 +1,209 @@
+"""Incrementally maintained daily counters for the dashboard.
+
+Every sample creation, edit, deletion and status transition applies its
+deltas to :class:`~Samples.models.DailyStat` inside the transaction that
+made the change (through the signal handlers in ``Samples.signals`` or
+explicitly from bulk paths), so the dashboard only reads one row per day
+and key. :func:`compute` derives the same counters from scratch for the
+``rebuild_daily_stats`` command.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import archive
+from .models import AuditLog, DailyStat, Sample
+
+Metric = DailyStat.Metric
+
+# Audit events counted per day, and the metric each one feeds.
+ACTIVITY_METRICS = {
+    AuditLog.Event.RFID_CHECK: Metric.RFID_CHECKS,
+    AuditLog.Event.APPROVE: Metric.APPROVALS,
+    AuditLog.Event.REJECT: Metric.REJECTIONS,
+}
+
+# Sample fields the counters depend on.
+TRACKED_FIELDS = ('collected_date', 'sample_type', 'category', 'status')
+
+
+def sample_keys(collected_date, sample_type, category, status):
+    """The ``(day, metric, key)`` counters one sample contributes to."""
+    return [
+        (collected_date, Metric.SAMPLES, ''),
+        (collected_date, Metric.STATUS, status),
+        (collected_date, Metric.TYPE, sample_type),
+        (collected_date, Metric.CATEGORY, category),
+    ]
+
+
+def sample_delta(old, new):
+    """Counter deltas for a sample whose tracked fields went from ``old`` to ``new``.
+
+    Either side may be ``None`` for a creation or a deletion.
+    """
+    delta = Counter()
+    if old is not None:
+        delta.subtract(sample_keys(*old))
+    if new is not None:
+        delta.update(sample_keys(*new))
+    return delta
+
+
+def activity_delta(event_type, timestamp, count=1):
+    metric = ACTIVITY_METRICS.get(event_type)
+    if metric is None or not count:
+        return Counter()
+    return Counter({(timezone.localdate(timestamp), metric, ''): count})
+
+
+# Deltas with more keys than this (bulk imports) are applied in batches.
+BATCH_KEYS = 32
+
+
+def apply(delta, using='default'):
+    """Add ``delta`` (``{(day, metric, key): n}``) to the counters."""
+    items = sorted((k, amount) for k, amount in delta.items() if amount)
+    if len(items) > BATCH_KEYS:
+        _apply_batch(items, using)
+        return
+    for (day, metric, key), amount in items:
+        _add(day, metric, key, amount, using)
+
+
+def _add(day, metric, key, amount, using):
+    counters = DailyStat.objects.using(using).filter(day=day, metric=metric, key=key)
+    if counters.update(count=F('count') + amount):
+        return
+    try:
+        with transaction.atomic(using=using):
+            DailyStat.objects.using(using).create(day=day, metric=metric, key=key, count=amount)
+    except IntegrityError:
+        # Created concurrently since the UPDATE above.
+        counters.update(count=F('count') + amount)
+
+
+def _apply_batch(items, using):
+    """One SELECT, one ``executemany`` UPDATE and one INSERT instead of a query per key."""
+    days = {day for (day, _, _), _ in items}
+    metrics = {metric for (_, metric, _), _ in items}
+    ids = {
+        (day, metric, key): pk
+        for day, metric, key, pk in DailyStat.objects.using(using)
+        .filter(day__in=days, metric__in=metrics).values_list('day', 'metric', 'key', 'pk')
+    }
+    connection = connections[using]
+    updates = [(amount, ids[k]) for k, amount in items if k in ids]
+    if updates:
+        qn = connection.ops.quote_name
+        opts = DailyStat._meta
+        table, count, pk = qn(opts.db_table), qn(opts.get_field('count').column), qn(opts.pk.column)
+        with connection.cursor() as cursor:
+            cursor.executemany(f'UPDATE {table} SET {count} = {count} + %s WHERE {pk} = %s', updates)
+    missing = [(k, amount) for k, amount in items if k not in ids]
+    if not missing:
+        return
+    try:
+        with transaction.atomic(using=using):
+            DailyStat.objects.using(using).bulk_create(
+                [DailyStat(day=day, metric=metric, key=key, count=amount) for (day, metric, key), amount in missing]
+            )
+    except IntegrityError:
+        for (day, metric, key), amount in missing:
+            _add(day, metric, key, amount, using)
+
+
+def compute(using='default'):
+    """Return every counter as derived from the ``Sample`` and ``AuditLog`` rows
+    (and the archived audit segments)."""
+    counters = Counter()
+    samples = Sample.objects.using(using)
+    for metric, field in ((Metric.STATUS, 'status'), (Metric.TYPE, 'sample_type'), (Metric.CATEGORY, 'category')):
+        for day, key, count in samples.values_list('collected_date', field).annotate(n=Count('id')).order_by():
+            counters[(day, metric, key)] += count
+            if metric == Metric.STATUS:
+                counters[(day, Metric.SAMPLES, '')] += count
+
+    logs = (
+        AuditLog.objects.using(using)
+        .filter(event_type__in=list(ACTIVITY_METRICS))
+        .annotate(day=TruncDate('timestamp', tzinfo=timezone.get_current_timezone()))
+        .values_list('day', 'event_type')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    for day, event_type, count in logs:
+        counters[(day, ACTIVITY_METRICS[event_type], '')] += count
+    # Archived entries still count towards the day they happened on.
+    for (day, event_type), count in archive.daily_activity().items():
+        if event_type in ACTIVITY_METRICS:
+            counters[(day, ACTIVITY_METRICS[event_type], '')] += count
+    return counters
+
+
+def current(using='default'):
+    return Counter({
+        (day, metric, key): count
+        for day, metric, key, count in DailyStat.objects.using(using).values_list('day', 'metric', 'key', 'count')
+        if count
+    })
+
+
+def rebuild(using='default'):
+    """Replace the counters with freshly computed ones; returns how many were written."""
+    counters = compute(using)
+    with transaction.atomic(using=using):
+        DailyStat.objects.using(using).all().delete()
+        DailyStat.objects.using(using).bulk_create(
+            [DailyStat(day=day, metric=metric, key=key, count=count) for (day, metric, key), count in counters.items()],
+            batch_size=1000,
+        )
+    return len(counters)
+
+
+def drift(using='default'):
+    """``{(day, metric, key): (stored, expected)}`` for every counter that disagrees."""
+    expected = compute(using)
+    stored = current(using)
+    return {
+        key: (stored.get(key, 0), expected.get(key, 0))
+        for key in set(expected) | set(stored)
+        if stored.get(key, 0) != expected.get(key, 0)
+    }
+
+
+def dashboard(days=30):
+    """Dashboard figures read from the counters only."""
+    today = timezone.localdate()
+    totals = {metric: {} for metric in (Metric.STATUS, Metric.TYPE, Metric.CATEGORY)}
+    rows = (
+        DailyStat.objects.filter(metric__in=list(totals))
+        .values_list('metric', 'key')
+        .annotate(total=Sum('count'))
+        .order_by()
+    )
+    for metric, key, total in rows:
+        if total:
+            totals[metric][key] = total
+
+    since = today - timedelta(days=days - 1)
+    per_day = dict(
+        DailyStat.objects.filter(metric=Metric.SAMPLES, day__gte=since, day__lte=today).values_list('day', 'count')
+    )
+    activity = dict(
+        DailyStat.objects.filter(metric__in=list(ACTIVITY_METRICS.values()), day=today).values_list('metric', 'count')
+    )
+    return {
+        'by_status': totals[Metric.STATUS],
+        'by_type': sorted(totals[Metric.TYPE].items(), key=lambda item: -item[1]),
+        'by_category': sorted(totals[Metric.CATEGORY].items(), key=lambda item: -item[1]),
+        'per_day': [(day, per_day.get(day, 0)) for day in (since + timedelta(days=i) for i in range(days))],
+        'total': sum(totals[Metric.STATUS].values()),
+        'today_rfid_checks': activity.get(Metric.RFID_CHECKS, 0),
+        'today_approvals': activity.get(Metric.APPROVALS, 0),
+        'today_rejections': activity.get(Metric.REJECTIONS, 0),
+    }
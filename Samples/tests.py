@@ -7,7 +7,26 @@ from .models import Sample, RFIDTag, AuditLog
 
 
 class SampleWorkflowTests(TestCase):
+	@classmethod
+	def setUpClass(cls):
+		import tempfile
+		from django.test import override_settings
+		# Keep the project's shared cache directory out of the tests.
+		directory = cls.enterClassContext(tempfile.TemporaryDirectory())
+		cls.enterClassContext(override_settings(CACHES={
+			'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+			'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory},
+		}))
+		super().setUpClass()
+
 	def setUp(self):
+		from django.conf import settings
+		from django.core.cache import caches
+		# Cached roles and reports outlive the rolled-back test transactions;
+		# these are the test caches set up above.
+		for alias in settings.CACHES:
+			caches[alias].clear()
+
 		self.operator_group, _ = Group.objects.get_or_create(name='Operator')
 		self.viewer_group, _ = Group.objects.get_or_create(name='Viewer')
 
@@ -47,9 +66,14 @@ class SampleWorkflowTests(TestCase):
 		self.assertEqual(response.status_code, 302)
 		self.sample.refresh_from_db()
 		self.assertEqual(self.sample.status, 'checked')
+		self.assertEqual(self.sample.checked_by, self.operator)
+		self.assertIsNotNone(self.sample.checked_at)
 		self.assertTrue(
 			AuditLog.objects.filter(sample=self.sample, action__startswith='فحص RFID').exists()
 		)
+		log = AuditLog.objects.get(sample=self.sample, event_type=AuditLog.Event.RFID_CHECK)
+		self.assertEqual(log.uid, 'RFID-TEST-0001')
+		self.assertEqual(log.action, 'فحص RFID (UID: RFID-TEST-0001)')
 
 	def test_approve_requires_checked(self):
 		self.client.force_login(self.operator)
@@ -77,3 +101,834 @@ class SampleWorkflowTests(TestCase):
 		url = reverse('sample_full_screen', args=[self.sample.sample_number])
 		response = self.client.post(url, {'action': 'rfid_check'})
 		self.assertEqual(response.status_code, 403)
+
+	def test_export_streams_workbook(self):
+		from io import BytesIO
+		from openpyxl import load_workbook
+
+		self.client.force_login(self.viewer)
+		response = self.client.get(reverse('sample-export'), {'q': 'S-0001'})
+		self.assertEqual(response.status_code, 200)
+		self.assertTrue(response.streaming)
+		workbook = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True)
+		rows = list(workbook.active.iter_rows(values_only=True))
+		self.assertEqual(rows[0][0], 'Sample Number')
+		self.assertEqual(rows[1], ('S-0001', 'يوسف أحمد', 'دم', 'جنائية', '2026-02-01', 'pending', 'RFID-TEST-0001'))
+
+	def test_reports_run_one_query_per_report(self):
+		from .reports import build_report
+
+		for i in range(2, 6):
+			sample = Sample.objects.create(
+				sample_number=f'S-000{i}', sample_type='دم', category='جنائية', person_name='سارة',
+				collected_date=date(2026, 2, i), rfid=RFIDTag.objects.create(uid=f'RFID-TEST-000{i}'),
+			)
+			AuditLog.objects.record(self.operator, AuditLog.Event.RFID_CHECK, sample=sample, uid=f'RFID-TEST-000{i}')
+			approval = AuditLog.objects.record(self.operator, AuditLog.Event.APPROVE, sample=sample)
+			Sample.objects.filter(pk=sample.pk).update(
+				status='approved', checked_at=approval.timestamp, checked_by=self.operator,
+				approved_at=approval.timestamp, approved_by=self.operator,
+			)
+
+		expected = {'rfid': 4, 'approval': 4, 'audit': 8, 'samples': 5}
+		for report_type, count in expected.items():
+			report = build_report(report_type)
+			with self.assertNumQueries(1):
+				rows = list(report.rows())
+			self.assertEqual(len(rows), count)
+
+		rfid_rows = list(build_report('rfid', user_id=str(self.operator.id)).rows())
+		self.assertEqual(rfid_rows[0][1], 'RFID-TEST-0005')
+		samples_rows = {row[0]: row for row in build_report('samples').rows()}
+		self.assertEqual(samples_rows['S-0002'][-2:], ('نعم', 'operator'))
+		self.assertEqual(samples_rows['S-0001'][-2:], ('لا', '-'))
+		filtered = {row[0]: row for row in build_report('samples', user_id=str(self.viewer.id)).rows()}
+		self.assertEqual(filtered['S-0002'][-1], '-')
+
+		self.operator.user_permissions.add(Permission.objects.get(codename='view_auditlog'))
+		self.client.force_login(self.operator)
+		response = self.client.get(reverse('reports'), {'report_type': 'approval'})
+		self.assertContains(response, 'S-0005')
+		self.assertContains(response, 'class="status approved"')
+
+	def test_keyset_pagination_walks_forward_and_back(self):
+		from .pagination import SampleKeysetPaginator
+
+		for i in range(2, 26):
+			Sample.objects.create(
+				sample_number=f'S-{i:04d}', sample_type='دم', category='طبية', person_name='سارة',
+				collected_date=date(2026, 2, 1 + i % 3), rfid=RFIDTag.objects.create(uid=f'RFID-PAGE-{i:04d}'),
+			)
+		expected = list(Sample.objects.order_by('-collected_date', '-id').values_list('id', flat=True))
+		paginator = SampleKeysetPaginator(Sample.objects.all(), 10)
+
+		pages, token = [], None
+		while True:
+			with self.assertNumQueries(1):
+				page = paginator.get_page(token)
+			pages.append(page)
+			if not page.has_next:
+				break
+			token = page.next_cursor
+		self.assertEqual([s.id for page in pages for s in page], expected)
+		self.assertFalse(pages[0].has_previous)
+
+		back = paginator.get_page(pages[-1].previous_cursor)
+		self.assertEqual([s.id for s in back], [s.id for s in pages[-2]])
+		self.assertTrue(back.has_next)
+
+		self.client.force_login(self.viewer)
+		response = self.client.get(reverse('sample-list-create'), {'cursor': 'not-a-cursor'})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(len(response.json()['results']), 25)
+		response = self.client.get(reverse('sample-list-web'), {'category': 'طبية'})
+		self.assertContains(response, 'cursor=')
+
+	def test_search_normalizes_arabic_and_prefixes(self):
+		from .search import filter_samples, search
+
+		other = Sample.objects.create(
+			sample_number='X-9000', sample_type='دم', category='طبية', person_name='إيمان أحمد',
+			collected_date=date(2026, 2, 2), rfid=RFIDTag.objects.create(uid='RFID-SEARCH-0001'),
+		)
+		samples = Sample.objects.all()
+		self.assertEqual(set(filter_samples(samples, 'احمد')), {self.sample, other})
+		self.assertEqual(list(filter_samples(samples, 'أَحْمَد يو')), [self.sample])
+		self.assertEqual(list(filter_samples(samples, 'ايما')), [other])
+		self.assertEqual(list(filter_samples(samples, 'S-00')), [self.sample])
+		self.assertEqual(list(filter_samples(samples, '9000')), [other])
+
+		other.person_name = 'سارة'
+		other.save()
+		self.assertEqual(list(filter_samples(samples, 'احمد')), [self.sample])
+		self.assertEqual(search('ساره'), [other])
+
+		self.client.force_login(self.viewer)
+		response = self.client.get(reverse('sample-search'), {'q': 'يوسف'})
+		self.assertEqual(response.json()['results'][0]['sample_number'], 'S-0001')
+
+	def test_api_filters_sparse_fields_and_conditional_get(self):
+		Sample.objects.create(
+			sample_number='S-0002', sample_type='أنسجة', category='طبية', person_name='سارة',
+			collected_date=date(2026, 2, 2), rfid=RFIDTag.objects.create(uid='RFID-API-0002'),
+		)
+		self.client.force_login(self.viewer)
+		url = reverse('sample-list-create')
+		response = self.client.get(url, {'category': 'جنائية', 'fields': 'sample_number,status', 'page_size': 1})
+		self.assertEqual(response.json()['results'], [{'sample_number': 'S-0001', 'status': 'pending'}])
+		self.assertIsNone(response.json()['next'])
+
+		etag = response['ETag']
+		params = {'category': 'جنائية', 'fields': 'sample_number,status', 'page_size': 1}
+		self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+		self.sample.status = 'checked'
+		self.sample.save()
+		self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+		detail = reverse('sample-detail', args=[self.sample.pk])
+		response = self.client.get(detail)
+		self.assertIn('Last-Modified', response)
+		self.assertEqual(
+			self.client.get(detail, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+		)
+
+	def test_bulk_scan_ingest_reports_per_uid_outcomes(self):
+		from .transitions import ingest_rfid_reads
+
+		inactive = Sample.objects.create(
+			sample_number='S-0002', sample_type='دم', category='طبية', person_name='سارة',
+			collected_date=date(2026, 2, 2), rfid=RFIDTag.objects.create(uid='RFID-OFF', is_active=False),
+		)
+		batch = []
+		for i in range(3, 23):
+			batch.append(Sample.objects.create(
+				sample_number=f'S-{i:04d}', sample_type='دم', category='طبية', person_name='سارة',
+				collected_date=date(2026, 2, 2), rfid=RFIDTag.objects.create(uid=f'RFID-BULK-{i:04d}'),
+				status='approved' if i == 3 else 'pending',
+			))
+		uids = [s.rfid.uid for s in batch] + ['RFID-TEST-0001', 'RFID-TEST-0001', 'RFID-OFF', 'NOPE']
+		# Five queries for the batch itself, plus one upsert per daily counter it touches.
+		with self.assertNumQueries(19):
+			results = ingest_rfid_reads(uids, self.operator)
+
+		self.assertEqual(results['RFID-BULK-0003'], 'already_checked')
+		self.assertEqual(results['RFID-OFF'], 'inactive_tag')
+		self.assertEqual(results['NOPE'], 'unknown')
+		self.assertEqual(list(results.values()).count('transitioned'), 20)
+		self.assertEqual(Sample.objects.filter(status='checked').count(), 20)
+		self.assertEqual(AuditLog.objects.filter(event_type=AuditLog.Event.RFID_CHECK).count(), 20)
+		self.assertEqual(Sample.objects.get(pk=inactive.pk).status, 'pending')
+
+		self.client.force_login(self.operator)
+		response = self.client.post(
+			reverse('sample-scan-ingest'), {'uids': ['RFID-TEST-0001']}, content_type='application/json'
+		)
+		self.assertEqual(response.json()['results'], [{'uid': 'RFID-TEST-0001', 'result': 'already_checked'}])
+		self.client.force_login(self.viewer)
+		response = self.client.post(reverse('sample-scan-ingest'), {'uids': []}, content_type='application/json')
+		self.assertEqual(response.status_code, 403)
+
+		from unittest import mock
+		from . import transitions
+		gone = Sample.objects.create(
+			sample_number='S-0099', sample_type='دم', category='طبية', person_name='سارة',
+			collected_date=date(2026, 2, 2), rfid=RFIDTag.objects.create(uid='RFID-GONE'),
+		)
+		real_apply = transitions._apply
+
+		def delete_first(rows, *args, **kwargs):
+			# Another request deletes the sample after its tag was looked up.
+			Sample.objects.filter(pk=gone.pk).delete()
+			return real_apply(rows, *args, **kwargs)
+
+		with mock.patch.object(transitions, '_apply', delete_first):
+			self.assertEqual(ingest_rfid_reads(['RFID-GONE'], self.operator), {'RFID-GONE': 'unknown'})
+
+	def test_gateway_drops_duplicate_reads_and_batches(self):
+		import asyncio
+		from .gateway import RFIDGateway, parse_line
+
+		batches = []
+
+		def fake_ingest(uids, user):
+			batches.append(list(uids))
+			return dict.fromkeys(uids, 'transitioned')
+
+		gateway = RFIDGateway(self.operator, dedup_window=60, batch_size=2, ingest=fake_ingest)
+		for line in ['reader-1 RFID-A', 'RFID-A', '# comment', '', 'reader-2 RFID-B', 'RFID-C']:
+			uid = parse_line(line)
+			if uid:
+				gateway.submit(uid)
+
+		async def drain():
+			await gateway.flush()
+			gateway._db.shutdown(wait=True)
+
+		asyncio.run(drain())
+		self.assertEqual(batches, [['RFID-A', 'RFID-B'], ['RFID-C']])
+		self.assertEqual(gateway.stats['duplicates'], 1)
+		self.assertEqual(gateway.stats['transitioned'], 3)
+
+		# An over-long line drops that connection only; the reader can reconnect.
+		gateway = RFIDGateway(self.operator, host='127.0.0.1', port=0, ingest=fake_ingest)
+
+		async def misbehave():
+			await gateway.start()
+			reader, writer = await asyncio.open_connection('127.0.0.1', gateway.port)
+			writer.write(b'x' * 100000 + b'\n')
+			await writer.drain()
+			self.assertEqual(await reader.read(), b'')
+			writer.close()
+			reader, writer = await asyncio.open_connection('127.0.0.1', gateway.port)
+			writer.write(b'reader-1 RFID-D\n')
+			writer.close()
+			await writer.wait_closed()
+			while gateway.stats['connections'] < 2 or not gateway._pending:
+				await asyncio.sleep(0.01)
+			await gateway.close()
+
+		with self.assertLogs('Samples.gateway', 'WARNING'):
+			asyncio.run(asyncio.wait_for(misbehave(), 10))
+		self.assertEqual(gateway.stats['overlong_lines'], 1)
+		self.assertEqual(batches[-1], ['RFID-D'])
+
+	def test_roles_are_cached_and_invalidated_on_membership_change(self):
+		from .views import is_operator_or_admin
+
+		self.assertTrue(is_operator_or_admin(User.objects.get(pk=self.operator.pk)))
+		fresh = User.objects.get(pk=self.operator.pk)
+		with self.assertNumQueries(0):
+			self.assertTrue(is_operator_or_admin(fresh))
+			self.assertTrue(fresh.has_perm('Samples.change_sample'))
+			self.assertFalse(fresh.has_perm('Samples.delete_sample'))
+
+		self.operator.groups.clear()
+		self.assertFalse(is_operator_or_admin(User.objects.get(pk=self.operator.pk)))
+		self.operator_group.user_set.add(self.operator)
+		self.assertTrue(is_operator_or_admin(User.objects.get(pk=self.operator.pk)))
+		self.operator_group.permissions.add(Permission.objects.get(codename='delete_sample'))
+		self.assertTrue(User.objects.get(pk=self.operator.pk).has_perm('Samples.delete_sample'))
+
+	def test_revoked_role_is_denied_on_the_next_request(self):
+		from django.test import override_settings
+		url = reverse('sample-scan-ingest')
+		self.client.force_login(self.operator)
+		self.assertEqual(self.client.post(url, {'uids': []}, content_type='application/json').status_code, 200)
+		self.operator_group.user_set.remove(self.operator)
+		self.assertEqual(self.client.post(url, {'uids': []}, content_type='application/json').status_code, 403)
+
+		# Without a shared cache, nothing is kept across requests: a change whose
+		# invalidation this process never sees (another worker's) still applies.
+		self.operator_group.user_set.add(self.operator)
+		with override_settings(ROLES_CACHE='default'):
+			self.assertEqual(self.client.post(url, {'uids': []}, content_type='application/json').status_code, 200)
+			User.groups.through.objects.filter(user=self.operator).delete()
+			self.assertEqual(self.client.post(url, {'uids': []}, content_type='application/json').status_code, 403)
+
+	async def test_event_stream_pushes_published_events(self):
+		import asyncio
+		from .events import broker, status_event
+
+		await self.async_client.aforce_login(self.viewer)
+		url = reverse('sample-events-detail', args=[self.sample.sample_number])
+		subscribers = len(broker)
+		response = await self.async_client.get(url)
+		self.assertEqual(response['Content-Type'], 'text/event-stream')
+		# Nothing is subscribed until the client reads the stream.
+		self.assertEqual(len(broker), subscribers)
+		stream = aiter(response.streaming_content)
+		self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+		self.assertEqual(len(broker), subscribers + 1)
+
+		broker.publish(status_event('S-9999', 'checked'))
+		broker.publish(status_event(self.sample.sample_number, 'checked', previous='pending'))
+		chunk = await asyncio.wait_for(anext(stream), timeout=5)
+		self.assertTrue(chunk.startswith(b'event: status\n'))
+		self.assertIn(b'"sample_number": "S-0001"', chunk)
+		await stream.aclose()
+
+	def test_event_stream_is_disabled_under_wsgi(self):
+		self.client.force_login(self.viewer)
+		response = self.client.get(reverse('sample-events'))
+		self.assertEqual(response.status_code, 204)
+
+	def test_report_job_renders_in_background_and_is_cached(self):
+		import tempfile
+		from io import BytesIO
+		from django.http import FileResponse
+		from django.test import override_settings
+		from openpyxl import load_workbook
+		from . import jobs
+		from .models import ReportJob
+
+		self.operator.user_permissions.add(Permission.objects.get(codename='view_auditlog'))
+		self.client.force_login(self.operator)
+		params = {'report_type': 'samples', 'from_date': '', 'to_date': '', 'user_id': '', 'format': 'xlsx'}
+		with tempfile.TemporaryDirectory() as cache, override_settings(REPORT_CACHE_DIR=cache):
+			response = self.client.post(reverse('report-job-create'), params)
+			self.assertEqual(response.status_code, 202)
+			job_id = response.json()['id']
+			# A repeat request while the job is queued reuses it.
+			self.assertEqual(self.client.post(reverse('report-job-create'), params).json()['id'], job_id)
+			download = reverse('report-job-download', args=[job_id])
+			self.assertEqual(self.client.get(download).status_code, 409)
+
+			self.assertEqual(str(jobs.claim_next()), job_id)
+			self.assertIsNone(jobs.claim_next())
+			self.assertEqual(jobs.run_job(job_id), ReportJob.Status.DONE)
+			state = self.client.get(reverse('report-job-status', args=[job_id])).json()
+			self.assertEqual((state['status'], state['progress'], state['total']), ('done', 1, 1))
+
+			response = self.client.get(download)
+			workbook = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True)
+			self.assertEqual(next(workbook.active.iter_rows(min_row=2, values_only=True))[0], 'S-0001')
+			response.close()
+			self.client.force_login(self.viewer)
+			self.assertEqual(self.client.get(download).status_code, 403)
+
+			# Cached results complete new jobs and synchronous exports without rendering.
+			self.client.force_login(self.operator)
+			response = self.client.post(reverse('report-job-create'), params)
+			self.assertEqual(response.status_code, 200)
+			response = self.client.get(reverse('reports-export-excel'), {'report_type': 'samples'})
+			self.assertIsInstance(response, FileResponse)
+			response.close()
+
+			# Any write retires the cached file.
+			self.sample.status = 'checked'
+			self.sample.save()
+			response = self.client.post(reverse('report-job-create'), params)
+			self.assertEqual((response.status_code, response.json()['status']), (202, 'queued'))
+			response = self.client.get(reverse('reports-export-excel'), {'report_type': 'samples'})
+			self.assertNotIsInstance(response, FileResponse)
+
+		# The key costs two indexed lookups, and deletions move it too.
+		from .report_cache import data_version
+		older, _ = AuditLog.objects.bulk_create(
+			AuditLog.objects.build(self.operator, AuditLog.Event.APPROVE, sample=self.sample) for _ in range(2)
+		)
+		with self.assertNumQueries(2):
+			version = data_version()
+		older.delete()
+		self.assertNotEqual(data_version(), version)
+
+	def test_pdf_renderer_pages_large_reports_and_caches_shaping(self):
+		from io import BytesIO
+		from .pdf import _shape, render_report_pdf
+		from .reports import build_report
+
+		AuditLog.objects.bulk_create(
+			AuditLog.objects.build(self.operator, AuditLog.Event.APPROVE, sample=self.sample) for _ in range(120)
+		)
+		_shape.cache_clear()
+		output = BytesIO()
+		pages = render_report_pdf(build_report('audit'), output)
+		self.assertEqual(pages, 3)
+		self.assertTrue(output.getvalue().startswith(b'%PDF'))
+		self.assertEqual(output.getvalue().count(b'/Type /Page\n'), 3)
+		self.assertLessEqual(_shape.cache_info().currsize, 10)
+
+		empty = BytesIO()
+		self.assertEqual(render_report_pdf(build_report('rfid'), empty), 1)
+
+	def test_pdf_cuts_long_cells_to_their_column(self):
+		from io import BytesIO
+		from reportlab.pdfbase.pdfmetrics import stringWidth
+		from .pdf import CELL_PADDING, ELLIPSIS, FONT_SIZE, _column_widths, _fit, _setup, render_report_pdf
+		from .reports import build_report
+
+		action = 'تعليق طويل جدا على العينة ' * 4
+		entry = AuditLog.objects.build(self.operator, AuditLog.Event.APPROVE, sample=self.sample)
+		entry.action = (action + 'x' * 100)[:100]
+		entry.save()
+		report = build_report('audit')
+		widths = _column_widths(report, 500)
+		self.assertEqual(widths[1], max(widths))
+
+		room = widths[1] - CELL_PADDING
+		cell = _fit(entry.action, room)
+		self.assertIn(ELLIPSIS, cell)
+		self.assertLessEqual(stringWidth(cell, _setup()[0], FONT_SIZE), room)
+		self.assertEqual(_fit('RFID-1', room), 'RFID-1')
+		self.assertEqual(render_report_pdf(report, BytesIO()), 1)
+
+	def test_parallel_pdf_segments_join_with_consistent_page_numbers(self):
+		from io import BytesIO
+		try:
+			from pypdf import PdfReader
+		except ImportError:
+			self.skipTest('pypdf is not installed')
+		from .pdf import render_report_pdf_parallel
+		from .reports import build_report
+
+		AuditLog.objects.bulk_create(
+			AuditLog.objects.build(self.operator, AuditLog.Event.APPROVE, sample=self.sample) for _ in range(120)
+		)
+		output = BytesIO()
+		pages = render_report_pdf_parallel(build_report('audit'), output, processes=2, segment_pages=1)
+		reader = PdfReader(BytesIO(output.getvalue()))
+		self.assertEqual((pages, len(reader.pages)), (3, 3))
+		for number, page in enumerate(reader.pages, 1):
+			self.assertIn(f'{number} / 3', page.extract_text().splitlines())
+
+	def test_report_cache_serves_repeats_and_invalidates_on_writes(self):
+		import threading
+		from django.test import override_settings
+		from . import report_cache
+		from .reports import Report
+
+		report_cache.reset_stats()
+		first = list(report_cache.get_report('samples').rows())
+		with self.assertNumQueries(0):
+			self.assertEqual(list(report_cache.get_report('samples').rows()), first)
+		self.assertEqual(report_cache.stats()['hits'], 1)
+
+		self.sample.approved_by = self.operator
+		self.sample.save()
+		self.assertEqual(list(report_cache.get_report('samples').rows())[0][-1], 'operator')
+		self.assertEqual(report_cache.stats()['misses'], 2)
+
+		# A second request for a report that is being computed waits for it.
+		cache = report_cache._cache()
+		key = report_cache._key(cache, 'audit', '', '', '')
+		cache.add(f'{key}:lock', 1, 10)
+		timer = threading.Timer(0.2, lambda: (cache.set(key, [('x',)]), cache.delete(f'{key}:lock')))
+		timer.start()
+		self.assertEqual(list(report_cache.get_report('audit').rows()), [('x',)])
+		timer.join()
+		self.assertEqual(report_cache.stats()['coalesced'], 1)
+
+		# A miss streams: the first row goes out before the report is stored.
+		key = report_cache._key(cache, 'samples', '2000-01-01', '', '')
+		rows = report_cache.get_report('samples', '2000-01-01').rows()
+		next(rows)
+		self.assertIsNone(cache.get(key))
+		self.assertIsNotNone(cache.get(f'{key}:lock'))
+		rows.close()
+		# An abandoned stream releases the lock without storing a partial report.
+		self.assertIsNone(cache.get(f'{key}:lock'))
+		self.assertIsNone(cache.get(key))
+		with override_settings(REPORT_RESULT_CACHE_MAX_ROWS=0):
+			list(report_cache.get_report('samples', '2000-01-01').rows())
+			self.assertEqual(type(report_cache.get_report('samples', '2000-01-01')), Report)
+		self.assertEqual(report_cache.stats()['uncacheable'], 1)
+
+		# A per-process cache would miss other workers' invalidations.
+		with override_settings(REPORT_RESULT_CACHE='default'):
+			self.assertFalse(report_cache.enabled())
+			list(report_cache.get_report('samples').rows())
+			with self.assertNumQueries(1):
+				list(report_cache.get_report('samples').rows())
+
+		self.operator.user_permissions.add(Permission.objects.get(codename='view_auditlog'))
+		self.client.force_login(self.operator)
+		self.assertEqual(self.client.get(reverse('report-cache-stats')).status_code, 302)
+
+	def test_dashboard_counters_follow_writes_and_match_rebuild(self):
+		from . import stats
+		from .models import DailyStat
+		from .transitions import ingest_rfid_reads
+
+		other = Sample.objects.create(
+			sample_number='S-0002', sample_type='أنسجة', category='طبية', person_name='سارة',
+			collected_date=date(2026, 2, 2), rfid=RFIDTag.objects.create(uid='RFID-TEST-0002'),
+		)
+		self.client.force_login(self.operator)
+		self.client.post(reverse('sample_full_screen', args=['S-0001']), {'action': 'rfid_check'})
+		self.client.post(reverse('sample_full_screen', args=['S-0001']), {'action': 'approve'})
+		ingest_rfid_reads(['RFID-TEST-0002'], self.operator)
+		edited = Sample.objects.only('id').get(pk=other.pk)
+		edited.category = 'جنائية'
+		edited.save()
+		Sample.objects.create(
+			sample_number='S-0003', sample_type='دم', category='جنائية', person_name='سارة',
+			collected_date=date(2026, 2, 2), rfid=RFIDTag.objects.create(uid='RFID-TEST-0003'),
+		).delete()
+
+		self.assertEqual(stats.drift(), {})
+		with self.assertNumQueries(3):
+			figures = stats.dashboard()
+		self.assertEqual(figures['total'], 2)
+		self.assertEqual(figures['by_status'], {'approved': 1, 'checked': 1})
+		self.assertEqual(figures['by_category'], [('جنائية', 2)])
+		self.assertEqual((figures['today_rfid_checks'], figures['today_approvals']), (2, 1))
+
+		DailyStat.objects.filter(metric=DailyStat.Metric.STATUS, key='approved').update(count=5)
+		self.assertEqual(len(stats.drift()), 1)
+		stats.rebuild()
+		self.assertEqual(stats.drift(), {})
+		response = self.client.get(reverse('dashboard'))
+		self.assertContains(response, 'أنسجة')
+
+		# The migration that introduces the counters fills them from existing rows.
+		from importlib import import_module
+		from types import SimpleNamespace
+		from django.apps import apps
+		from django.db import connection
+		migration = import_module('Samples.migrations.0013_backfill_daily_stats')
+		DailyStat.objects.all().delete()
+		migration.backfill_daily_stats(apps, SimpleNamespace(connection=connection))
+		self.assertEqual(stats.drift(), {})
+
+	def test_transition_service_uses_conditional_updates(self):
+		from .transitions import INVALID_STATE, NOT_FOUND, TRANSITIONED, UNCHANGED, transition_sample, transition_samples
+
+		stale = Sample.objects.select_related('rfid').get(pk=self.sample.pk)
+		# Another operator checks the sample after this copy was loaded.
+		self.assertEqual(transition_samples([self.sample.pk], 'rfid_check', self.operator)[self.sample.pk].outcome, TRANSITIONED)
+		# Savepoint, an UPDATE that matches nothing, the re-read, release.
+		with self.assertNumQueries(4):
+			result = transition_sample(stale, 'rfid_check', self.operator)
+		self.assertEqual(result, (UNCHANGED, 'checked'))
+		self.assertEqual(AuditLog.objects.filter(event_type=AuditLog.Event.RFID_CHECK).count(), 1)
+
+		results = transition_samples([self.sample.pk, 999999], 'approve', self.operator)
+		self.assertEqual(results[999999].outcome, NOT_FOUND)
+		self.sample.refresh_from_db()
+		self.assertEqual((self.sample.status, self.sample.approved_by), ('approved', self.operator))
+		self.assertEqual(transition_samples([self.sample.pk], 'rfid_check', self.operator)[self.sample.pk].outcome, INVALID_STATE)
+
+		self.client.force_login(self.operator)
+		url = reverse('sample-transition', args=[self.sample.pk])
+		response = self.client.post(url, {'action': 'reject'}, content_type='application/json')
+		self.assertEqual(response.json(), {'id': self.sample.pk, 'result': 'transitioned', 'status': 'rejected'})
+		response = self.client.post(url, {'action': 'approve'}, content_type='application/json')
+		self.assertEqual(response.status_code, 409)
+		response = self.client.post(
+			reverse('sample-transition-batch'), {'action': 'approve', 'ids': [self.sample.pk]}, content_type='application/json'
+		)
+		self.assertEqual(response.json()['summary'], {'invalid_state': 1})
+
+		# The REST API cannot bypass the state machine.
+		self.operator.user_permissions.add(Permission.objects.get(codename='view_sample'))
+		detail = reverse('sample-detail', args=[self.sample.pk])
+		payload = {k: v for k, v in self.client.get(detail).json().items() if v is not None}
+		payload['status'] = 'pending'
+		self.assertEqual(self.client.put(detail, payload, content_type='application/json').status_code, 200)
+		self.sample.refresh_from_db()
+		self.assertEqual(self.sample.status, 'rejected')
+
+	def test_old_audit_entries_are_archived_and_still_reported(self):
+		import tempfile
+		from datetime import datetime, timezone as dt_timezone
+		from io import StringIO
+		from django.core.management import call_command
+		from unittest import mock
+		from django.test import override_settings
+		from . import archive, report_cache, stats
+		from .reports import build_report
+
+		self.client.force_login(self.operator)
+		self.client.post(reverse('sample_full_screen', args=['S-0001']), {'action': 'rfid_check'})
+		self.client.post(reverse('sample_full_screen', args=['S-0001']), {'action': 'approve'})
+		old = AuditLog.objects.filter(sample=self.sample)
+		self.assertEqual(old.count(), 2)
+		old.update(timestamp=datetime(2025, 1, 15, 9, 30, tzinfo=dt_timezone.utc))
+		stats.rebuild()
+		self.client.post(reverse('sample_full_screen', args=['S-0001']), {'action': 'reject'})
+		before = [(report_type, list(build_report(report_type).rows())) for report_type in ('rfid', 'approval', 'audit')]
+
+		with tempfile.TemporaryDirectory() as directory, override_settings(AUDIT_ARCHIVE_DIR=directory):
+			self.assertEqual(archive.pending_months(date(2025, 3, 1)), [date(2025, 1, 1), date(2025, 2, 1)])
+			# The rows go in one SQL delete per chunk, with one cache bump per month.
+			with mock.patch.object(report_cache, 'invalidate', wraps=report_cache.invalidate) as invalidate:
+				call_command('archive_auditlog', older_than_days=30, stdout=StringIO())
+			self.assertEqual(invalidate.call_count, 1)
+			self.assertFalse(AuditLog.objects.filter(sample=self.sample, timestamp__year=2025).exists())
+			self.assertEqual(len(archive.segments()), 1)
+
+			for report_type, rows in before:
+				report = build_report(report_type)
+				self.assertEqual(list(report.rows()), rows)
+				self.assertEqual(report.count(), len(rows))
+			rfid = build_report('rfid', from_date='2025-01-01', to_date='2025-01-31', user_id=str(self.operator.pk))
+			self.assertEqual([row[:2] for row in rfid.rows()], [('S-0001', 'RFID-TEST-0001')])
+			self.assertEqual(rfid.count(), 1)
+			self.assertEqual(build_report('approval', from_date='2025-01-16').count(), 0)
+			self.assertEqual(stats.drift(), {})
+			# A second run finds nothing left to move.
+			self.assertEqual(archive.archive(date(2025, 3, 1)), {})
+
+	def test_audit_writer_groups_deferred_entries(self):
+		from . import audit_writer, stats
+
+		from datetime import timedelta
+		from unittest import mock
+		from django.utils import timezone
+
+		writer = audit_writer.AuditWriter(batch_size=2, autostart=False)
+		before = AuditLog.objects.count()
+		built = []
+		for _ in range(3):
+			built.append(AuditLog.objects.build(self.operator, AuditLog.Event.RFID_CHECK, uid='RFID-TEST-0001'))
+			self.assertTrue(writer.submit(built[-1], 'S-0001'))
+		self.assertEqual((writer.pending(), AuditLog.objects.count()), (3, before))
+		# A late flush keeps the time each event happened.
+		later = timezone.now() + timedelta(minutes=5)
+		with mock.patch('django.utils.timezone.now', return_value=later):
+			self.assertEqual(writer.flush(), 3)
+		stored = AuditLog.objects.filter(pk__in=[entry.pk for entry in built]).order_by('pk')
+		self.assertEqual([entry.timestamp for entry in stored], [entry.timestamp for entry in built])
+		self.assertEqual((writer.pending(), writer.stats['batches']), (0, 2))
+		self.assertEqual(AuditLog.objects.count(), before + 3)
+		self.assertEqual(stats.drift(), {})
+
+		# Inside a transaction record() stays inline so the entry shares its fate.
+		AuditLog.objects.record(self.operator, AuditLog.Event.LOGIN)
+		self.assertEqual(AuditLog.objects.count(), before + 4)
+		writer.close()
+		self.assertFalse(writer.submit(AuditLog.objects.build(self.operator, AuditLog.Event.LOGIN)))
+
+	def test_avatar_upload_serves_hashed_thumbnails_from_session(self):
+		import tempfile
+		from io import BytesIO
+		from django.core.files.uploadedfile import SimpleUploadedFile
+		from django.test import override_settings
+		from PIL import Image
+		from Users.avatars import SESSION_KEY, THUMB_SIZE
+
+		image = BytesIO()
+		Image.new('RGB', (1200, 800), 'teal').save(image, 'PNG')
+		self.client.force_login(self.operator)
+		with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+			upload = SimpleUploadedFile('me.png', image.getvalue(), content_type='image/png')
+			self.client.post(reverse('profile_edit'), {'first_name': 'Op', 'last_name': '', 'email': '', 'avatar': upload})
+			urls = self.client.session[SESSION_KEY]
+			self.assertRegex(urls['webp'], r'/users/avatars/[0-9a-f]{20}\.webp$')
+
+			response = self.client.get(reverse('profile_edit'))
+			self.assertContains(response, urls['jpg'])
+			thumb = self.client.get(urls['webp'])
+			self.assertEqual(thumb['Content-Type'], 'image/webp')
+			self.assertIn('immutable', thumb['Cache-Control'])
+			self.assertEqual(Image.open(BytesIO(b''.join(thumb.streaming_content))).size, (THUMB_SIZE, THUMB_SIZE))
+
+	def test_sqlite_connections_are_tuned_and_maintained(self):
+		from io import StringIO
+		from django.core.management import CommandError, call_command
+		from django.db import connection
+
+		with connection.cursor() as cursor:
+			cursor.execute('PRAGMA busy_timeout')
+			self.assertEqual(cursor.fetchone()[0], 20000)
+			cursor.execute('PRAGMA synchronous')
+			self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+		# The test case's transaction is open, which maintenance refuses.
+		with self.assertRaisesMessage(CommandError, 'inside a transaction'):
+			call_command('sqlite_maintenance', stdout=StringIO())
+
+	def test_reports_and_lists_read_from_replica_until_a_write(self):
+		from django.http import HttpResponse
+		from django.test import RequestFactory, override_settings
+		from .reports import build_report
+		from .routers import PIN_COOKIE, PrimaryPinningMiddleware, bind
+
+		seen = []
+
+		def view(request):
+			seen.append(bind(Sample.objects.all()).db)
+			if request.GET.get('write'):
+				Sample.objects.filter(pk=self.sample.pk).update(person_name='أحمد')
+				seen.append(bind(Sample.objects.all()).db)
+			return HttpResponse()
+
+		middleware = PrimaryPinningMiddleware(view)
+		with override_settings(READ_DATABASES=['replica']):
+			self.assertEqual(build_report('audit').queryset.db, 'replica')
+			self.assertEqual(Sample.objects.all().db, 'default')
+			middleware(RequestFactory().get('/'))
+			response = middleware(RequestFactory().get('/?write=1'))
+			pinned = RequestFactory().get('/')
+			pinned.COOKIES[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+			middleware(pinned)
+			middleware(RequestFactory().post('/'))
+		self.assertEqual(seen, ['replica', 'replica', 'default', 'default', 'default'])
+
+	def test_dataset_generator_is_deterministic_and_benchmarks_compare(self):
+		from django.core.management import CommandError, call_command
+		from . import benchmarks, datagen, stats
+
+		# A real database (no generated dataset) is refused, and gets no benchmark user.
+		with self.assertRaises(CommandError):
+			call_command('benchmark', repeat=1)
+		self.assertFalse(User.objects.filter(username=datagen.BENCH_ADMIN).exists())
+
+		datagen.generate(40, seed=7)
+		# Historical timestamps, not the time of the run.
+		newest = Sample.objects.filter(sample_number__startswith=datagen.PREFIX).latest('updated_at').updated_at
+		self.assertLess(newest.date(), date(2026, 2, 5))
+		logs = AuditLog.objects.filter(sample__sample_number__startswith=datagen.PREFIX)
+		self.assertLess(logs.latest('timestamp').timestamp.date(), date(2026, 2, 5))
+		first = list(Sample.objects.filter(sample_number__startswith=datagen.PREFIX).order_by('id').values_list(
+			'sample_number', 'sample_type', 'status', 'collected_date', 'approved_at'))
+		self.assertEqual(len(first), 40)
+		self.assertEqual(
+			AuditLog.objects.filter(sample__status='approved', event_type=AuditLog.Event.APPROVE).count(),
+			Sample.objects.filter(status='approved', sample_number__startswith=datagen.PREFIX).count(),
+		)
+		self.assertEqual(stats.drift(), {})
+
+		admin = datagen.bench_admin()
+		results = benchmarks.run(admin, names={'sample_list', 'report_rfid_month'}, repeat=1, host='testserver')
+		self.assertEqual({result['status'] for result in results.values()}, {200})
+		slower = {name: dict(result, seconds=result['seconds'] + 1, queries=result['queries'] + 1) for name, result in results.items()}
+		self.assertEqual(benchmarks.compare(results, results), [])
+		self.assertEqual({(name, metric) for name, metric, *_ in benchmarks.compare(slower, results)},
+			{(name, metric) for name in results for metric in ('seconds', 'queries')})
+
+		AuditLog.objects.filter(sample__sample_number__startswith=datagen.PREFIX).delete()
+		Sample.objects.filter(sample_number__startswith=datagen.PREFIX).delete()
+		RFIDTag.objects.filter(uid__startswith=f'RFID-{datagen.PREFIX}').delete()
+		datagen.generate(40, seed=7)
+		self.assertEqual(list(Sample.objects.filter(sample_number__startswith=datagen.PREFIX).order_by('id').values_list(
+			'sample_number', 'sample_type', 'status', 'collected_date', 'approved_at')), first)
+
+	def test_bulk_import_reports_rejected_rows_and_keeps_counters(self):
+		import io
+		from datetime import timedelta
+		from openpyxl import Workbook
+		from . import stats
+		from .imports import SampleImporter, read_xlsx
+
+		RFIDTag.objects.create(uid='RFID-FREE')
+		lines = ['Sample Number,RFID,Type,Category,Person Name,Date,Location']
+		for i in range(40):
+			lines.append(f'IMP-{i:03d},RFID-IMP-{i:03d},دم,طبية,سارة علي,{date(2025, 1, 1) + timedelta(days=i)},جدة')
+		lines += [
+			'IMP-FREE,RFID-FREE,لعاب,أبوة,خالد,2025-03-01,',
+			'S-0001,RFID-IMP-X,دم,طبية,سارة,2025-03-01,',
+			'IMP-900,RFID-TEST-0001,دم,طبية,سارة,2025-03-01,',
+			'IMP-901,RFID-IMP-901,دم,طبية,سارة,2025-02-30,',
+			'IMP-000,RFID-IMP-902,دم,طبية,سارة,2025-03-01,',
+		]
+		upload = io.BytesIO('\n'.join(lines).encode('utf-8'))
+		upload.name = 'samples.csv'
+		url = reverse('sample-import')
+
+		self.client.force_login(self.viewer)
+		self.assertEqual(self.client.post(url, {'file': upload}, HTTP_HOST='testserver').status_code, 403)
+		self.operator.user_permissions.add(Permission.objects.get(codename='add_sample'))
+		self.client.force_login(self.operator)
+		upload.seek(0)
+		response = self.client.post(url, {'file': upload}, HTTP_HOST='testserver')
+		self.assertEqual(response.status_code, 201)
+		body = response.json()
+		self.assertEqual((body['rows'], body['created'], body['tags_created'], body['failed']), (45, 41, 40, 4))
+		self.assertEqual({error['row']: sorted(error['errors']) for error in body['errors']}, {
+			43: ['sample_number'], 44: ['rfid_uid'], 45: ['collected_date'], 46: ['sample_number'],
+		})
+		self.assertEqual(Sample.objects.get(sample_number='IMP-FREE').rfid.uid, 'RFID-FREE')
+		self.assertEqual(Sample.objects.get(sample_number='IMP-039').collected_date, date(2025, 2, 9))
+		self.assertFalse(Sample.objects.filter(sample_number__startswith='IMP-', status__in=['checked', 'approved']).exists())
+		self.assertEqual(stats.drift(), {})
+
+		response = self.client.post(url, {'samples': [
+			{'sample_number': 'IMP-J1', 'rfid_uid': 'RFID-J1', 'sample_type': 'شعر', 'category': 'طبية',
+			 'person_name': 'ريم', 'collected_date': '2025-04-01'},
+			{'sample_number': 'IMP-J2', 'rfid_uid': 'RFID-J2'},
+		], 'dry_run': True}, content_type='application/json', HTTP_HOST='testserver')
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual((response.json()['created'], response.json()['failed']), (1, 1))
+		self.assertFalse(Sample.objects.filter(sample_number='IMP-J1').exists())
+
+		workbook = Workbook()
+		workbook.active.append(['sample_number', 'rfid_uid', 'sample_type', 'category', 'person_name', 'collected_date', 'status'])
+		workbook.active.append([20250501, 'RFID-X1', 'دم', 'جنائية', 'نورة', date(2025, 5, 1), 'approved'])
+		data = io.BytesIO()
+		workbook.save(data)
+		data.seek(0)
+		result = SampleImporter(self.operator, keep_status=True).run(read_xlsx(data))
+		self.assertEqual((result.created, result.error_count), (1, 0))
+		imported = Sample.objects.get(sample_number='20250501')
+		self.assertEqual(imported.status, 'approved')
+		self.assertEqual((imported.checked_by, imported.approved_by), (self.operator, self.operator))
+		self.assertIsNotNone(imported.approved_at)
+		self.assertIsNone(imported.rejected_at)
+		self.assertEqual(stats.drift(), {})
+
+		# Files that cannot be parsed are refused before any chunk is written.
+		head = '\n'.join(lines[:20]).replace('IMP-', 'NEW-').encode('utf-8')
+		before = Sample.objects.count()
+		for name, content in (
+			('late.csv', head + b'\nNEW-B,RFID-B,\xff\n'),
+			('huge.csv', head + b'\nNEW-H,"' + b'x' * 200000 + b'"\n'),
+		):
+			upload = io.BytesIO(content)
+			upload.name = name
+			response = self.client.post(url, {'file': upload}, HTTP_HOST='testserver')
+			self.assertEqual(response.status_code, 400, name)
+			self.assertIn('Unreadable file', response.json()['file'][0])
+			self.assertEqual(Sample.objects.count(), before)
+
+	def test_metrics_record_views_queries_and_slow_requests(self):
+		from django.test import override_settings
+		from .metrics import registry
+
+		registry.reset()
+		self.client.force_login(self.operator)
+		with override_settings(METRICS_SLOW_REQUEST_SECONDS=0, METRICS_SLOW_QUERY_SECONDS=0):
+			with self.assertLogs('Samples.metrics', 'WARNING') as logs:
+				self.client.get(reverse('sample-list-web'), HTTP_HOST='testserver')
+				response = self.client.get(reverse('sample-export'), HTTP_HOST='testserver')
+				size = len(b''.join(response.streaming_content))
+		self.assertEqual(len(logs.records), 2)
+		self.assertIn('sample-export', logs.output[1])
+
+		labels = (('view', 'sample-export'), ('method', 'GET'))
+		self.assertEqual(registry.histograms['http_response_size_bytes'][labels].sum, size)
+		# The rows are read while the response streams, and still counted.
+		self.assertGreaterEqual(registry.histograms['http_request_queries'][labels].sum, 2)
+		self.assertEqual(registry.counters['http_requests_total'][labels + (('status', '200'),)], 1)
+		self.assertTrue(any('samples_sample' in sample['sql'].lower() for sample in registry.slow_queries))
+
+		self.assertEqual(self.client.get('/metrics', HTTP_HOST='testserver').status_code, 403)
+		with override_settings(METRICS_TOKEN='scrape'):
+			self.client.logout()
+			response = self.client.get('/metrics', HTTP_HOST='testserver', HTTP_AUTHORIZATION='Bearer scrape')
+		self.assertEqual(response.status_code, 200)
+		text = response.content.decode()
+		self.assertIn('# TYPE samples_http_request_duration_seconds histogram', text)
+		self.assertIn('samples_http_request_duration_seconds_count{view="sample-export",method="GET"} 1', text)
+		self.assertIn('samples_http_requests_total{view="sample-list-web",method="GET",status="200"} 1', text)
+		self.assertIn('samples_report_cache_hits_total', text)
+		self.assertIn('# Slow queries, most recent last:', text)
@@ -0,0 +1,216 @@
+"""Sample state machine.
+
+Every status change goes through :func:`transition_samples` (or
+:func:`transition_sample` for an already loaded instance): the new status
+and the workflow snapshot are written with conditional UPDATEs of the
+form ``... WHERE id IN (...) AND status = <status that was read>``, and
+the audit entries, dashboard counters and live events follow in the same
+transaction. A sample that another request moved first is simply not
+matched by the UPDATE and is reported with its current status, so
+concurrent operators never overwrite each other.
+"""
+from collections import Counter, namedtuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import report_cache, stats
+from .events import audit_event, publish_on_commit, status_event
+from .models import AuditLog, RFIDTag, Sample
+
+# Per-sample outcomes reported by transition_samples().
+TRANSITIONED = 'transitioned'
+UNCHANGED = 'unchanged'
+INVALID_STATE = 'invalid_state'
+NOT_FOUND = 'not_found'
+
+# Per-UID outcomes reported by ingest_rfid_reads().
+UNKNOWN = 'unknown'
+INACTIVE_TAG = 'inactive_tag'
+ALREADY_CHECKED = 'already_checked'
+REJECTED = 'rejected'
+
+MAX_SCAN_BATCH = 10000
+MAX_TRANSITION_BATCH = 10000
+
+# Keeps IN (...) lists well below SQLite's bound-parameter limit.
+_LOOKUP_CHUNK = 500
+
+Transition = namedtuple('Transition', 'sources target event snapshot')
+
+TRANSITIONS = {
+    'rfid_check': Transition(('pending',), 'checked', AuditLog.Event.RFID_CHECK, 'checked'),
+    'approve': Transition(('checked',), 'approved', AuditLog.Event.APPROVE, 'approved'),
+    'reject': Transition(('pending', 'checked', 'approved'), 'rejected', AuditLog.Event.REJECT, 'rejected'),
+}
+
+Result = namedtuple('Result', 'outcome status')
+
+# The sample columns a transition needs, in _Row order.
+_ROW_FIELDS = ('id', 'status', 'collected_date', 'sample_type', 'category', 'sample_number', 'rfid__uid')
+_Row = namedtuple('_Row', 'id status collected_date sample_type category sample_number uid')
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _read_rows(sample_ids):
+    rows = {}
+    for chunk in _chunks(sample_ids, _LOOKUP_CHUNK):
+        for values in Sample.objects.filter(id__in=chunk).values_list(*_ROW_FIELDS):
+            row = _Row(*values)
+            rows[row.id] = row
+    return rows
+
+
+def _outcome(status, transition):
+    return UNCHANGED if status == transition.target else INVALID_STATE
+
+
+def _current_statuses(ids, transition, now, user):
+    """``{id: (status, moved_by_us)}`` for rows whose conditional UPDATE may have missed."""
+    at, by = f'{transition.snapshot}_at', f'{transition.snapshot}_by_id'
+    return {
+        sample_id: (status, status == transition.target and stamped_at == now and stamped_by == user.pk)
+        for sample_id, status, stamped_at, stamped_by in Sample.objects.filter(id__in=ids).values_list('id', 'status', at, by)
+    }
+
+
+def _apply(rows, action, user, now=None):
+    """Transition ``rows`` (as last read) and return ``{id: Result}``."""
+    transition = TRANSITIONS[action]
+    results = {}
+    eligible = {}
+    for row in rows:
+        if row.status in transition.sources:
+            eligible.setdefault(row.status, []).append(row)
+        else:
+            results[row.id] = Result(_outcome(row.status, transition), row.status)
+    if not eligible:
+        return results
+
+    now = now or timezone.now()
+    snapshot = {f'{transition.snapshot}_at': now, f'{transition.snapshot}_by': user}
+    with transaction.atomic():
+        moved = []
+        for previous, group in eligible.items():
+            for chunk in _chunks(group, _LOOKUP_CHUNK):
+                ids = [row.id for row in chunk]
+                updated = Sample.objects.filter(id__in=ids, status=previous).update(
+                    status=transition.target, updated_at=now, **snapshot
+                )
+                if updated == len(chunk):
+                    moved.extend(chunk)
+                    continue
+                # Some rows changed since they were read; report their current status.
+                current = _current_statuses(ids, transition, now, user)
+                for row in chunk:
+                    status, ours = current.get(row.id, (None, False))
+                    if ours:
+                        moved.append(row)
+                    elif status is None:
+                        results[row.id] = Result(NOT_FOUND, None)
+                    else:
+                        results[row.id] = Result(_outcome(status, transition), status)
+
+        entries = []
+        delta = Counter()
+        for row in moved:
+            payload = {'uid': row.uid} if transition.event == AuditLog.Event.RFID_CHECK else {}
+            entry = AuditLog.objects.build(user, transition.event, **payload)
+            entry.sample_id = row.id
+            entries.append(entry)
+            fields = (row.collected_date, row.sample_type, row.category)
+            delta.update(stats.sample_delta(fields + (row.status,), fields + (transition.target,)))
+            results[row.id] = Result(TRANSITIONED, transition.target)
+        AuditLog.objects.bulk_create(entries, batch_size=_LOOKUP_CHUNK)
+        # Bulk writes bypass the signal handlers that maintain the counters.
+        delta.update(stats.activity_delta(transition.event, now, len(entries)))
+        stats.apply(delta)
+
+        events = []
+        for row, entry in zip(moved, entries):
+            events.append(status_event(row.sample_number, transition.target, previous=row.status))
+            events.append(audit_event(entry, row.sample_number))
+        publish_on_commit(events)
+        if moved:
+            report_cache.invalidate()
+    return results
+
+
+def transition_samples(sample_ids, action, user):
+    """Apply ``action`` to a batch of samples and return ``{sample_id: Result}``.
+
+    Unknown actions raise ``KeyError``; ids that do not exist are reported
+    as :data:`NOT_FOUND`.
+    """
+    if action not in TRANSITIONS:
+        raise KeyError(action)
+    ordered = list(dict.fromkeys(sample_ids))
+    rows = _read_rows(ordered)
+    results = _apply([rows[sample_id] for sample_id in ordered if sample_id in rows], action, user)
+    return {sample_id: results.get(sample_id, Result(NOT_FOUND, None)) for sample_id in ordered}
+
+
+def transition_sample(sample, action, user):
+    """Apply ``action`` to a loaded ``sample`` with one conditional UPDATE.
+
+    The instance is updated in place when the transition succeeds.
+    """
+    row = _Row(
+        sample.pk, sample.status, sample.collected_date, sample.sample_type, sample.category,
+        sample.sample_number, sample.rfid.uid if action == 'rfid_check' else '',
+    )
+    now = timezone.now()
+    result = _apply([row], action, user, now=now)[sample.pk]
+    if result.outcome == TRANSITIONED:
+        snapshot = TRANSITIONS[action].snapshot
+        sample.status = result.status
+        sample.updated_at = now
+        setattr(sample, f'{snapshot}_at', now)
+        setattr(sample, f'{snapshot}_by', user)
+        # Make a later save() re-read the counters' baseline (see Samples.signals).
+        sample._stats_snapshot = None
+    return result
+
+
+def ingest_rfid_reads(uids, user):
+    """Apply a batch of RFID reads and return ``{uid: outcome}`` in read order.
+
+    Tags and their samples are resolved with one query per 500 UIDs, and
+    the eligible samples are checked in one transaction by the state
+    machine above.
+    """
+    ordered = list(dict.fromkeys(uid.strip() for uid in uids if uid and uid.strip()))
+    results = dict.fromkeys(ordered, UNKNOWN)
+
+    candidates = []
+    for chunk in _chunks(ordered, _LOOKUP_CHUNK):
+        tags = RFIDTag.objects.filter(uid__in=chunk).values_list(
+            'is_active', 'sample__id', 'sample__status', 'sample__collected_date',
+            'sample__sample_type', 'sample__category', 'sample__sample_number', 'uid',
+        )
+        for is_active, *values in tags:
+            row = _Row(*values)
+            if row.id is None:
+                continue
+            if not is_active:
+                results[row.uid] = INACTIVE_TAG
+            else:
+                candidates.append(row)
+
+    outcomes = _apply(candidates, 'rfid_check', user)
+    for row in candidates:
+        result = outcomes[row.id]
+        if result.outcome == TRANSITIONED:
+            results[row.uid] = TRANSITIONED
+        elif result.outcome == NOT_FOUND:
+            # Deleted since the tag was looked up.
+            results[row.uid] = UNKNOWN
+        elif result.status == 'rejected':
+            results[row.uid] = REJECTED
+        else:
+            results[row.uid] = ALREADY_CHECKED
+    return results
@@ -1,15 +1,28 @@
 from django.urls import path
-from .views import SampleListCreateAPIView, SampleRetrieveUpdateDestroyAPIView, sample_list_view, add_sample_view, sample_full_screen_view, dashboard_view, export_samples_view, reports_view, export_reports_excel, export_reports_pdf
+from .views import SampleListCreateAPIView, SampleRetrieveUpdateDestroyAPIView, sample_list_view, add_sample_view, sample_full_screen_view, dashboard_view, export_samples_view, reports_view, export_reports_excel, export_reports_pdf, sample_search_view
+from .views import RFIDScanIngestAPIView, SampleImportAPIView, SampleTransitionAPIView, sample_events_view
+from .views import report_job_create_view, report_job_status_view, report_job_download_view, report_cache_stats_view
 
 urlpatterns = [
     path('samples/', SampleListCreateAPIView.as_view(), name='sample-list-create'),
     path('samples/<int:pk>/', SampleRetrieveUpdateDestroyAPIView.as_view(), name='sample-detail'),
+    path('samples/<int:pk>/transition/', SampleTransitionAPIView.as_view(), name='sample-transition'),
+    path('samples/transition/', SampleTransitionAPIView.as_view(), name='sample-transition-batch'),
+    path('samples/scan/', RFIDScanIngestAPIView.as_view(), name='sample-scan-ingest'),
+    path('samples/import/', SampleImportAPIView.as_view(), name='sample-import'),
     path('samples/web/', sample_list_view, name='sample-list-web'),
+    path('samples/search/', sample_search_view, name='sample-search'),
     path('samples/add/', add_sample_view, name='add_sample'),
     path('samples/full/<str:sample_number>/', sample_full_screen_view, name='sample_full_screen'),
+    path('samples/events/', sample_events_view, name='sample-events'),
+    path('samples/events/<str:sample_number>/', sample_events_view, name='sample-events-detail'),
     path('dashboard/', dashboard_view, name='dashboard'),
     path('samples/export/', export_samples_view, name='sample-export'),
     path('reports/', reports_view, name='reports'),
     path('reports/export/excel/', export_reports_excel, name='reports-export-excel'),
     path('reports/export/pdf/', export_reports_pdf, name='reports-export-pdf'),
+    path('reports/cache/', report_cache_stats_view, name='report-cache-stats'),
+    path('reports/jobs/', report_job_create_view, name='report-job-create'),
+    path('reports/jobs/<uuid:job_id>/', report_job_status_view, name='report-job-status'),
+    path('reports/jobs/<uuid:job_id>/download/', report_job_download_view, name='report-job-download'),
 ]
@@ -1,47 +1,37 @@
 # Role-based access control helpers
 from django.contrib.auth.decorators import user_passes_test, permission_required
-from django.http import HttpResponseForbidden, HttpResponse
+from django.http import HttpResponseForbidden, HttpResponse, HttpResponseNotAllowed
+
+from .roles import ADMIN, OPERATOR, has_role
 
 def is_admin(user):
-	return user.groups.filter(name='Admin').exists()
+	return has_role(user, ADMIN)
 
 def is_operator(user):
-	return user.groups.filter(name='Operator').exists()
+	return has_role(user, OPERATOR)
 
 def is_operator_or_admin(user):
-	return user.groups.filter(name__in=['Admin', 'Operator']).exists()
+	return has_role(user, ADMIN, OPERATOR)
 # View for full screen sample details and actions
 from django.contrib.auth.decorators import login_required
 from .models import AuditLog
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 
 @login_required
 @permission_required('Samples.view_sample', raise_exception=True)
 def sample_full_screen_view(request, sample_number):
-	sample = get_object_or_404(Sample, sample_number=sample_number)
+	sample = get_object_or_404(Sample.objects.select_related('rfid'), sample_number=sample_number)
 	can_act = is_operator_or_admin(request.user)
 	if request.method == 'POST':
 		if not request.user.has_perm('Samples.change_sample'):
 			return HttpResponseForbidden()
 		if not can_act:
 			return HttpResponseForbidden()
+		from .transitions import TRANSITIONS, transition_sample
 		action = request.POST.get('action')
-		if action == 'rfid_check' and sample.status == 'pending':
-			sample.status = 'checked'
-			sample.save()
-			AuditLog.objects.create(
-				user=request.user,
-				sample=sample,
-				action=f"فحص RFID (UID: {sample.rfid.uid})"
-			)
-		elif action == 'approve' and sample.status == 'checked':
-			sample.status = 'approved'
-			sample.save()
-			AuditLog.objects.create(user=request.user, sample=sample, action='اعتماد العينة')
-		elif action == 'reject' and sample.status in ['pending', 'checked', 'approved']:
-			sample.status = 'rejected'
-			sample.save()
-			AuditLog.objects.create(user=request.user, sample=sample, action='رفض العينة')
+		if action in TRANSITIONS:
+			transition_sample(sample, action, request.user)
 		return redirect('sample_full_screen', sample_number=sample.sample_number)
 	logs = AuditLog.objects.filter(sample=sample).order_by('-timestamp')[:10]
 	return render(
@@ -49,6 +39,51 @@ def sample_full_screen_view(request, sample_number):
 		'Samples/sample_full_screen.html',
 		{'sample': sample, 'can_act': can_act, 'logs': logs}
 	)
+async def sample_events_view(request, sample_number=None):
+	"""Server-Sent Events stream of status changes and audit entries.
+
+	Streams one sample when ``sample_number`` is given, otherwise every
+	sample. Holding connections open needs the ASGI application; under WSGI
+	the endpoint answers 204, which tells EventSource clients not to retry.
+	"""
+	import asyncio
+	import json
+	from asgiref.sync import sync_to_async
+	from django.contrib.auth.views import redirect_to_login
+	from django.core.exceptions import PermissionDenied
+	from django.core.handlers.asgi import ASGIRequest
+	from django.http import StreamingHttpResponse
+	from .events import broker
+
+	user = await request.auser()
+	if not user.is_authenticated:
+		return redirect_to_login(request.get_full_path())
+	if not await sync_to_async(user.has_perm)('Samples.view_sample'):
+		raise PermissionDenied
+	if not isinstance(request, ASGIRequest):
+		return HttpResponse(status=204)
+
+	async def stream():
+		# Subscribed only once the stream starts, so a client gone before the
+		# first chunk leaves nothing behind in the broker.
+		subscription = broker.subscribe(sample_number)
+		try:
+			yield 'retry: 5000\n\n'
+			while True:
+				try:
+					event = await asyncio.wait_for(subscription.get(), timeout=15)
+				except asyncio.TimeoutError:
+					yield ': keep-alive\n\n'
+					continue
+				yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+		finally:
+			subscription.close()
+
+	response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+	response['Cache-Control'] = 'no-cache'
+	response['X-Accel-Buffering'] = 'no'
+	return response
+
 ## Removed unused ListView import
 from django.shortcuts import render, redirect
 # ...existing code...
@@ -60,14 +95,16 @@ from django.shortcuts import render, redirect
 def sample_list_view(request):
 	query, sample_type, category, date_value, samples = _get_filtered_samples(request)
 
-	from django.core.paginator import Paginator
-	paginator = Paginator(samples, 10)
-	page_number = request.GET.get('page')
-	page_obj = paginator.get_page(page_number)
+	from .pagination import SampleKeysetPaginator
+	page_obj = SampleKeysetPaginator(samples, 10).get_page(
+		request.GET.get('cursor'), estimate=not (query or sample_type or category or date_value)
+	)
 
 	context = {
 		'samples': page_obj.object_list,
 		'page_obj': page_obj,
+		'next_query': _with_cursor(request, page_obj.next_cursor),
+		'previous_query': _with_cursor(request, page_obj.previous_cursor),
 		'query': query,
 		'sample_type': sample_type,
 		'category': category,
@@ -76,13 +113,23 @@ def sample_list_view(request):
 	return render(request, 'Samples/sample_list.html', context)
 
 
+def _with_cursor(request, cursor):
+	if cursor is None:
+		return ''
+	params = request.GET.copy()
+	params['cursor'] = cursor
+	params.pop('page', None)
+	return params.urlencode()
+
+
 def _get_filtered_samples(request):
 	query = request.GET.get('q', '').strip()
 	sample_type = request.GET.get('sample_type', '').strip()
 	category = request.GET.get('category', '').strip()
 	date_value = request.GET.get('date', '').strip()
 
-	samples = Sample.objects.all().order_by('-collected_date', '-id')
+	from .routers import bind
+	samples = bind(Sample.objects.all()).order_by('-collected_date', '-id')
 	if sample_type:
 		samples = samples.filter(sample_type=sample_type)
 	if category:
@@ -90,200 +137,115 @@ def _get_filtered_samples(request):
 	if date_value:
 		samples = samples.filter(collected_date=date_value)
 	if query:
-		from django.db.models import Q
-		samples = samples.filter(
-			Q(sample_number__icontains=query) | Q(person_name__icontains=query)
-		)
+		from .search import filter_samples
+		samples = filter_samples(samples, query)
 
 	return query, sample_type, category, date_value, samples
 
 
+@login_required
+@permission_required('Samples.view_sample', raise_exception=True)
+def sample_search_view(request):
+	from django.http import JsonResponse
+	from django.urls import reverse
+	from .search import search
+
+	results = search(request.GET.get('q', '').strip(), limit=10)
+	return JsonResponse({'results': [
+		{
+			'sample_number': s.sample_number,
+			'person_name': s.person_name,
+			'status': s.status,
+			'url': reverse('sample_full_screen', args=[s.sample_number]),
+		}
+		for s in results
+	]})
+
+
 @login_required
 @permission_required('Samples.view_sample', raise_exception=True)
 def export_samples_view(request):
 	query, sample_type, category, date_value, samples = _get_filtered_samples(request)
 
-	from io import BytesIO
-	from openpyxl import Workbook
-
-	wb = Workbook()
-	ws = wb.active
-	ws.title = 'Samples'
-
-	ws.append(['Sample Number', 'Person Name', 'Type', 'Category', 'Date', 'Status', 'RFID'])
-	for s in samples:
-		ws.append([
-			s.sample_number,
-			s.person_name,
-			s.sample_type,
-			s.category,
-			s.collected_date.strftime('%Y-%m-%d') if s.collected_date else '',
-			s.status,
-			s.rfid.uid,
-		])
-
-	output = BytesIO()
-	wb.save(output)
-	output.seek(0)
-
-	response = HttpResponse(
-		output.getvalue(),
-		content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+	from django.http import StreamingHttpResponse
+	from .exports import XLSX_CONTENT_TYPE, stream_xlsx
+
+	rows = samples.values_list(
+		'sample_number', 'person_name', 'sample_type', 'category', 'collected_date', 'status', 'rfid__uid'
+	).iterator(chunk_size=2000)
+
+	def formatted_rows():
+		for number, name, kind, category_value, collected, status_value, uid in rows:
+			yield (
+				number,
+				name,
+				kind,
+				category_value,
+				collected.strftime('%Y-%m-%d') if collected else '',
+				status_value,
+				uid,
+			)
+
+	response = StreamingHttpResponse(
+		stream_xlsx(
+			['Sample Number', 'Person Name', 'Type', 'Category', 'Date', 'Status', 'RFID'],
+			formatted_rows(),
+			title='Samples',
+		),
+		content_type=XLSX_CONTENT_TYPE
 	)
 	response['Content-Disposition'] = 'attachment; filename="samples_export.xlsx"'
 	return response
 
 
 def _can_export(user):
-	return user.groups.filter(name__in=['Admin', 'Operator']).exists()
+	return has_role(user, ADMIN, OPERATOR)
+
+
+def _report_params(request):
+	return (
+		request.GET.get('report_type', 'samples'),
+		request.GET.get('from_date', '').strip(),
+		request.GET.get('to_date', '').strip(),
+		request.GET.get('user_id', '').strip(),
+	)
 
 
 @login_required
 @permission_required('Samples.view_auditlog', raise_exception=True)
 def reports_view(request):
-	report_type = request.GET.get('report_type', 'samples')
-	from_date = request.GET.get('from_date', '').strip()
-	to_date = request.GET.get('to_date', '').strip()
-	user_id = request.GET.get('user_id', '').strip()
+	report_type, from_date, to_date, user_id = _report_params(request)
 
 	from django.contrib.auth.models import User
+	from .report_cache import get_report
 	users = User.objects.all().order_by('username')
 
-	columns, rows, title = _build_report(report_type, from_date, to_date, user_id)
+	report = get_report(report_type, from_date, to_date, user_id)
 	context = {
 		'report_type': report_type,
 		'from_date': from_date,
 		'to_date': to_date,
 		'user_id': user_id,
 		'users': users,
-		'columns': columns,
-		'rows': rows,
-		'title': title,
+		'columns': report.columns,
+		'status_columns': report.status_columns,
+		'rows': report.rows(),
+		'title': report.title,
 		'can_export': _can_export(request.user),
 	}
 	return render(request, 'Samples/reports.html', context)
 
 
-def _build_report(report_type, from_date, to_date, user_id):
-	from django.db.models import Q
-	from django.utils.dateparse import parse_date
-	from django.contrib.auth.models import User
+def _cached_export(request, format):
+	"""Serve a finished background export for the same parameters, if one is still cached."""
+	from django.http import FileResponse
+	from . import jobs
 
-	start = parse_date(from_date) if from_date else None
-	end = parse_date(to_date) if to_date else None
-	user_filter = User.objects.filter(id=user_id).first() if user_id else None
-
-	def date_filter(qs, field):
-		if start:
-			qs = qs.filter(**{f"{field}__date__gte": start}) if field.endswith('timestamp') else qs.filter(**{f"{field}__gte": start})
-		if end:
-			qs = qs.filter(**{f"{field}__date__lte": end}) if field.endswith('timestamp') else qs.filter(**{f"{field}__lte": end})
-		return qs
-
-	def _make_columns(labels):
-		return [{'label': label, 'is_status': label in ['الحالة', 'الحالة النهائية']} for label in labels]
-
-	def _make_rows(columns, row_dicts):
-		rows = []
-		for row in row_dicts:
-			cells = []
-			for col in columns:
-				cells.append({'value': row.get(col['label'], ''), 'is_status': col['is_status']})
-			rows.append(cells)
-		return rows
-
-	if report_type == 'rfid':
-		logs = AuditLog.objects.filter(action__startswith='فحص RFID')
-		logs = date_filter(logs, 'timestamp')
-		if user_filter:
-			logs = logs.filter(user=user_filter)
-			
-		columns = _make_columns(['رقم العينة', 'UID', 'وقت الفحص', 'المستخدم', 'النتيجة'])
-		row_dicts = []
-		for log in logs.order_by('-timestamp'):
-			uid = ''
-			if 'UID:' in log.action:
-				uid = log.action.split('UID:')[-1].strip(' )')
-			row_dicts.append({
-				'رقم العينة': log.sample.sample_number if log.sample else '-',
-				'UID': uid,
-				'وقت الفحص': log.timestamp.strftime('%Y-%m-%d %H:%M'),
-				'المستخدم': log.user.username,
-				'النتيجة': 'نجاح',
-			})
-		return columns, _make_rows(columns, row_dicts), 'تقرير فحص RFID'
-
-	if report_type == 'approval':
-		logs = AuditLog.objects.filter(action='اعتماد العينة')
-		logs = date_filter(logs, 'timestamp')
-		if user_filter:
-			logs = logs.filter(user=user_filter)
-		columns = _make_columns(['رقم العينة', 'تاريخ الاعتماد', 'المستخدم', 'الحالة النهائية', 'ملاحظات'])
-		row_dicts = []
-		for log in logs.order_by('-timestamp'):
-			row_dicts.append({
-				'رقم العينة': log.sample.sample_number if log.sample else '-',
-				'تاريخ الاعتماد': log.timestamp.strftime('%Y-%m-%d %H:%M'),
-				'المستخدم': log.user.username,
-				'الحالة النهائية': 'معتمدة',
-				'ملاحظات': '',
-			})
-		return columns, _make_rows(columns, row_dicts), 'تقرير الاعتماد'
-
-	if report_type == 'audit':
-		logs = AuditLog.objects.all()
-		logs = date_filter(logs, 'timestamp')
-		if user_filter:
-			logs = logs.filter(user=user_filter)
-		columns = _make_columns(['المستخدم', 'الإجراء', 'رقم العينة', 'التاريخ والوقت'])
-		row_dicts = []
-		for log in logs.order_by('-timestamp'):
-			row_dicts.append({
-				'المستخدم': log.user.username,
-				'الإجراء': log.action,
-				'رقم العينة': log.sample.sample_number if log.sample else '-',
-				'التاريخ والوقت': log.timestamp.strftime('%Y-%m-%d %H:%M'),
-			})
-		return columns, _make_rows(columns, row_dicts), 'تقرير النشاط'
-
-	# Default: samples report
-	from .models import Sample
-	samples = Sample.objects.all().order_by('-collected_date', '-id')
-	if start:
-		samples = samples.filter(collected_date__gte=start)
-	if end:
-		samples = samples.filter(collected_date__lte=end)
-	if user_filter:
-		# approver is derived from audit log
-		pass
-	columns = _make_columns(['رقم العينة', 'نوع العينة', 'التصنيف', 'تاريخ الجمع', 'الحالة', 'تم فحص RFID', 'المعتمد'])
-	row_dicts = []
-	# map approvals by sample
-	approval_logs = AuditLog.objects.filter(action='اعتماد العينة')
-	if user_filter:
-		approval_logs = approval_logs.filter(user=user_filter)
-	approval_map = {}
-	for log in approval_logs.order_by('-timestamp'):
-		if log.sample_id not in approval_map:
-			approval_map[log.sample_id] = log.user.username
-	status_map = {
-		'pending': 'قيد الفحص',
-		'checked': 'تم التحقق',
-		'approved': 'معتمدة',
-		'rejected': 'مرفوضة',
-	}
-	for s in samples:
-		rfid_checked = 'نعم' if s.status in ['checked', 'approved'] else 'لا'
-		row_dicts.append({
-			'رقم العينة': s.sample_number,
-			'نوع العينة': s.sample_type,
-			'التصنيف': s.category,
-			'تاريخ الجمع': s.collected_date.strftime('%Y-%m-%d') if s.collected_date else '',
-			'الحالة': status_map.get(s.status, s.status),
-			'تم فحص RFID': rfid_checked,
-			'المعتمد': approval_map.get(s.id, '-'),
-		})
-	return columns, _make_rows(columns, row_dicts), 'تقرير العينات'
+	params = _report_params(request)
+	path = jobs.cached_file(jobs.cache_key(*params, format), format)
+	if path is None:
+		return None
+	return FileResponse(open(path, 'rb'), as_attachment=True, filename=jobs.download_name(params[0], format))
 
 
 @login_required
@@ -291,31 +253,19 @@ def _build_report(report_type, from_date, to_date, user_id):
 def export_reports_excel(request):
 	if not _can_export(request.user):
 		return HttpResponseForbidden()
-	report_type = request.GET.get('report_type', 'samples')
-	from_date = request.GET.get('from_date', '').strip()
-	to_date = request.GET.get('to_date', '').strip()
-	user_id = request.GET.get('user_id', '').strip()
-	columns, rows, title = _build_report(report_type, from_date, to_date, user_id)
-
-	from io import BytesIO
-	from openpyxl import Workbook
-	
-	wb = Workbook()
-	ws = wb.active
-	ws.title = 'Report'
-	col_labels = [c['label'] for c in columns]
-	ws.append(col_labels)
-	for row in rows:
-		ws.append([cell['value'] for cell in row])
-	
-	output = BytesIO()
-	wb.save(output)
-	output.seek(0)
-	response = HttpResponse(
-		output.getvalue(),
-		content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+	from django.http import StreamingHttpResponse
+	from .exports import XLSX_CONTENT_TYPE, stream_xlsx
+	from .report_cache import get_report
+
+	cached = _cached_export(request, 'xlsx')
+	if cached is not None:
+		return cached
+	report = get_report(*_report_params(request))
+	response = StreamingHttpResponse(
+		stream_xlsx(report.labels, report.rows(), title='Report'),
+		content_type=XLSX_CONTENT_TYPE
 	)
-	response['Content-Disposition'] = f'attachment; filename="{title}.xlsx"'
+	response['Content-Disposition'] = f'attachment; filename="{report.title}.xlsx"'
 	return response
 
 
@@ -324,60 +274,98 @@ def export_reports_excel(request):
 def export_reports_pdf(request):
 	if not _can_export(request.user):
 		return HttpResponseForbidden()
-	report_type = request.GET.get('report_type', 'samples')
-	from_date = request.GET.get('from_date', '').strip()
-	to_date = request.GET.get('to_date', '').strip()
-	user_id = request.GET.get('user_id', '').strip()
-	columns, rows, title = _build_report(report_type, from_date, to_date, user_id)
+	from .report_cache import get_report
+	cached = _cached_export(request, 'pdf')
+	if cached is not None:
+		return cached
+	report = get_report(*_report_params(request))
 
 	from io import BytesIO
-	from reportlab.lib.pagesizes import A4
-	from reportlab.lib import colors
-	from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-	from reportlab.lib.styles import getSampleStyleSheet
-	from reportlab.pdfbase import pdfmetrics
-	from reportlab.pdfbase.ttfonts import TTFont
-	from reportlab.lib.enums import TA_RIGHT
-	from reportlab.lib.styles import ParagraphStyle
-	from pathlib import Path
-
-	def shape_text(text):
-		try:
-			import arabic_reshaper
-			from bidi.algorithm import get_display
-			return get_display(arabic_reshaper.reshape(str(text)))
-		except Exception:
-			return str(text)
-
-	font_name = 'Helvetica'
-	font_path = Path('static') / 'fonts' / 'Cairo-Regular.ttf'
-	if font_path.exists():
-		pdfmetrics.registerFont(TTFont('Cairo', str(font_path)))
-		font_name = 'Cairo'
-
+	from .pdf import render_report_pdf
 	buffer = BytesIO()
-	doc = SimpleDocTemplate(buffer, pagesize=A4)
-	styles = getSampleStyleSheet()
-	style_rtl = ParagraphStyle('rtl', parent=styles['Normal'], fontName=font_name, alignment=TA_RIGHT)
-	story = [Paragraph(shape_text(title), ParagraphStyle('title', parent=styles['Title'], fontName=font_name, alignment=TA_RIGHT)), Spacer(1, 12)]
-
-	col_labels = [c['label'] for c in columns]
-	data = [[shape_text(c) for c in col_labels]] + [[shape_text(cell['value']) for cell in row] for row in rows]
-	table = Table(data, hAlign='LEFT')
-	table.setStyle(TableStyle([
-		('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-		('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-		('FONTNAME', (0, 0), (-1, -1), font_name),
-		('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-	]))
-	story.append(table)
-	doc.build(story)
+	render_report_pdf(report, buffer)
 
 	response = HttpResponse(content_type='application/pdf')
-	response['Content-Disposition'] = f'attachment; filename="{title}.pdf"'
+	response['Content-Disposition'] = f'attachment; filename="{report.title}.pdf"'
 	response.write(buffer.getvalue())
 	return response
 
+@login_required
+@permission_required('Samples.view_auditlog', raise_exception=True)
+def report_job_create_view(request):
+	from django.http import JsonResponse
+	from django.urls import reverse
+	from . import jobs
+	from .models import ReportJob
+
+	if request.method != 'POST':
+		return HttpResponseNotAllowed(['POST'])
+	if not _can_export(request.user):
+		return HttpResponseForbidden()
+	format = request.POST.get('format', ReportJob.Format.XLSX)
+	if format not in ReportJob.Format.values:
+		return JsonResponse({'error': 'Unknown format.'}, status=400)
+	job = jobs.submit(
+		request.user,
+		request.POST.get('report_type', 'samples'),
+		request.POST.get('from_date', '').strip(),
+		request.POST.get('to_date', '').strip(),
+		request.POST.get('user_id', '').strip(),
+		format=format,
+	)
+	data = jobs.job_state(job)
+	data['status_url'] = reverse('report-job-status', args=[job.pk])
+	data['download_url'] = reverse('report-job-download', args=[job.pk])
+	return JsonResponse(data, status=200 if job.status == ReportJob.Status.DONE else 202)
+
+
+@login_required
+@permission_required('Samples.view_auditlog', raise_exception=True)
+def report_job_status_view(request, job_id):
+	from django.http import JsonResponse
+	from . import jobs
+	from .models import ReportJob
+
+	job = get_object_or_404(ReportJob, pk=job_id, user=request.user)
+	return JsonResponse(jobs.job_state(job))
+
+
+@login_required
+@permission_required('Samples.view_auditlog', raise_exception=True)
+def report_job_download_view(request, job_id):
+	from django.http import FileResponse
+	from . import jobs
+	from .models import ReportJob
+
+	job = get_object_or_404(ReportJob, pk=job_id, user=request.user)
+	if job.status != ReportJob.Status.DONE:
+		return HttpResponse(status=409)
+	path = jobs.cached_file(job.cache_key, job.format)
+	if path is None:
+		# The cached file expired; the export has to be requested again.
+		return HttpResponse(status=410)
+	return FileResponse(open(path, 'rb'), as_attachment=True, filename=job.file_name)
+
+@login_required
+@user_passes_test(is_admin, login_url='/users/login/')
+def report_cache_stats_view(request):
+	from django.http import JsonResponse
+	from .report_cache import stats
+	return JsonResponse(stats())
+
+def metrics_view(request):
+	"""Prometheus scrape target: a ``Bearer`` token matching ``METRICS_TOKEN``, or an admin session."""
+	import hmac
+	from django.conf import settings
+	from .metrics import render
+	token = getattr(settings, 'METRICS_TOKEN', '')
+	header = request.headers.get('Authorization', '')
+	if not (token and hmac.compare_digest(header, f'Bearer {token}')) and not (
+		request.user.is_authenticated and is_admin(request.user)
+	):
+		return HttpResponseForbidden()
+	return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # Web view for adding a new sample
 from .forms import SampleForm
 from django.contrib.auth.decorators import login_required
@@ -388,7 +376,8 @@ def add_sample_view(request):
 	if request.method == 'POST':
 		form = SampleForm(request.POST)
 		if form.is_valid():
-			form.save()
+			with transaction.atomic():
+				form.save()
 			if 'add_another' in request.POST:
 				return redirect('add_sample')
 			return redirect('sample-list-web')
@@ -397,11 +386,19 @@ def add_sample_view(request):
 	recent_samples = Sample.objects.all().order_by('-collected_date', '-id')[:5]
 	return render(request, 'Samples/add_sample.html', {'form': form, 'samples': recent_samples})
 
-# Dashboard view (alias of add_sample_view)
+# Dashboard view: reads only the daily counters maintained by Samples.stats
 @login_required
 @permission_required('Samples.view_sample', raise_exception=True)
 def dashboard_view(request):
-	return add_sample_view(request)
+	from .reports import STATUS_LABELS
+	from .stats import dashboard
+
+	figures = dashboard(days=30)
+	figures['by_status'] = [
+		(key, STATUS_LABELS.get(key, key), figures['by_status'].get(key, 0)) for key, _ in Sample.STATUS_CHOICES
+	]
+	figures['per_day_max'] = max([count for _, count in figures['per_day']] + [1])
+	return render(request, 'Samples/dashboard.html', figures)
 
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, DjangoModelPermissions
@@ -411,39 +408,232 @@ from .models import Sample
 from .serializers import SampleSerializer
 from django.shortcuts import get_object_or_404
 
+SAMPLE_API_FIELDS = [field.name for field in Sample._meta.concrete_fields]
+
+
+def _sparse_fields(request):
+	requested = [name.strip() for name in request.query_params.get('fields', '').split(',') if name.strip()]
+	return [name for name in requested if name in SAMPLE_API_FIELDS]
+
+
+def _api_page_size(request, default=50, maximum=500):
+	try:
+		size = int(request.query_params.get('page_size', default))
+	except ValueError:
+		return default
+	return max(1, min(size, maximum))
+
+
+def _etag(*parts):
+	import hashlib
+	from django.utils.http import quote_etag
+	digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+	return quote_etag(digest)
+
+
+def _conditional_response(request, etag, last_modified):
+	"""Return a 304 response if the client's copy is current, else ``None``."""
+	from django.utils.cache import get_conditional_response
+	timestamp = int(last_modified.timestamp()) if last_modified else None
+	return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def _set_validators(response, etag, last_modified):
+	from django.utils.http import http_date
+	response['ETag'] = etag
+	if last_modified:
+		response['Last-Modified'] = http_date(last_modified.timestamp())
+	return response
+
+
+
 class SampleListCreateAPIView(APIView):
 	permission_classes = [IsAuthenticated, DjangoModelPermissions]
+	queryset = Sample.objects.all()
+
 	def get(self, request):
-		samples = Sample.objects.all()
-		serializer = SampleSerializer(samples, many=True)
-		return Response(serializer.data)
+		from .pagination import SampleKeysetPaginator
+		query, sample_type, category, date_value, samples = _get_filtered_samples(request)
+		fields = _sparse_fields(request)
+		if fields:
+			samples = samples.only(*set(fields) | {'id', 'collected_date', 'updated_at'})
+		page = SampleKeysetPaginator(samples, _api_page_size(request)).get_page(
+			request.query_params.get('cursor'), estimate=request.query_params.get('estimate') == '1'
+		)
+
+		etag = _etag(request.get_full_path(), [(s.pk, s.updated_at) for s in page.object_list])
+		last_modified = max((s.updated_at for s in page.object_list), default=None)
+		not_modified = _conditional_response(request, etag, last_modified)
+		if not_modified is not None:
+			return not_modified
+
+		serializer = SampleSerializer(page.object_list, many=True, fields=fields)
+		response = Response({
+			'next': self._page_url(request, page.next_cursor),
+			'previous': self._page_url(request, page.previous_cursor),
+			'estimated_total': page.estimated_total,
+			'results': serializer.data,
+		})
+		return _set_validators(response, etag, last_modified)
+
+	def _page_url(self, request, cursor):
+		if cursor is None:
+			return None
+		return request.build_absolute_uri('?' + _with_cursor(request, cursor))
 
 	def post(self, request):
 		serializer = SampleSerializer(data=request.data)
 		if serializer.is_valid():
-			serializer.save()
+			with transaction.atomic():
+				serializer.save()
 			return Response(serializer.data, status=status.HTTP_201_CREATED)
 		return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class SampleRetrieveUpdateDestroyAPIView(APIView):
 	permission_classes = [IsAuthenticated, DjangoModelPermissions]
+	queryset = Sample.objects.all()
 	def get_object(self, pk):
 		return get_object_or_404(Sample, pk=pk)
 
 	def get(self, request, pk):
 		sample = self.get_object(pk)
-		serializer = SampleSerializer(sample)
-		return Response(serializer.data)
+		fields = _sparse_fields(request)
+		etag = _etag(sample.pk, sample.updated_at, fields)
+		not_modified = _conditional_response(request, etag, sample.updated_at)
+		if not_modified is not None:
+			return not_modified
+		serializer = SampleSerializer(sample, fields=fields)
+		return _set_validators(Response(serializer.data), etag, sample.updated_at)
 
 	def put(self, request, pk):
 		sample = self.get_object(pk)
 		serializer = SampleSerializer(sample, data=request.data)
 		if serializer.is_valid():
-			serializer.save()
+			with transaction.atomic():
+				serializer.save()
 			return Response(serializer.data)
 		return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 	def delete(self, request, pk):
 		sample = self.get_object(pk)
-		sample.delete()
+		with transaction.atomic():
+			sample.delete()
 		return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CanTransitionSamples(IsAuthenticated):
+	def has_permission(self, request, view):
+		return (
+			super().has_permission(request, view)
+			and request.user.has_perm('Samples.change_sample')
+			and is_operator_or_admin(request.user)
+		)
+
+
+class SampleTransitionAPIView(APIView):
+	"""Apply a workflow action to one sample (``samples/<pk>/transition/``) or
+	a batch (``samples/transition/`` with ``{"action": ..., "ids": [...]}``)."""
+	permission_classes = [CanTransitionSamples]
+
+	def post(self, request, pk=None):
+		from .transitions import MAX_TRANSITION_BATCH, NOT_FOUND, TRANSITIONED, TRANSITIONS, transition_samples
+		data = request.data if hasattr(request.data, 'get') else {}
+		action = data.get('action')
+		if action not in TRANSITIONS:
+			return Response({'action': [f'Expected one of: {", ".join(TRANSITIONS)}.']}, status=status.HTTP_400_BAD_REQUEST)
+		ids = [pk] if pk is not None else data.get('ids')
+		if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+			return Response({'ids': ['Expected a list of sample ids.']}, status=status.HTTP_400_BAD_REQUEST)
+		if len(ids) > MAX_TRANSITION_BATCH:
+			return Response(
+				{'ids': [f'At most {MAX_TRANSITION_BATCH} samples per request.']},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+		results = transition_samples(ids, action, request.user)
+		if pk is not None:
+			result = results[pk]
+			if result.outcome == NOT_FOUND:
+				return Response(status=status.HTTP_404_NOT_FOUND)
+			code = status.HTTP_200_OK if result.outcome == TRANSITIONED else status.HTTP_409_CONFLICT
+			return Response({'id': pk, 'result': result.outcome, 'status': result.status}, status=code)
+		summary = {}
+		for result in results.values():
+			summary[result.outcome] = summary.get(result.outcome, 0) + 1
+		return Response({
+			'results': [
+				{'id': sample_id, 'result': result.outcome, 'status': result.status}
+				for sample_id, result in results.items()
+			],
+			'summary': summary,
+		})
+
+
+class RFIDScanIngestAPIView(APIView):
+	"""Accept a batch of RFID reads: ``{"uids": ["RFID-...", ...]}``."""
+	permission_classes = [CanTransitionSamples]
+
+	def post(self, request):
+		from .transitions import MAX_SCAN_BATCH, ingest_rfid_reads
+		uids = request.data.get('uids') if hasattr(request.data, 'get') else None
+		if not isinstance(uids, list) or not all(isinstance(uid, str) for uid in uids):
+			return Response({'uids': ['Expected a list of UID strings.']}, status=status.HTTP_400_BAD_REQUEST)
+		if len(uids) > MAX_SCAN_BATCH:
+			return Response(
+				{'uids': [f'At most {MAX_SCAN_BATCH} reads per request.']},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+		results = ingest_rfid_reads(uids, request.user)
+		summary = {}
+		for outcome in results.values():
+			summary[outcome] = summary.get(outcome, 0) + 1
+		return Response({
+			'results': [{'uid': uid, 'result': outcome} for uid, outcome in results.items()],
+			'summary': summary,
+		})
+
+
+class CanImportSamples(IsAuthenticated):
+	def has_permission(self, request, view):
+		return super().has_permission(request, view) and request.user.has_perm('Samples.add_sample')
+
+
+class SampleImportAPIView(APIView):
+	"""Bulk import: a CSV/XLSX upload in ``file``, or JSON ``{"samples": [{...}, ...]}``.
+
+	``dry_run`` validates without writing. Responds with the counts and the
+	first errors, each with its row number. A file that cannot be parsed is
+	rejected before anything is written.
+	"""
+	permission_classes = [CanImportSamples]
+	MAX_ERRORS = 100
+
+	def post(self, request):
+		import csv
+		import zipfile
+		from .imports import SampleImporter, check_file, read_dicts, read_file
+		unreadable = (ValueError, csv.Error, zipfile.BadZipFile)
+		data = request.data if hasattr(request.data, 'get') else {}
+		upload = request.FILES.get('file')
+		if upload is not None:
+			try:
+				check_file(upload.file, upload.name)
+			except unreadable as exc:
+				return Response({'file': [f'Unreadable file: {exc}']}, status=status.HTTP_400_BAD_REQUEST)
+			records = read_file(upload.file, upload.name)
+		elif isinstance(data.get('samples'), list) and all(isinstance(item, dict) for item in data['samples']):
+			records = read_dicts(data['samples'])
+		else:
+			return Response(
+				{'file': ['Upload a CSV or XLSX file, or send a "samples" list.']},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+		dry_run = str(data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+		importer = SampleImporter(request.user, dry_run=dry_run, max_errors=self.MAX_ERRORS)
+		try:
+			result = importer.run(records)
+		except unreadable as exc:
+			# The chunks before the bad row are already committed.
+			body = dict(importer.result.as_dict(), partial=True, file=[f'Unreadable file: {exc}'])
+			return Response(body, status=status.HTTP_400_BAD_REQUEST)
+		code = status.HTTP_201_CREATED if result.created and not dry_run else status.HTTP_200_OK
+		return Response(result.as_dict(), status=code)
@@ -0,0 +1,84 @@
+"""Avatar thumbnails.
+
+Uploaded avatars are reduced to small square WebP and JPEG thumbnails
+stored under content-hashed names (``avatars/thumbs/<hash>.webp``), so a
+thumbnail URL never changes meaning and can be cached by browsers for a
+year. The page header reads the thumbnail URLs from the session (see
+:func:`avatar_context`) instead of querying the profile on every request.
+"""
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+THUMB_DIR = 'avatars/thumbs'
+# Twice the 44px header avatar, for high-density screens.
+THUMB_SIZE = 96
+FORMATS = (('webp', 'WEBP', {'quality': 80, 'method': 4}), ('jpg', 'JPEG', {'quality': 85, 'optimize': True}))
+
+SESSION_KEY = 'avatar_urls'
+# Staff photos: browsers may keep them, shared caches may not.
+CACHE_CONTROL = 'private, max-age=31536000, immutable'
+THUMB_NAME = r'[0-9a-f]{20}\.(?:webp|jpg)'
+
+
+def make_thumbnails(fileobj):
+    """Store the thumbnails of an uploaded image; returns ``{extension: name}``."""
+    from PIL import Image, ImageOps
+
+    with Image.open(fileobj) as image:
+        image = ImageOps.exif_transpose(image)
+        image = ImageOps.fit(image.convert('RGB'), (THUMB_SIZE, THUMB_SIZE), Image.LANCZOS)
+    names = {}
+    for extension, format, options in FORMATS:
+        buffer = BytesIO()
+        image.save(buffer, format, **options)
+        data = buffer.getvalue()
+        name = f'{THUMB_DIR}/{hashlib.sha256(data).hexdigest()[:20]}.{extension}'
+        # Same content, same name: an existing file is already correct.
+        if not default_storage.exists(name):
+            default_storage.save(name, ContentFile(data))
+        names[extension] = name
+    return names
+
+
+def refresh(profile):
+    """Rebuild the thumbnails of ``profile.avatar`` and store their names."""
+    if profile.avatar:
+        with profile.avatar.open('rb') as fh:
+            names = make_thumbnails(fh)
+        profile.avatar_thumb, profile.avatar_thumb_webp = names['jpg'], names['webp']
+    else:
+        profile.avatar_thumb = profile.avatar_thumb_webp = ''
+    profile.save(update_fields=['avatar_thumb', 'avatar_thumb_webp'])
+
+
+def thumbnail_urls(profile):
+    """``{'webp': url, 'jpg': url}`` for a profile, or ``{}`` without thumbnails."""
+    if not profile.avatar_thumb:
+        return {}
+    return {
+        'webp': reverse('avatar_thumbnail', args=[profile.avatar_thumb_webp.rsplit('/', 1)[-1]]),
+        'jpg': reverse('avatar_thumbnail', args=[profile.avatar_thumb.rsplit('/', 1)[-1]]),
+    }
+
+
+def remember(request, profile):
+    request.session[SESSION_KEY] = thumbnail_urls(profile)
+
+
+def avatar_context(request):
+    """Template context processor providing ``avatar_urls`` for the header."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated or not hasattr(request, 'session'):
+        return {}
+    urls = request.session.get(SESSION_KEY)
+    if urls is None:
+        from .models import UserProfile
+
+        profile = UserProfile.objects.filter(user=user).only('avatar_thumb', 'avatar_thumb_webp').first()
+        urls = thumbnail_urls(profile) if profile is not None else {}
+        request.session[SESSION_KEY] = urls
+    return {'avatar_urls': urls}
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from Users.avatars import refresh
+from Users.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Create the header thumbnails for avatars uploaded before thumbnails existed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild thumbnails that already exist too.')
+
+    def handle(self, *args, **options):
+        profiles = UserProfile.objects.exclude(avatar='').exclude(avatar__isnull=True)
+        if not options['all']:
+            profiles = profiles.filter(avatar_thumb='')
+        built = 0
+        for profile in profiles.iterator():
+            try:
+                refresh(profile)
+            except (OSError, ValueError) as exc:
+                self.stderr.write(f'{profile.user_id}: {exc}')
+                continue
+            built += 1
+        self.stdout.write(self.style.SUCCESS(f'Built thumbnails for {built} avatar(s).'))
@@ -5,6 +5,9 @@ from django.contrib.auth.models import User
 class UserProfile(models.Model):
 	user = models.OneToOneField(User, on_delete=models.CASCADE)
 	avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+	# Content-hashed thumbnails of ``avatar`` (see Users.avatars).
+	avatar_thumb = models.CharField(max_length=100, blank=True)
+	avatar_thumb_webp = models.CharField(max_length=100, blank=True)
 
 	def __str__(self):
 		return self.user.username
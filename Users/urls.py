@@ -1,6 +1,8 @@
-from django.urls import path
+from django.urls import path, re_path
 from .views import register_view, login_view, logout_view, password_reset_view, password_reset_confirm_view, profile_edit_view
 from .views import user_management_view, user_create_view, user_edit_view, user_toggle_active_view, user_reset_password_view
+from .views import avatar_thumbnail_view
+from .avatars import THUMB_NAME
 
 urlpatterns = [
     path('register/', register_view, name='register'),
@@ -9,6 +11,7 @@ urlpatterns = [
     path('password_reset/', password_reset_view, name='password_reset'),
     path('reset/<uidb64>/<token>/', password_reset_confirm_view, name='password_reset_confirm'),
     path('profile/edit/', profile_edit_view, name='profile_edit'),
+    re_path(rf'^avatars/(?P<name>{THUMB_NAME})$', avatar_thumbnail_view, name='avatar_thumbnail'),
     path('management/', user_management_view, name='user_management'),
     path('management/add/', user_create_view, name='user_create'),
     path('management/<int:user_id>/edit/', user_edit_view, name='user_edit'),
@@ -22,9 +22,10 @@ def register_view(request):
 	return render(request, 'Users/register.html', {'form': form})
 
 from Samples.models import AuditLog
+from Samples.roles import ADMIN, has_role
 
 def is_admin(user):
-	return user.groups.filter(name='Admin').exists()
+	return has_role(user, ADMIN)
 
 def login_view(request):
 	if request.method == 'POST':
@@ -33,7 +34,7 @@ def login_view(request):
 			user = form.get_user()
 			login(request, user)
 			# سجل الدخول في AuditLog
-			AuditLog.objects.create(user=user, action="تسجيل الدخول")
+			AuditLog.objects.record(user, AuditLog.Event.LOGIN)
 			redirect_to = request.POST.get('next') or request.GET.get('next') or '/api/samples/web/'
 			return redirect(redirect_to)
 	else:
@@ -85,10 +86,13 @@ def profile_edit_view(request):
 			avatar = form.cleaned_data.get('avatar')
 			user.save()
 			if avatar:
+				from .avatars import refresh, remember
 				profile = user.userprofile
 				profile.avatar = avatar
 				profile.save()
-			AuditLog.objects.create(user=request.user, action='User updated own profile')
+				refresh(profile)
+				remember(request, profile)
+			AuditLog.objects.record(request.user, AuditLog.Event.PROFILE_UPDATE)
 			return redirect('profile_edit')
 	else:
 		form = UserProfileForm(instance=request.user)
@@ -122,7 +126,7 @@ def user_create_view(request):
 			user.is_active = form.cleaned_data.get('is_active', True)
 			user.save()
 			_set_user_role(user, form.cleaned_data['role'])
-			AuditLog.objects.create(user=request.user, action=f"إنشاء مستخدم: {user.username} ({form.cleaned_data['role']})")
+			AuditLog.objects.record(request.user, AuditLog.Event.USER_CREATE, username=user.username, role=form.cleaned_data['role'])
 			return redirect('user_management')
 	else:
 		form = AdminUserCreateForm()
@@ -148,15 +152,15 @@ def user_edit_view(request, user_id):
 			user.save()
 			_set_user_role(user, form.cleaned_data['role'])
 
-			actions = []
+			events = []
 			if before_email != user.email or before_first != user.first_name or before_last != user.last_name:
-				actions.append('تعديل بيانات المستخدم')
+				events.append(AuditLog.Event.USER_UPDATE)
 			if before_active != user.is_active:
-				actions.append('تفعيل المستخدم' if user.is_active else 'إيقاف المستخدم')
+				events.append(AuditLog.Event.USER_ACTIVATE if user.is_active else AuditLog.Event.USER_DEACTIVATE)
 			if before_role != form.cleaned_data['role']:
-				actions.append(f"تغيير دور المستخدم إلى {form.cleaned_data['role']}")
-			for act in actions:
-				AuditLog.objects.create(user=request.user, action=f"{act}: {user.username}")
+				events.append(AuditLog.Event.USER_ROLE_CHANGE)
+			for event in events:
+				AuditLog.objects.record(request.user, event, username=user.username, role=form.cleaned_data['role'])
 			return redirect('user_management')
 	else:
 		form = AdminUserEditForm(instance=user, initial={'role': current_role, 'is_active': user.is_active})
@@ -169,7 +173,11 @@ def user_toggle_active_view(request, user_id):
 	user = User.objects.get(pk=user_id)
 	user.is_active = not user.is_active
 	user.save()
-	AuditLog.objects.create(user=request.user, action=f"{'تفعيل' if user.is_active else 'إيقاف'} المستخدم: {user.username}")
+	AuditLog.objects.record(
+		request.user,
+		AuditLog.Event.USER_ACTIVATE if user.is_active else AuditLog.Event.USER_DEACTIVATE,
+		username=user.username,
+	)
 	return redirect('user_management')
 
 
@@ -181,5 +189,18 @@ def user_reset_password_view(request, user_id):
 	new_password = secrets.token_urlsafe(6)
 	user.set_password(new_password)
 	user.save()
-	AuditLog.objects.create(user=request.user, action=f"إعادة تعيين كلمة المرور للمستخدم: {user.username}")
+	AuditLog.objects.record(request.user, AuditLog.Event.PASSWORD_RESET, username=user.username)
 	return render(request, 'Users/password_reset_admin_result.html', {'target_user': user, 'new_password': new_password})
+
+
+@login_required
+def avatar_thumbnail_view(request, name):
+	from django.core.files.storage import default_storage
+	from django.http import FileResponse, Http404
+	from .avatars import CACHE_CONTROL, THUMB_DIR
+	path = f'{THUMB_DIR}/{name}'
+	if not default_storage.exists(path):
+		raise Http404
+	response = FileResponse(default_storage.open(path), content_type='image/webp' if name.endswith('.webp') else 'image/jpeg')
+	response['Cache-Control'] = CACHE_CONTROL
+	return response